@@ -0,0 +1,135 @@
+"""
+Benchmark comparing throughput of the sync and async database paths under concurrency.
+
+Two minimal apps serve the same paginated document listing: one through a
+sync endpoint with `DocumentRepository` (run on Starlette's threadpool), the
+other through an async endpoint with `AsyncDocumentRepository`. Both use the
+pool profile from `config.database.engine_options`. Requests are driven in
+process over ASGI at each concurrency level.
+
+`--db-latency-ms` makes every statement first run a SQLite function that
+sleeps inside the driver (the request thread for the sync path, aiosqlite's
+connection thread for the async path), which approximates the network round
+trip of a remote database. For real numbers point `--db-url` at Postgres.
+
+Usage:
+    python -m benchmarks.async_vs_sync [--requests 2000] [--concurrency 1 10 50 200] [--db-latency-ms 2]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from datetime import datetime, timedelta
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from config.database import Base, async_database_url, engine_options
+from config.settings import get_settings
+from models.document import Document
+from models.user import User  # noqa: F401  registers the users table
+from repositories.document_repository import AsyncDocumentRepository, DocumentRepository
+
+
+def add_latency(engine, seconds: float):
+    """
+    Sleep in the driver before every statement to emulate a remote SQLite database.
+    """
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function('benchmark_sleep', 0, lambda: time.sleep(seconds))
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        cursor.execute('SELECT benchmark_sleep()')
+
+
+def build_apps(db_url: str, latency: float):
+    """
+    Build the sync and async apps against the same database.
+    """
+    settings = get_settings().copy(update={'db_url': db_url, 'db_async_url': ''})
+    engine = create_engine(db_url, **engine_options(settings))
+    async_engine = create_async_engine(async_database_url(settings), **engine_options(settings, asynchronous=True))
+    if latency and engine.dialect.name == 'sqlite':
+        add_latency(engine, latency)
+        add_latency(async_engine.sync_engine, latency)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    def get_db():
+        with SessionLocal() as db:
+            yield db
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    sync_app = FastAPI()
+    async_app = FastAPI()
+
+    @sync_app.get('/documents')
+    def sync_documents(db: Session = Depends(get_db)):
+        return [document.id for document in DocumentRepository(db).get_documents(50)]
+
+    @async_app.get('/documents')
+    async def async_documents(db=Depends(get_async_db)):
+        return [document.id for document in await AsyncDocumentRepository(db).get_documents(50)]
+
+    return engine, {'sync': sync_app, 'async': async_app}
+
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with Session(engine) as db:
+        db.add_all(
+            Document(title=f'Document {i}', file_type='pdf', file_url=f'{i}.pdf', description='',
+                     created_at=now - timedelta(seconds=i), updated_at=now)
+            for i in range(rows)
+        )
+        db.commit()
+
+
+async def drive(app: FastAPI, total: int, concurrency: int) -> float:
+    """
+    Send `total` requests with `concurrency` in flight and return requests per second.
+    """
+    remaining = total
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get('/documents')
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db-url', help='sync database URL; defaults to a temporary SQLite file')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--db-latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    db_url = args.db_url or f'sqlite:///{tempfile.mkdtemp()}/bench.sqlite'
+    engine, apps = build_apps(db_url, args.db_latency_ms / 1000)
+    if not args.db_url:
+        seed(engine, args.rows)
+
+    print(f"{'concurrency':>12}{'sync req/s':>14}{'async req/s':>14}")
+    for concurrency in args.concurrency:
+        results = [await drive(apps[path], args.requests, concurrency) for path in ('sync', 'async')]
+        print(f"{concurrency:>12}{results[0]:>14.0f}{results[1]:>14.0f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,150 @@
+"""
+Cold-start check of the Lambda entry point.
+
+Each run starts a fresh interpreter, as a new Lambda container does, which
+imports `main` under `-X importtime` and then passes two API Gateway (HTTP
+API) events for `GET /documents` to the Mangum `handler`. The first event
+pays for the lazily created engines and the startup checks; the second shows
+the warm cost for comparison. The database is a throwaway SQLite file
+migrated with `alembic upgrade head`.
+
+The report lists the median, over `--runs` runs, of the import time of `main`,
+of both invocations, and of the cumulative import time of the slowest modules
+imported by `main` (imports made by the interpreter itself are left out).
+
+Exits with status 1 if import plus first invocation exceeds `--budget-ms`, or
+if `main` imports any of the `FORBIDDEN` packages, which must only load when
+a request needs them.
+
+Usage:
+    python -m benchmarks.cold_start [--runs 5] [--top 15] [--budget-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy packages behind lazy factories or imports inside functions.
+FORBIDDEN = ('alembic', 'boto3', 'botocore', 'cryptography', 'jwt', 'magic', 'passlib', 'PIL', 'pypdfium2')
+
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+event = {
+    "version": "2.0",
+    "routeKey": "$default",
+    "rawPath": "/documents",
+    "rawQueryString": "limit=10",
+    "headers": {"host": "localhost"},
+    "requestContext": {
+        "http": {"method": "GET", "path": "/documents", "protocol": "HTTP/1.1",
+                 "sourceIp": "127.0.0.1", "userAgent": "cold-start"},
+        "stage": "$default",
+    },
+    "isBase64Encoded": False,
+}
+timings = []
+for _ in range(2):
+    before = time.perf_counter()
+    response = main.handler(event, None)
+    timings.append(time.perf_counter() - before)
+    assert response["statusCode"] == 200, response
+print(json.dumps({"import": imported - start, "first": timings[0], "second": timings[1],
+                  "modules": sorted(sys.modules)}))
+'''
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Return the cumulative import time, in seconds, of `main` and each module it imported.
+
+    `-X importtime` prints a module after the modules it imports, indented by
+    depth, so the nested lines directly above the top-level `main` line are
+    the imports made by `main`.
+    """
+    lines = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        lines.append((name[1:].rstrip(), int(cumulative)))
+    index = next(i for i, (name, _) in enumerate(lines) if name == 'main')
+    times = {'main': lines[index][1] / 1e6}
+    for name, cumulative in reversed(lines[:index]):
+        if not name.startswith(' '):
+            break
+        # A module is only imported once; keep the outermost line of repeated names.
+        times.setdefault(name.strip(), cumulative / 1e6)
+    return times
+
+
+def run_once(env: dict) -> dict:
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+    )
+    if process.returncode:
+        sys.exit(f'cold start run failed:\n{process.stderr[-3000:]}')
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['times'] = parse_importtime(process.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, help='fail if import plus first invocation is slower')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DB_URL=f'sqlite:///{directory}/cold_start.sqlite',
+        DB_ASYNC_URL='',
+        DB_REPLICA_URLS='[]',
+        DB_PROFILE='lambda',
+        STORAGE_BACKEND='local',
+        STORAGE_LOCAL_PATH=f'{directory}/storage',
+    )
+    subprocess.run([sys.executable, '-m', 'alembic', 'upgrade', 'head'], cwd=PROJECT_ROOT, env=env,
+                   check=True, capture_output=True)
+
+    runs = [run_once(env) for _ in range(args.runs)]
+
+    modules = defaultdict(list)
+    for run in runs:
+        for name, seconds in run['times'].items():
+            modules[name].append(seconds)
+    print(f'{"module":<50}{"cumulative ms":>15}')
+    slowest = sorted(modules.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, samples in slowest[:args.top + 1]:
+        print(f'{name:<50}{statistics.median(samples) * 1000:>15.1f}')
+
+    import_ms = statistics.median(run['import'] for run in runs) * 1000
+    first_ms = statistics.median(run['first'] for run in runs) * 1000
+    second_ms = statistics.median(run['second'] for run in runs) * 1000
+    print(f'\nimport main {import_ms:.1f} ms, first invocation {first_ms:.1f} ms, '
+          f'second invocation {second_ms:.1f} ms (median of {args.runs} runs)')
+
+    failed = False
+    loaded = sorted({name for run in runs for name in run['modules'] if name.split('.')[0] in FORBIDDEN})
+    if loaded:
+        print(f'FAIL: loaded on cold start: {", ".join(loaded)}')
+        failed = True
+    if args.budget_ms is not None and import_ms + first_ms > args.budget_ms:
+        print(f'FAIL: cold start {import_ms + first_ms:.1f} ms is over the budget of {args.budget_ms:.0f} ms')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
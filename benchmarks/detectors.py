@@ -0,0 +1,51 @@
+"""
+Micro-benchmark comparing the cost of file type detection per upload.
+
+It times libmagic on a full in-memory upload (the old behaviour) against each
+detector in `utils.file_types` on the bounded `SNIFF_SIZE` prefix.
+
+Usage:
+    python -m benchmarks.detectors [--size-mb 5] [--number 2000]
+"""
+import argparse
+import timeit
+from utils.file_types import DETECTORS, FILE_TYPES, SNIFF_SIZE
+
+MB = 1024 * 1024
+
+
+def sample_files(size: int) -> dict:
+    """
+    Build a synthetic file of `size` bytes for every supported type, plus one unsupported.
+    """
+    files = {file_type.name: file_type.signatures[0] + bytes(size) for file_type in FILE_TYPES}
+    files['png'] = files['png'][:8] + b'\x00\x00\x00\rIHDR\x00\x00\x01\x00\x00\x00\x01\x00\x08\x02' + files['png'][25:]
+    files['text'] = b'plain text, ' * (size // 12)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=5, help='size of each synthetic upload')
+    parser.add_argument('--number', type=int, default=2000, help='detections per measurement')
+    args = parser.parse_args()
+
+    files = sample_files(int(args.size_mb * MB))
+    detectors = {name: detector() for name, detector in DETECTORS.items()}
+    print(f"{'detector':<24}{'file':<8}{'us/upload':>12}  result")
+
+    magic_detector = detectors['magic']
+    for file_name, contents in files.items():
+        seconds = timeit.timeit(lambda: magic_detector.magic.from_buffer(contents), number=args.number // 10 or 1)
+        usec = seconds / (args.number // 10 or 1) * 1e6
+        print(f"{'magic (full buffer)':<24}{file_name:<8}{usec:>12.1f}  {magic_detector.magic.from_buffer(contents)}")
+
+    for detector_name, detector in detectors.items():
+        for file_name, contents in files.items():
+            header = contents[:SNIFF_SIZE]
+            seconds = timeit.timeit(lambda: detector.detect(header), number=args.number)
+            print(f"{detector_name:<24}{file_name:<8}{seconds / args.number * 1e6:>12.1f}  {detector.detect(header)}")
+
+
+if __name__ == '__main__':
+    main()
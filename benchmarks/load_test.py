@@ -0,0 +1,393 @@
+"""
+Load test of the API endpoints, with baselines to catch regressions.
+
+Migrates a temporary SQLite database, seeds it with `--users` users owning
+`--documents` documents each, and starts the app with uvicorn in a separate
+process. Storage is an in-process S3 stand-in (moto, a dev dependency) by
+default, or the local or memory backend. Each scenario is then driven over
+HTTP at every `--concurrency` level: signup, login, get, list, create, update
+and delete document, and uploads of each `--upload-sizes`. Uploads are unique
+PDFs, so content deduplication does not skip the writes.
+
+For every scenario and level the report shows p50/p95/p99 latency,
+throughput, unexpected responses and the peak RSS of the server and its
+worker processes while the scenario ran.
+
+`--save` writes the results to a JSON baseline; `--compare` runs the same
+suite and exits with status 1 if a p95 latency or throughput is worse than
+the baseline by more than `--tolerance`, or if a scenario has new errors.
+Baselines are only comparable on the same machine.
+
+Usage:
+    python -m benchmarks.load_test [--users 100] [--documents 10] [--requests 100] [--concurrency 1 10 50]
+    python -m benchmarks.load_test --scenarios login "upload 1MiB"
+    python -m benchmarks.load_test --save baseline.json
+    python -m benchmarks.load_test --compare baseline.json [--tolerance 0.2]
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import httpx
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUCKET = 'load-test'
+PASSWORD = 'load-test-password'
+
+SERVER = '''
+import sys
+import uvicorn
+
+if sys.argv[2] == "moto":
+    # The server process holds the S3 stand-in, so the app's boto3 client talks to it.
+    import boto3
+    from moto import mock_aws
+
+    mock_aws().start()
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=sys.argv[3])
+uvicorn.run("main:app", host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+'''
+
+
+def app_environment(directory: str, storage: str) -> dict:
+    return dict(
+        os.environ,
+        DB_URL=f'sqlite:///{directory}/load_test.sqlite',
+        DB_ASYNC_URL='',
+        DB_REPLICA_URLS='[]',
+        STORAGE_BACKEND='s3' if storage == 'moto' else storage,
+        STORAGE_LOCAL_PATH=f'{directory}/storage',
+        AWS_ACCESS_KEY_ID='testing',
+        AWS_SECRET_ACCESS_KEY='testing',
+        AWS_REGION='us-east-1',
+        AWS_BUCKET_NAME=BUCKET,
+        AWS_ENDPOINT_URL='',
+        LOG_FILE='',
+        LOG_CONSOLE_LEVEL='WARNING',
+        METRICS_MULTIPROCESS_DIR='',
+    )
+
+
+def seed(env: dict, users: int, documents: int):
+    """
+    Insert the users and documents in a child process configured like the server.
+    """
+    script = f'''
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from config.database import get_engine
+from models.document import Document
+from models.user import User
+from utils.auth.password_hasher import get_password_hash
+
+password = get_password_hash({PASSWORD!r})
+now = datetime.utcnow()
+with Session(get_engine()) as db:
+    for i in range({users}):
+        db.add(User(
+            email=f"seed{{i}}@example.com", password=password, created_at=now - timedelta(seconds=i), updated_at=now,
+            documents=[
+                Document(title=f"Document {{i}}-{{j}}", file_type="pdf", file_url=f"{{i}}-{{j}}.pdf",
+                         description="Seeded for the load test", created_at=now, updated_at=now)
+                for j in range({documents})
+            ],
+        ))
+    db.commit()
+'''
+    subprocess.run([sys.executable, '-c', script], cwd=PROJECT_ROOT, env=env, check=True)
+
+
+def make_pdf(size: int, rng: random.Random) -> bytes:
+    """
+    Build a valid one-page PDF of about `size` bytes, padded with a random unused stream.
+    """
+    padding = rng.randbytes(max(size - 600, 0))
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>',
+        b'<< /Length %d >>\nstream\n' % len(padding) + padding + b'\nendstream',
+    ]
+    pdf = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+class Scenarios:
+    """
+    The requests of each scenario. A scenario is a coroutine function taking
+    the client and the index of the request, and returning the response.
+    """
+
+    def __init__(self, users: int, documents: int, upload_sizes: list):
+        self.users = users
+        self.document_ids = users * documents
+        self.rng = random.Random(0)
+        self.signups = 0
+        self.created = []
+        self.upload_sizes = upload_sizes
+
+    def all(self) -> dict:
+        scenarios = {
+            'signup': self.signup,
+            'login': self.login,
+            'get document': self.get_document,
+            'list documents': self.list_documents,
+            'create document': self.create_document,
+            'update document': self.update_document,
+            'delete document': self.delete_document,
+        }
+        for size in self.upload_sizes:
+            scenarios[f'upload {format_size(size)}'] = self.upload(size)
+        return scenarios
+
+    async def signup(self, client: httpx.AsyncClient, i: int):
+        self.signups += 1
+        return await client.post('/user/signup', json={'email': f'new{self.signups}@example.com', 'password': PASSWORD})
+
+    async def login(self, client: httpx.AsyncClient, i: int):
+        return await client.post('/login', data={'username': f'seed{i % self.users}@example.com', 'password': PASSWORD})
+
+    async def get_document(self, client: httpx.AsyncClient, i: int):
+        return await client.get(f'/documents/{self.rng.randint(1, self.document_ids)}')
+
+    async def list_documents(self, client: httpx.AsyncClient, i: int):
+        return await client.get('/documents', params={'limit': 50})
+
+    async def create_document(self, client: httpx.AsyncClient, i: int):
+        response = await client.post('/documents', json=document_body(f'Created {i}'))
+        if response.status_code == 200:
+            self.created.append(response.json()['id'])
+        return response
+
+    async def update_document(self, client: httpx.AsyncClient, i: int):
+        return await client.put(f'/documents/{self.rng.randint(1, self.document_ids)}', json=document_body(f'Updated {i}'))
+
+    async def delete_document(self, client: httpx.AsyncClient, i: int):
+        # Deletes the documents made by "create document", which runs first at each level.
+        return await client.delete(f'/documents/{self.created.pop()}')
+
+    def upload(self, size: int):
+        async def upload(client: httpx.AsyncClient, i: int):
+            pdf = make_pdf(size, self.rng)
+            return await client.post('/upload', files={'file': (f'{i}.pdf', pdf, 'application/pdf')})
+        return upload
+
+
+def document_body(title: str) -> dict:
+    return {'title': title, 'file_type': 'pdf', 'file_url': f'{title}.pdf', 'description': 'Written by the load test'}
+
+
+def format_size(size: int) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024 or unit == 'MiB':
+            return f'{size:g}{unit}'
+        size /= 1024
+
+
+def tree_rss(pid: int) -> int:
+    """
+    Return the resident memory, in bytes, of a process and its direct children (Linux only).
+    """
+    total = 0
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/status') as status:
+                fields = dict(line.split(':', 1) for line in status)
+        except OSError:
+            continue
+        if int(entry) == pid or int(fields.get('PPid', 0)) == pid:
+            total += int(fields.get('VmRSS', '0 kB').split()[0]) * 1024
+    return total
+
+
+async def drive(client: httpx.AsyncClient, scenario, total: int, concurrency: int, warmup: int, pid: int) -> dict:
+    """
+    Send `total` requests of a scenario with `concurrency` in flight and summarize them.
+
+    The first `warmup` requests are sent one at a time and left out of the summary.
+    """
+    for i in range(warmup):
+        await scenario(client, -1 - i)
+    latencies, errors = [], 0
+    counter = iter(range(total))
+    peak_rss = tree_rss(pid)
+    running = True
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while running:
+            peak_rss = max(peak_rss, tree_rss(pid))
+            await asyncio.sleep(0.05)
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await scenario(client, i)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+
+    sampler = asyncio.create_task(sample_rss())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    running = False
+    await sampler
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'errors': errors,
+        'throughput': total / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_rss_mb': peak_rss / 2 ** 20,
+    }
+
+
+def percentile(samples: list, fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def run_suite(port: int, scenarios: dict, args, pid: int) -> dict:
+    results = {}
+    for concurrency in args.concurrency:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=120) as client:
+            for name, scenario in scenarios.items():
+                total = args.upload_requests if name.startswith('upload') else args.requests
+                result = await drive(client, scenario, total, concurrency, args.warmup, pid)
+                results[f'{name} @{concurrency}'] = result
+                print(f'{name:<18} c={concurrency:<4} p50 {result["p50_ms"]:8.1f} ms  p95 {result["p95_ms"]:8.1f} ms  '
+                      f'p99 {result["p99_ms"]:8.1f} ms  {result["throughput"]:8.1f} req/s  '
+                      f'errors {result["errors"]:<4} peak RSS {result["peak_rss_mb"]:6.0f} MiB', flush=True)
+    return results
+
+
+def wait_until_up(port: int, server: subprocess.Popen):
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit('the server exited during startup')
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/documents', params={'limit': 1}).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    sys.exit('the server did not start within 60 s')
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Print the scenarios that regressed against the baseline and return whether any did.
+    """
+    regressed = False
+    for key, result in results.items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        problems = []
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            problems.append(f'p95 {before["p95_ms"]:.1f} -> {result["p95_ms"]:.1f} ms')
+        if result['throughput'] < before['throughput'] * (1 - tolerance):
+            problems.append(f'throughput {before["throughput"]:.1f} -> {result["throughput"]:.1f} req/s')
+        if result['errors'] > before['errors']:
+            problems.append(f'errors {before["errors"]} -> {result["errors"]}')
+        if problems:
+            regressed = True
+            print(f'REGRESSION {key}: {", ".join(problems)}')
+    if not regressed:
+        print(f'no regression beyond {tolerance:.0%} against the baseline')
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--documents', type=int, default=10, help='documents per seeded user')
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario and concurrency level')
+    parser.add_argument('--upload-requests', type=int, default=20, help='requests per upload size and level')
+    parser.add_argument('--upload-sizes', type=int, nargs='+', default=[10 * 1024, 1024 ** 2, 10 * 1024 ** 2])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests before each scenario and level')
+    parser.add_argument('--scenarios', nargs='+', help='run only these scenarios, e.g. "login" "list documents"')
+    parser.add_argument('--storage', choices=['moto', 'local', 'memory'], default='moto')
+    parser.add_argument('--save', help='write the results to this JSON baseline')
+    parser.add_argument('--compare', help='compare the results with this JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+    if args.storage == 'moto' and importlib.util.find_spec('moto') is None:
+        parser.error('moto is a dev dependency: run `poetry install` with the dev group, or pass --storage local')
+
+    directory = tempfile.mkdtemp()
+    env = app_environment(directory, args.storage)
+    subprocess.run([sys.executable, '-m', 'alembic', 'upgrade', 'head'], cwd=PROJECT_ROOT, env=env,
+                   check=True, capture_output=True)
+    start = time.perf_counter()
+    seed(env, args.users, args.documents)
+    print(f'seeded {args.users} users and {args.users * args.documents} documents '
+          f'in {time.perf_counter() - start:.1f} s')
+
+    scenarios = Scenarios(args.users, args.documents, args.upload_sizes).all()
+    if args.scenarios:
+        unknown = set(args.scenarios) - set(scenarios)
+        if unknown:
+            sys.exit(f'unknown scenarios: {", ".join(sorted(unknown))}; choose from {", ".join(scenarios)}')
+        scenarios = {name: scenario for name, scenario in scenarios.items() if name in args.scenarios}
+        if 'delete document' in scenarios and 'create document' not in scenarios:
+            sys.exit('"delete document" deletes the documents of "create document"; run both')
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen([sys.executable, '-c', SERVER, str(port), args.storage, BUCKET],
+                              cwd=PROJECT_ROOT, env=env)
+    try:
+        wait_until_up(port, server)
+        print(f'server RSS after startup {tree_rss(server.pid) / 2 ** 20:.0f} MiB')
+        results = asyncio.run(run_suite(port, scenarios, args, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'options': {key: value for key, value in vars(args).items() if key not in ('scenarios', 'save', 'compare', 'tolerance')},
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'saved the baseline to {args.save}')
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline['options'] != report['options']:
+            print('warning: the baseline was recorded with other options')
+        sys.exit(1 if compare(results, baseline, args.tolerance) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark of the time a log call costs the thread that makes it.
+
+Each scenario builds the handlers and pipeline of `logger.logging` from a copy
+of the settings, with the file in a temporary directory and the console sent
+to /dev/null, then has `--threads` threads each make `--calls` INFO calls (or
+DEBUG calls, for the sampled scenario). Calls are timed in batches of
+`BATCH`; the report shows the mean and p99 per call, and for queued
+scenarios how long the listener took to drain the queue afterwards.
+
+`--io-delay-us` makes every write to the log file first sleep, which
+approximates a slow or contended disk; it is where the direct handlers and
+the queue part ways.
+
+Usage:
+    python -m benchmarks.logging_overhead [--calls 20000] [--threads 1 8] [--io-delay-us 0 200]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from config.settings import get_settings
+from logger.logging import create_handlers, create_pipeline
+
+BATCH = 100
+
+SCENARIOS = [
+    ('direct text', {'log_queue': False}, logging.INFO),
+    ('queued text', {'log_queue': True}, logging.INFO),
+    ('queued json', {'log_queue': True, 'log_format': 'json'}, logging.INFO),
+    ('queued debug 1%', {'log_queue': True, 'log_debug_sample_rate': 0.01}, logging.DEBUG),
+]
+
+
+def slow_down(handler: logging.Handler, seconds: float):
+    """
+    Sleep before every record the handler writes.
+    """
+    emit = handler.emit
+
+    def delayed_emit(record):
+        time.sleep(seconds)
+        emit(record)
+
+    handler.emit = delayed_emit
+
+
+def run(name: str, overrides: dict, level: int, calls: int, threads: int, io_delay: float, directory: str):
+    settings = get_settings().copy(update={
+        'log_file': os.path.join(directory, f'{name.replace(" ", "_")}.log'),
+        'log_console_level': 'DEBUG',
+        'log_file_level': 'DEBUG',
+        'log_queue_size': calls * threads,
+        **overrides,
+    })
+    devnull = open(os.devnull, 'w')
+    handlers = create_handlers(settings)
+    handlers[0].setStream(devnull)
+    if io_delay:
+        slow_down(handlers[1], io_delay)
+    front, listener = create_pipeline(settings, handlers)
+
+    logger = logging.getLogger(f'benchmark.{name}')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    for handler in front:
+        logger.addHandler(handler)
+
+    samples = []
+    samples_lock = threading.Lock()
+
+    def work(worker: int):
+        own = []
+        for batch in range(calls // BATCH):
+            start = time.perf_counter()
+            for i in range(BATCH):
+                logger.log(level, 'Handled GET /documents/%d for user %d in %.1f ms', batch * BATCH + i, worker, 1.5)
+            own.append((time.perf_counter() - start) / BATCH)
+        with samples_lock:
+            samples.extend(own)
+
+    workers = [threading.Thread(target=work, args=(worker,)) for worker in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    for handler in front:
+        logger.removeHandler(handler)
+    drained = ''
+    if listener is not None:
+        start = time.perf_counter()
+        listener.stop()
+        drained = f'  drained in {time.perf_counter() - start:7.3f} s'
+    for handler in handlers:
+        handler.close()
+    devnull.close()
+
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f'{name:<18} threads {threads:<3} io delay {io_delay * 1e6:5.0f} us   '
+          f'mean {statistics.mean(samples) * 1e6:9.2f} us  p99 {p99 * 1e6:9.2f} us{drained}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=20000, help='log calls per thread')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--io-delay-us', type=float, nargs='+', default=[0, 200])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    for io_delay in args.io_delay_us:
+        for threads in args.threads:
+            for name, overrides, level in SCENARIOS:
+                run(name, overrides, level, args.calls, threads, io_delay / 1e6, directory)
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,288 @@
 """
 This module provides database connection and session management using SQLAlchemy.
 
-It defines a function `get_db` that allows obtaining a database session for interacting with the database.
+It defines a function `get_db` that allows obtaining a database session for interacting with the database,
+and `get_async_db`, its `AsyncSession` counterpart used by the async routes. The async engine uses
+aiosqlite or asyncpg, derived from `db_url` unless `db_async_url` is set.
+
+The connection pool is configured from `Settings` through a named profile:
+
+- "server": a QueuePool sized for one long-running uvicorn worker. Unless
+  `db_pool_size` is set, the connection budget `db_max_connections` is split
+  across `web_concurrency` workers (capped at the threadpool size for the
+  sync engine).
+- "lambda": one reused connection per container (`pool_size=1`), or no
+  pooling at all with `db_lambda_null_pool` (e.g. behind RDS Proxy).
+
+Time spent waiting for a pooled connection is recorded in `pool_metrics`, and
+the statements of every engine are timed by `utils.query_stats`.
+
+Read-only endpoints use `get_read_db`, which round-robins across the async
+engines of `db_replica_urls`. A replica that fails to hand out a connection is
+skipped for `db_replica_retry_seconds`; when none is healthy the primary is
+used. With `db_read_your_writes_seconds` set, a client that just wrote through
+`get_async_db` reads from the primary for that long, tracked by a cookie.
+
+Engines and session factories are created on first use through `get_engine`,
+`get_async_engine` and friends, not on import, so that a cold Lambda container
+pays only for what its first request needs. The schema is owned by the Alembic
+migrations; `check_schema` verifies on startup that they have been applied,
+as set by `db_schema_check`.
 
 Author: Philip Mutua
 Date: June 19, 2023
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
-from config.settings import get_settings
+import itertools
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from fastapi import Request, Response
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from config.logger import Logger
+from config.settings import Settings, get_settings
+from utils.query_stats import instrument_engine
 
 DATABASE_URL = get_settings().db_url
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations", "versions")
+REVISION_PATTERN = re.compile(r"^revision\s*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+DOWN_REVISION_PATTERN = re.compile(r"^down_revision\s*=\s*(.*)$", re.MULTILINE)
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# Starlette runs sync endpoints on anyio's default threadpool of 40 threads,
+# so a worker never holds more connections than that at once.
+THREADPOOL_SIZE = 40
+
+LAST_WRITE_COOKIE = "db_last_write"
+
+
+class PoolMetrics:
+    """
+    Counters for time spent waiting to check out a pooled connection.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait_seconds: float, timed_out: bool = False):
+        with self.lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def snapshot(self) -> dict:
+        """
+        Return the current counters together with the pool occupancy.
+        """
+        with self.lock:
+            snapshot = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+        # Only engines already created are read; a scrape must not create the engines it reports on.
+        engines = []
+        if get_engine.cache_info().currsize:
+            engines.append(get_engine())
+        if get_async_engine.cache_info().currsize:
+            engines.append(get_async_engine().sync_engine)
+        pools = [engine.pool for engine in engines if isinstance(engine.pool, QueuePool)]
+        snapshot.update(
+            size=sum(pool.size() for pool in pools),
+            checked_out=sum(pool.checkedout() for pool in pools),
+            # A pool that has not opened all of its connections reports a negative overflow.
+            overflow=sum(max(pool.overflow(), 0) for pool in pools),
+        )
+        return snapshot
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited in `pool_metrics`.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - start)
+        return connection
+
+
+class TimedAsyncAdaptedQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records checkout waits like `TimedQueuePool`.
+    """
+
+
+def async_database_url(settings: Settings) -> str:
+    """
+    Return the URL of the async engine.
+
+    Args:
+        settings (Settings): The application settings.
+
+    Returns:
+        str: `db_async_url` if set, otherwise `db_url` with its async driver.
+    """
+    if settings.db_async_url:
+        return settings.db_async_url
+    url = make_url(settings.db_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None or url.get_driver_name() in ("aiosqlite", "asyncpg"):
+        return settings.db_url
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def engine_options(settings: Settings, asynchronous: bool = False) -> dict:
+    """
+    Build the `create_engine` pool options for the configured profile.
+
+    Args:
+        settings (Settings): The application settings.
+        asynchronous (bool): Whether the options are for the async engine.
+
+    Returns:
+        dict: Keyword arguments for `create_engine` or `create_async_engine`.
+    """
+    url = make_url(settings.db_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; keep SQLAlchemy's default pool.
+        return {}
+
+    if settings.db_profile == "lambda":
+        if settings.db_lambda_null_pool:
+            return {"poolclass": NullPool}
+        pool_size, max_overflow = 1, 0
+    else:
+        pool_size = settings.db_pool_size or max(1, settings.db_max_connections // max(1, settings.web_concurrency))
+        if not asynchronous:
+            pool_size = min(THREADPOOL_SIZE, pool_size)
+        max_overflow = settings.db_max_overflow
+
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if asynchronous else TimedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+@lru_cache
+def get_engine() -> Engine:
+    """
+    Return the sync engine, created on first use.
+    """
+    return instrument_engine(create_engine(DATABASE_URL, **engine_options(get_settings())))
+
+
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    """
+    Return the async engine of the primary, created on first use.
+    """
+    engine = create_async_engine(async_database_url(get_settings()), **engine_options(get_settings(), asynchronous=True))
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+@lru_cache
+def get_session_maker() -> sessionmaker:
+    """
+    Return the factory of sync sessions.
+    """
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+@lru_cache
+def get_async_session_maker() -> async_sessionmaker:
+    """
+    Return the factory of async sessions on the primary.
+    """
+    # Objects stay usable after commit; async sessions cannot lazily refresh them.
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+class ReplicaSet:
+    """
+    Round-robin selection of healthy read replicas.
+    """
+
+    def __init__(self, settings: Settings):
+        self.retry_seconds = settings.db_replica_retry_seconds
+        self.session_makers = []
+        for replica_url in settings.db_replica_urls:
+            replica_settings = settings.copy(update={"db_url": replica_url, "db_async_url": ""})
+            replica_engine = create_async_engine(
+                async_database_url(replica_settings), **engine_options(replica_settings, asynchronous=True)
+            )
+            instrument_engine(replica_engine.sync_engine)
+            self.session_makers.append(async_sessionmaker(replica_engine, autoflush=False, expire_on_commit=False))
+        self.down_until = [0.0] * len(self.session_makers)
+        self.counter = itertools.count()
+
+    async def session(self) -> AsyncSession:
+        """
+        Return a session bound to the next healthy replica, or to the primary if there is none.
+
+        The replica connection is checked out up front so a dead replica is
+        detected here, marked down and skipped, instead of failing the request.
+
+        Returns:
+            AsyncSession: The database session.
+        """
+        count = len(self.session_makers)
+        start = next(self.counter)
+        for offset in range(count):
+            index = (start + offset) % count
+            if self.down_until[index] > time.monotonic():
+                continue
+            db = self.session_makers[index]()
+            try:
+                await db.connection()
+                return db
+            except (DBAPIError, OSError):
+                await db.close()
+                self.down_until[index] = time.monotonic() + self.retry_seconds
+        return get_async_session_maker()()
+
+
+@lru_cache
+def get_replicas() -> ReplicaSet:
+    """
+    Return the read replicas of `db_replica_urls`, whose engines are created on first use.
+    """
+    return ReplicaSet(get_settings())
+
+
 def get_db():
     """
     Obtain a database session for interacting with the database.
@@ -37,8 +301,125 @@ def get_db():
             # ...
         ```
     """
-    db = SessionLocal()
+    db = get_session_maker()()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db(response: Response):
+    """
+    Obtain an async database session on the primary for reading and writing.
+
+    When read-your-writes is enabled, the response marks the client as having
+    just written, so `get_read_db` keeps it on the primary for a while.
+
+    Yields:
+        sqlalchemy.ext.asyncio.AsyncSession: The database session.
+    """
+    window = get_settings().db_read_your_writes_seconds
+    if window and get_replicas().session_makers:
+        response.set_cookie(LAST_WRITE_COOKIE, str(time.time()), max_age=window, httponly=True)
+    async with get_async_session_maker()() as db:
+        yield db
+
+
+async def get_read_db(request: Request):
+    """
+    Obtain an async database session for read-only endpoints.
+
+    Sessions come from a healthy read replica, or from the primary if no
+    replica is configured or healthy, or if the client wrote within
+    `db_read_your_writes_seconds`.
+
+    Yields:
+        sqlalchemy.ext.asyncio.AsyncSession: The database session.
+    """
+    window = get_settings().db_read_your_writes_seconds
+    try:
+        recent_write = time.time() - float(request.cookies.get(LAST_WRITE_COOKIE, 0)) < window
+    except ValueError:
+        recent_write = False
+
+    replicas = get_replicas()
+    db = get_async_session_maker()() if recent_write or not replicas.session_makers else await replicas.session()
+    async with db:
+        yield db
+
+
+@lru_cache
+def migration_heads() -> frozenset:
+    """
+    Return the head revisions of the migrations in `migrations/versions`.
+
+    The revision identifiers are read from the migration files rather than
+    through Alembic, whose import alone would add over 100ms to a cold start.
+
+    Returns:
+        frozenset: The revisions that no other migration revises.
+    """
+    revisions, revised = set(), set()
+    for name in os.listdir(MIGRATIONS_PATH):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(MIGRATIONS_PATH, name)) as migration:
+            source = migration.read()
+        revision = REVISION_PATTERN.search(source)
+        down_revision = DOWN_REVISION_PATTERN.search(source)
+        if revision:
+            revisions.add(revision.group(1))
+        if down_revision:
+            revised.update(re.findall(r"['\"]([^'\"]+)['\"]", down_revision.group(1)))
+    return frozenset(revisions - revised)
+
+
+async def current_revisions(connection) -> frozenset:
+    """
+    Return the revisions recorded in the `alembic_version` table of a database.
+
+    Args:
+        connection (AsyncConnection): A connection to the database.
+
+    Returns:
+        frozenset: The revisions, empty if the database was never migrated.
+    """
+    try:
+        result = await connection.execute(text("SELECT version_num FROM alembic_version"))
+    except DBAPIError:
+        return frozenset()
+    return frozenset(result.scalars())
+
+
+# Set once the schema has been found up to date. Mangum runs the startup
+# handlers on every invocation, and a warm container need not check again.
+schema_checked = threading.Event()
+
+
+async def check_schema():
+    """
+    Check on startup that the database schema is migrated, as set by `db_schema_check`.
+
+    The schema is never created or altered by the app; run `alembic upgrade
+    head` before starting it.
+
+    Raises:
+        RuntimeError: If the database is behind or ahead of the migrations and
+        `db_schema_check` is "error".
+    """
+    mode = get_settings().db_schema_check
+    if mode == "off" or schema_checked.is_set():
+        return
+    async with get_async_engine().connect() as connection:
+        current = await current_revisions(connection)
+    heads = migration_heads()
+    if current == heads:
+        schema_checked.set()
+        return
+    message = (
+        f"Database schema is out of date (database at {', '.join(sorted(current)) or 'no revision'}, "
+        f"migrations at {', '.join(sorted(heads))}); run `alembic upgrade head`"
+    )
+    if mode == "error":
+        raise RuntimeError(message)
+    Logger.warning(message)
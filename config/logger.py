@@ -1,7 +1,22 @@
-from logger.logging import Logger
+"""
+The app logger, `Logger`, set up on its first use rather than on import.
 
-# Create a logger instance
-Logger = Logger().logger
+Setting it up opens the log file and starts the queue listener thread, so a
+Lambda cold start only pays for it once something is logged.
+"""
+from logger.logging import Logger as LoggerSetup
+
+
+class LazyLogger:
+    """
+    Stand-in for the "my_app" logger that sets up logging on first use.
+    """
+
+    def __getattr__(self, name):
+        return getattr(LoggerSetup().logger, name)
+
+
+Logger = LazyLogger()
 
 # example use
-#  logger.info("Handling index request") 
\ No newline at end of file
+#  logger.info("Handling index request")
@@ -4,9 +4,15 @@ We are importing `lru_cache` from `functools` to enable caching for the `get_set
 Caching improves performance by storing the results of expensive function calls and returning them directly from cache when the same inputs occur again.
 """
 
+import os
 from functools import lru_cache
+from typing import Dict, List, Literal
 from pydantic import BaseSettings
 
+# Set by Lambda, whose task root is read-only and whose containers freeze
+# between invocations: logs go straight to the console (CloudWatch) there.
+ON_LAMBDA = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
 
 class Settings(BaseSettings):
     """
@@ -18,13 +24,80 @@ class Settings(BaseSettings):
 
     env_name: str = "Local"
     jwt_secret_key: str = "#%$&@^^@yyetet%$%#$"
-    jwt_algorithm: str = ""
+    jwt_algorithm: str = "HS256"
+    bcrypt_rounds: int = 12
+    password_hash_executor: Literal["thread", "process"] = "thread"
+    password_hash_workers: int = 0
+    password_hash_queue_size: int = 32
     base_url: str = "http://localhost:8000"
     db_url: str = "sqlite:///./db.sqlite"
+    db_async_url: str = ""
+    db_replica_urls: List[str] = []
+    db_replica_retry_seconds: int = 30
+    db_read_your_writes_seconds: int = 0
+    db_profile: Literal["server", "lambda"] = "server"
+    db_pool_size: int = 0
+    db_max_overflow: int = 0
+    db_max_connections: int = 90
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_lambda_null_pool: bool = False
+    db_schema_check: Literal["error", "warn", "off"] = "error"
+    db_query_stats: bool = True
+    db_query_headers: bool = False
+    db_slow_query_ms: float = 200
+    db_n_plus_one_threshold: int = 10
+    web_concurrency: int = 1
+    storage_backend: Literal["s3", "local", "memory"] = "s3"
+    storage_local_path: str = "./storage"
     aws_access_key_id: str = ''
     aws_secret_access_key: str = ''
     aws_bucket_name: str = ''
     aws_region: str = ''
+    aws_endpoint_url: str = ''
+    presigned_url_expiry: int = 900
+    pending_upload_expiry: int = 86400
+    pending_upload_cleanup_seconds: float = 3600
+    upload_chunk_size: int = 8 * 1024 * 1024
+    max_upload_size: int = 500 * 1024 * 1024
+    download_chunk_size: int = 1024 * 1024
+    thumbnails_enabled: bool = True
+    thumbnail_size: int = 256
+    thumbnail_workers: int = 0
+    thumbnail_max_age: int = 86400
+    text_extraction_enabled: bool = True
+    text_extraction_workers: int = 0
+    text_extraction_batch_size: int = 20
+    text_extraction_lease_seconds: float = 600
+    text_extraction_resume: bool = True
+    text_chunk_size: int = 2000
+    cache_backend: Literal["memory", "redis", "none"] = "memory"
+    cache_url: str = "redis://localhost:6379/0"
+    cache_ttl_seconds: float = 60
+    cache_max_entries: int = 10000
+    token_cache_max_entries: int = 10000
+    default_page_size: int = 50
+    max_page_size: int = 100
+    bulk_batch_size: int = 1000
+    bulk_max_items: int = 10000
+    file_type_detector: Literal["magic", "signature", "signature+magic"] = "magic"
+    log_level: str = "DEBUG"
+    log_levels: Dict[str, str] = {}
+    log_format: Literal["text", "json"] = "text"
+    log_queue: bool = not ON_LAMBDA
+    log_queue_size: int = 10000
+    log_console_level: str = "DEBUG"
+    log_file: str = "" if ON_LAMBDA else "logger/app.log"
+    log_file_level: str = "INFO"
+    log_rotation: Literal["size", "time", "none"] = "size"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_rotate_when: str = "midnight"
+    log_backup_count: int = 5
+    log_debug_sample_rate: float = 1.0
+    metrics_enabled: bool = True
+    metrics_multiprocess_dir: str = ""
+    metrics_flush_seconds: float = 5
 
     class Config:
         """
@@ -47,6 +120,4 @@ def get_settings() -> Settings:
     The decorator ensures that the function's results are cached and only calculated once, avoiding redundant processing.
     """
 
-    settings = Settings()
-    print(f"Loading settings for: {settings.env_name}")
-    return settings
+    return Settings()
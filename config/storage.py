@@ -0,0 +1,34 @@
+"""
+This module provides the storage backend holding document files.
+
+The backend is selected by the `storage_backend` setting and created on first
+use, so importing the application does not build an S3 client.
+"""
+from functools import lru_cache
+from config.settings import get_settings
+from services.storage.base import Storage
+
+
+@lru_cache
+def get_storage() -> Storage:
+    """
+    Return the storage backend selected by the `storage_backend` setting.
+    """
+    settings = get_settings()
+    if settings.storage_backend == "local":
+        from services.storage.local import LocalStorage
+        return LocalStorage(settings.storage_local_path)
+    if settings.storage_backend == "memory":
+        from services.storage.memory import MemoryStorage
+        return MemoryStorage()
+
+    import boto3
+    from services.storage.s3 import S3Storage
+    client = boto3.client(
+        's3',
+        region_name=settings.aws_region or None,
+        aws_access_key_id=settings.aws_access_key_id or None,
+        aws_secret_access_key=settings.aws_secret_access_key or None,
+        endpoint_url=settings.aws_endpoint_url or None
+    )
+    return S3Storage(client, settings.aws_bucket_name)
@@ -1,4 +1,169 @@
+"""
+Logging setup of the app: the "my_app" logger and its handlers.
+
+Records go to the console and to `log_file`, as text or JSON lines, through a
+queue drained by a background thread unless `log_queue` is off. Levels, the
+sampling of DEBUG records and the file rotation are read from `Settings`.
+"""
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from typing import List
+from config.settings import Settings, get_settings
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through `extra`.
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line.
+
+    Fields given with `extra=` are included alongside the standard ones.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """
+    Let through only a random fraction of DEBUG records; other levels all pass.
+
+    The decision is kept on the record, so every handler sharing the sampler
+    keeps or drops the same records.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        if not hasattr(record, "_sampled"):
+            record._sampled = random.random() < self.rate
+        return record._sampled
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hand records to a `QueueListener` thread without blocking the caller.
+
+    The message is merged on the calling thread, so later changes to its
+    arguments do not show, but formatting, including tracebacks, is left to
+    the listener. When the queue is full the record is dropped and counted
+    rather than making the request wait for the disk.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.dropped_lock:
+                self.dropped += 1
+
+
+def create_formatter(settings: Settings) -> logging.Formatter:
+    if settings.log_format == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def create_handlers(settings: Settings) -> List[logging.Handler]:
+    """
+    Build the handlers that write log records out: the console and, unless
+    `log_file` is empty, a file rotated as set by `log_rotation`.
+
+    Args:
+        settings (Settings): The logging settings.
+
+    Returns:
+        List[logging.Handler]: The handlers, each with its level and formatter.
+    """
+    formatter = create_formatter(settings)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(settings.log_console_level)
+    console_handler.setFormatter(formatter)
+    handlers = [console_handler]
+
+    if settings.log_file:
+        if settings.log_rotation == "size":
+            file_handler = logging.handlers.RotatingFileHandler(
+                settings.log_file, maxBytes=settings.log_max_bytes, backupCount=settings.log_backup_count
+            )
+        elif settings.log_rotation == "time":
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                settings.log_file, when=settings.log_rotate_when, backupCount=settings.log_backup_count
+            )
+        else:
+            file_handler = logging.FileHandler(settings.log_file)
+        file_handler.setLevel(settings.log_file_level)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    return handlers
+
+
+def create_pipeline(settings: Settings, handlers: List[logging.Handler]):
+    """
+    Put the queue and the debug sampler in front of the output handlers.
+
+    With `log_queue` set, loggers only put records on a queue and the
+    handlers run on a `QueueListener` thread, so a log call never waits for
+    the console or the disk.
+
+    Args:
+        settings (Settings): The logging settings.
+        handlers (List[logging.Handler]): The output handlers, from `create_handlers`.
+
+    Returns:
+        Tuple[List[logging.Handler], Optional[QueueListener]]: The handlers to
+        attach to loggers, and the started listener, if any.
+    """
+    listener = None
+    if settings.log_queue:
+        queue_handler = LocalQueueHandler(queue.Queue(settings.log_queue_size))
+        listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        listener.start()
+        handlers = [queue_handler]
+    if settings.log_debug_sample_rate < 1:
+        sampler = DebugSampler(settings.log_debug_sample_rate)
+        for handler in handlers:
+            handler.addFilter(sampler)
+    return handlers, listener
+
 
 class Logger:
     """
@@ -18,20 +183,29 @@ class Logger:
     def initialize_logger(self):
         """
         Initialize the logger with desired configuration.
+
+        The queue listener, if any, is stopped, and its queue drained, when
+        the process exits.
+
+        Loggers named in `log_levels` get their own level; those outside
+        "my_app", e.g. "sqlalchemy.engine", are routed to the same handlers.
         """
+        settings = get_settings()
         self.logger = logging.getLogger("my_app")
-        self.logger.setLevel(logging.DEBUG)
+        self.logger.setLevel(settings.log_level)
 
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
+        handlers, self.listener = create_pipeline(settings, create_handlers(settings))
+        if self.listener is not None:
+            atexit.register(self.listener.stop)
 
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.DEBUG)
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
+        for handler in handlers:
+            self.logger.addHandler(handler)
+        for name, level in settings.log_levels.items():
+            other = logging.getLogger(name)
+            other.setLevel(level)
+            if name != "my_app" and not name.startswith("my_app."):
+                other.propagate = False
+                for handler in handlers:
+                    other.addHandler(handler)
 
-        file_handler = logging.FileHandler("logger/app.log")
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
+        self.logger.info("Loading settings for: %s", settings.env_name)
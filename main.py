@@ -1,16 +1,91 @@
-from config.database import Base
-from config.database import engine
-from routers import document_router, user_router
+import asyncio
+from config.database import check_schema
+from config.settings import get_settings
+from routers import document_router, metrics_router, user_router
 from fastapi import FastAPI
+from services.document_service import expire_pending_uploads
+from services.text_extraction_service import TextExtractionService
+from utils.cache import get_cache, get_token_cache
+from utils.metrics import MetricsMiddleware, flush_snapshots, write_snapshot
+from utils.query_stats import QueryStatsMiddleware
+from utils.upload_limit import UploadSizeLimitMiddleware
 from mangum import Mangum
 
 
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI()
+# Set by `handler`: under Lambda the startup handlers run on every invocation.
+app.state.serverless = False
 
 app.include_router(document_router.router)
 app.include_router(user_router.router)
 
-handler = Mangum(app=app)
+# The last middleware added runs first: metrics are recorded around the query stats.
+app.add_middleware(UploadSizeLimitMiddleware)
+if get_settings().db_query_stats:
+    app.add_middleware(QueryStatsMiddleware)
+if get_settings().metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router.router)
+
+background_jobs = set()
+
+
+def start_background_job(coroutine):
+    job = asyncio.create_task(coroutine)
+    background_jobs.add(job)
+    job.add_done_callback(background_jobs.discard)
+
+
+@app.on_event("startup")
+async def verify_schema():
+    # The schema is created by `alembic upgrade head`, not by the app.
+    await check_schema()
+
+
+@app.on_event("startup")
+async def create_caches():
+    # Fails at startup, not on the first request, when the cache backend cannot be created.
+    get_cache()
+    get_token_cache()
+
+
+@app.on_event("startup")
+async def resume_text_extraction():
+    # Picks up uploads whose text extraction was interrupted, e.g. by a restart.
+    # Not under Lambda, where the job would be cancelled as soon as the invocation ends.
+    if get_settings().text_extraction_resume and not app.state.serverless:
+        start_background_job(TextExtractionService().resume())
+
+
+@app.on_event("startup")
+async def start_pending_upload_cleanup():
+    # Deletes presigned uploads that were reserved but never completed.
+    settings = get_settings()
+    if settings.pending_upload_cleanup_seconds and not app.state.serverless:
+        start_background_job(expire_pending_uploads(settings.pending_upload_cleanup_seconds))
+
+
+@app.on_event("startup")
+async def start_metrics_flush():
+    # Lets `/metrics` of any worker report the requests of all of them.
+    settings = get_settings()
+    if settings.metrics_enabled and settings.metrics_multiprocess_dir:
+        start_background_job(flush_snapshots(settings.metrics_multiprocess_dir, settings.metrics_flush_seconds))
+
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    # Interrupted extractions are claimed again once their lease expires.
+    for job in background_jobs:
+        job.cancel()
+    settings = get_settings()
+    if settings.metrics_enabled and settings.metrics_multiprocess_dir:
+        write_snapshot(settings.metrics_multiprocess_dir)
+
+
+mangum = Mangum(app=app)
+
 
+def handler(event, context):
+    app.state.serverless = True
+    return mangum(event, context)
@@ -6,6 +6,7 @@ from sqlalchemy import pool
 from alembic import context
 
 from config.database import Base
+from config.settings import get_settings
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -16,6 +17,9 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Migrate the database the app is configured with. `%` is escaped for configparser.
+config.set_main_option("sqlalchemy.url", get_settings().db_url.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -0,0 +1,30 @@
+"""Added document status
+
+Revision ID: 1930932c62cd
+Revises: 5fd4e2ffcd14
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1930932c62cd'
+down_revision = '5fd4e2ffcd14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Documents reserved for a presigned upload stay "pending" until the
+    # upload is confirmed.
+    op.add_column(
+        'documents',
+        sa.Column('status', sa.String(length=32), nullable=False, server_default='available')
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_column('status')
@@ -0,0 +1,27 @@
+"""Added created_at, id indexes
+
+Revision ID: 1a49d29f0650
+Revises: 1930932c62cd
+Create Date: 2026-10-17 10:03:17.542871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a49d29f0650'
+down_revision = '1930932c62cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keyset pagination walks these indexes in (created_at, id) order.
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+    op.create_index('ix_documents_created_at_id', 'documents', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_created_at_id', table_name='documents')
+    op.drop_index('ix_users_created_at_id', table_name='users')
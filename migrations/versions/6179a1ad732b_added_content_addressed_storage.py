@@ -0,0 +1,39 @@
+"""Added content addressed storage
+
+Revision ID: 6179a1ad732b
+Revises: 929418276fa5
+Create Date: 2026-10-17 18:12:07.214538
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6179a1ad732b'
+down_revision = '929418276fa5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # One row per distinct uploaded file, shared by the documents using it.
+    op.create_table(
+        'stored_objects',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+    op.add_column('documents', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('documents', sa.Column('size_bytes', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_column('size_bytes')
+        batch_op.drop_column('content_hash')
+    op.drop_table('stored_objects')
@@ -0,0 +1,29 @@
+"""Added document owner index
+
+Revision ID: 929418276fa5
+Revises: 1a49d29f0650
+Create Date: 2026-10-17 10:41:55.901366
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '929418276fa5'
+down_revision = '1a49d29f0650'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Owner-scoped listings filter on owner_id and walk (created_at, id) in order.
+    op.create_index(
+        'ix_documents_owner_id_created_at_id',
+        'documents',
+        ['owner_id', 'created_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_owner_id_created_at_id', table_name='documents')
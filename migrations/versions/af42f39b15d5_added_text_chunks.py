@@ -0,0 +1,93 @@
+"""Added text chunks
+
+Revision ID: af42f39b15d5
+Revises: ee7975fa5615
+Create Date: 2026-10-17 19:02:36.518240
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'af42f39b15d5'
+down_revision = 'ee7975fa5615'
+branch_labels = None
+depends_on = None
+
+# Mirrors `utils.search`; migrations keep their own copy so they do not change with it.
+CHUNK_SEARCH_DDL = {
+    'sqlite': (
+        "CREATE VIRTUAL TABLE text_chunks_fts USING fts5("
+        "text, content='text_chunks', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER text_chunks_fts_insert AFTER INSERT ON text_chunks BEGIN "
+        "INSERT INTO text_chunks_fts(rowid, text) VALUES (new.id, new.text); "
+        "END",
+        "CREATE TRIGGER text_chunks_fts_delete AFTER DELETE ON text_chunks BEGIN "
+        "INSERT INTO text_chunks_fts(text_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+        "END",
+    ),
+    'postgresql': (
+        "ALTER TABLE text_chunks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', text), 'C')"
+        ") STORED",
+        "CREATE INDEX ix_text_chunks_search_vector ON text_chunks USING gin (search_vector)",
+    ),
+}
+
+CHUNK_SEARCH_DROP_DDL = {
+    'sqlite': (
+        "DROP TRIGGER IF EXISTS text_chunks_fts_delete",
+        "DROP TRIGGER IF EXISTS text_chunks_fts_insert",
+        "DROP TABLE IF EXISTS text_chunks_fts",
+    ),
+    'postgresql': (
+        "DROP INDEX IF EXISTS ix_text_chunks_search_vector",
+    ),
+}
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('stored_objects') as batch_op:
+        batch_op.add_column(sa.Column('text_status', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('text_claimed_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('text_extracted_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('text_extraction_ms', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('text_size_bytes', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('text_chunk_count', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_stored_objects_text_status', ['text_status'])
+    op.create_index('ix_documents_content_hash', 'documents', ['content_hash'])
+    op.create_table(
+        'text_chunks',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('page', sa.Integer(), nullable=True),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['content_hash'], ['stored_objects.content_hash'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_text_chunks_content_hash_position', 'text_chunks', ['content_hash', 'position'], unique=True)
+    for statement in CHUNK_SEARCH_DDL.get(op.get_bind().dialect.name, ()):
+        op.execute(statement)
+    # Queue the PDFs uploaded so far; the application extracts them on startup.
+    op.execute(
+        "UPDATE stored_objects SET text_status = 'pending' "
+        "WHERE content_type = 'application/pdf' AND text_status IS NULL"
+    )
+
+
+def downgrade() -> None:
+    for statement in CHUNK_SEARCH_DROP_DDL.get(op.get_bind().dialect.name, ()):
+        op.execute(statement)
+    op.drop_index('ix_text_chunks_content_hash_position', table_name='text_chunks')
+    op.drop_table('text_chunks')
+    op.drop_index('ix_documents_content_hash', table_name='documents')
+    with op.batch_alter_table('stored_objects') as batch_op:
+        batch_op.drop_index('ix_stored_objects_text_status')
+        batch_op.drop_column('text_chunk_count')
+        batch_op.drop_column('text_size_bytes')
+        batch_op.drop_column('text_extraction_ms')
+        batch_op.drop_column('text_extracted_at')
+        batch_op.drop_column('text_claimed_at')
+        batch_op.drop_column('text_status')
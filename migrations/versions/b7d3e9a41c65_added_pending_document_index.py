@@ -0,0 +1,32 @@
+"""Added pending document index
+
+Revision ID: b7d3e9a41c65
+Revises: af42f39b15d5
+Create Date: 2026-10-17 21:14:08.402517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e9a41c65'
+down_revision = 'af42f39b15d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The cleanup of abandoned presigned uploads looks for old pending
+    # documents; a partial index keeps it from scanning every document.
+    op.create_index(
+        'ix_documents_pending_created_at',
+        'documents',
+        ['created_at'],
+        sqlite_where=sa.text("status = 'pending'"),
+        postgresql_where=sa.text("status = 'pending'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_pending_created_at', table_name='documents')
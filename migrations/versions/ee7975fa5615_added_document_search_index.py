@@ -0,0 +1,68 @@
+"""Added document search index
+
+Revision ID: ee7975fa5615
+Revises: 6179a1ad732b
+Create Date: 2026-10-17 18:31:44.902617
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'ee7975fa5615'
+down_revision = '6179a1ad732b'
+branch_labels = None
+depends_on = None
+
+# Mirrors `utils.search`; migrations keep their own copy so they do not change with it.
+SEARCH_DDL = {
+    'sqlite': (
+        "CREATE VIRTUAL TABLE documents_fts USING fts5("
+        "title, description, content='documents', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER documents_fts_insert AFTER INSERT ON documents BEGIN "
+        "INSERT INTO documents_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+        "CREATE TRIGGER documents_fts_delete AFTER DELETE ON documents BEGIN "
+        "INSERT INTO documents_fts(documents_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "END",
+        "CREATE TRIGGER documents_fts_update AFTER UPDATE OF title, description ON documents BEGIN "
+        "INSERT INTO documents_fts(documents_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO documents_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+        # Index the documents that already exist.
+        "INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')",
+    ),
+    'postgresql': (
+        # Adding a stored generated column computes it for the existing rows.
+        "ALTER TABLE documents ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+        ") STORED",
+        "CREATE INDEX ix_documents_search_vector ON documents USING gin (search_vector)",
+    ),
+}
+
+SEARCH_DROP_DDL = {
+    'sqlite': (
+        "DROP TRIGGER IF EXISTS documents_fts_update",
+        "DROP TRIGGER IF EXISTS documents_fts_delete",
+        "DROP TRIGGER IF EXISTS documents_fts_insert",
+        "DROP TABLE IF EXISTS documents_fts",
+    ),
+    'postgresql': (
+        "DROP INDEX IF EXISTS ix_documents_search_vector",
+        "ALTER TABLE documents DROP COLUMN IF EXISTS search_vector",
+    ),
+}
+
+
+def upgrade() -> None:
+    for statement in SEARCH_DDL.get(op.get_bind().dialect.name, ()):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in SEARCH_DROP_DDL.get(op.get_bind().dialect.name, ()):
+        op.execute(statement)
@@ -3,9 +3,15 @@ This file defines the Document model for the application.
 It represents a document entity in the database.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import BigInteger, DDL, Index, Column, Integer, String, DateTime, ForeignKey, event, text
 from sqlalchemy.orm import relationship
 from config.database import Base
+from utils.search import SEARCH_DDL, SEARCH_DROP_DDL
+
+# Documents reserved for a presigned upload stay pending until the upload is confirmed.
+STATUS_PENDING = "pending"
+STATUS_AVAILABLE = "available"
+
 
 class Document(Base):
     """
@@ -17,6 +23,19 @@ class Document(Base):
     """
 
     __tablename__ = "documents"
+    __table_args__ = (
+        # Backs keyset pagination on (created_at, id).
+        Index("ix_documents_created_at_id", "created_at", "id"),
+        # Backs owner-scoped listings in the same order.
+        Index("ix_documents_owner_id_created_at_id", "owner_id", "created_at", "id"),
+        # Joins documents to the text extracted from their stored object.
+        Index("ix_documents_content_hash", "content_hash"),
+        # Finds abandoned presigned uploads; only pending documents are indexed.
+        Index(
+            "ix_documents_pending_created_at", "created_at",
+            sqlite_where=text("status = 'pending'"), postgresql_where=text("status = 'pending'")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
@@ -24,7 +43,21 @@ class Document(Base):
     file_type = Column(String)
     file_url = Column(String)
     description = Column(String)
+    status = Column(String, nullable=False, default=STATUS_AVAILABLE, server_default=STATUS_AVAILABLE)
+    # Set for uploaded files, which live in storage as a shared `StoredObject`.
+    content_hash = Column(String(64))
+    size_bytes = Column(BigInteger)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
     owner = relationship("User", back_populates="documents")
+
+
+# The full-text index lives outside the model (see `utils.search`); create it
+# with the table so databases made by `create_all` match the migrations.
+for dialect, statements in SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Document.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+for dialect, statements in SEARCH_DROP_DDL.items():
+    for statement in statements:
+        event.listen(Document.__table__, "before_drop", DDL(statement).execute_if(dialect=dialect))
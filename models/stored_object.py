@@ -0,0 +1,41 @@
+"""
+This file defines the StoredObject model for the application.
+It represents a file in storage, shared by every document with the same content.
+"""
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String
+from config.database import Base
+
+
+class StoredObject(Base):
+    """
+    StoredObject model representing a content-addressed file in storage.
+
+    Uploads are keyed by the SHA-256 of their content, so identical files are
+    stored once. `ref_count` is the number of documents using the object; the
+    object is deleted from storage once it drops to zero.
+
+    Objects whose type has text are queued for extraction with `text_status`
+    "pending"; the `text_*` columns then record how extraction went.
+    """
+
+    __tablename__ = "stored_objects"
+    __table_args__ = (
+        # Backs the lookup of objects waiting for text extraction.
+        Index("ix_stored_objects_text_status", "text_status"),
+    )
+
+    content_hash = Column(String(64), primary_key=True)
+    key = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    content_type = Column(String)
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # None, or one of "pending", "extracting", "done" and "failed".
+    text_status = Column(String)
+    # When a worker claimed the extraction; a stale claim is taken over.
+    text_claimed_at = Column(DateTime)
+    text_extracted_at = Column(DateTime)
+    text_extraction_ms = Column(Integer)
+    text_size_bytes = Column(BigInteger)
+    text_chunk_count = Column(Integer)
@@ -0,0 +1,37 @@
+"""
+This file defines the TextChunk model for the application.
+It represents a piece of the text extracted from a stored file.
+"""
+from sqlalchemy import Column, DDL, ForeignKey, Index, Integer, String, Text, event
+from config.database import Base
+from utils.search import CHUNK_SEARCH_DDL, CHUNK_SEARCH_DROP_DDL
+
+
+class TextChunk(Base):
+    """
+    TextChunk model representing a piece of the text of a `StoredObject`.
+
+    Text is extracted once per stored file, so documents sharing a file share
+    its chunks. Chunks are numbered by `position` in reading order and keep
+    the page they come from.
+    """
+
+    __tablename__ = "text_chunks"
+    __table_args__ = (
+        Index("ix_text_chunks_content_hash_position", "content_hash", "position", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_hash = Column(String(64), ForeignKey("stored_objects.content_hash", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    page = Column(Integer)
+    text = Column(Text, nullable=False)
+
+
+# Like the document index, the chunk index lives outside the model (see `utils.search`).
+for dialect, statements in CHUNK_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(TextChunk.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+for dialect, statements in CHUNK_SEARCH_DROP_DDL.items():
+    for statement in statements:
+        event.listen(TextChunk.__table__, "before_drop", DDL(statement).execute_if(dialect=dialect))
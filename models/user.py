@@ -3,7 +3,7 @@ This file defines the User model for the application.
 It represents the user entity in the database.
 """
 from datetime import datetime
-from sqlalchemy import Boolean, Column, Integer, String, DateTime
+from sqlalchemy import Index, Boolean, Column, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -18,6 +18,10 @@ class User(Base):
     """
 
     __tablename__ = "users"
+    __table_args__ = (
+        # Backs keyset pagination on (created_at, id).
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     email = Column(String, unique=True, index=True)
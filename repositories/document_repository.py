@@ -1,10 +1,22 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import cast, delete, func, inspect, insert, literal_column, select, text, tuple_, union_all, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import schemas.document as document_schemas
 import models.document as document_models
+import models.text_chunk as text_chunk_models
+from config.settings import get_settings
+from repositories.stored_object_repository import StoredObjectRepository
+from utils.cache import document_key, from_cache, get_cache, to_cache, user_key
+from utils.search import CONTENT_WEIGHT, DESCRIPTION_WEIGHT, SEARCH_CONFIG, TITLE_WEIGHT, fts5_query
 
 class DocumentRepository:
     """
-    Repository class for handling database operations related to documents.
+    Repository class for reading documents on a sync `Session`.
+
+    The app reads and writes through `AsyncDocumentRepository`; this class
+    is kept as the sync baseline of the benchmarks.
     """
 
     def __init__(self, db: Session):
@@ -16,54 +28,450 @@ class DocumentRepository:
         """
         self.db = db
 
-    def create_document(self, document: document_schemas.DocumentCreate):
+    def get_document(self, document_id: int):
+        """
+        Get a document by ID.
+
+        Args:
+            document_id (int): The ID of the document.
+
+        Returns:
+            Document: The retrieved document.
+        """
+        return self.db.query(document_models.Document).filter(document_models.Document.id == document_id).first()
+
+    def get_documents(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        owner_id: Optional[int] = None
+    ):
+        """
+        Get a page of documents, newest first.
+
+        Uses keyset pagination on `(created_at, id)`, so deep pages cost the
+        same as the first one. Filtering by owner is served by the
+        `(owner_id, created_at, id)` index. Pending documents are left out.
+
+        Args:
+            limit (int): The maximum number of documents to return.
+            after (Optional[Tuple[datetime, int]]): The `(created_at, id)` key to resume after.
+            owner_id (Optional[int]): Only return documents owned by this user.
+
+        Returns:
+            List[Document]: The documents of the page.
+        """
+        query = self.db.query(document_models.Document).filter(
+            document_models.Document.status == document_models.STATUS_AVAILABLE
+        )
+        if owner_id is not None:
+            query = query.filter(document_models.Document.owner_id == owner_id)
+        if after:
+            query = query.filter(
+                tuple_(document_models.Document.created_at, document_models.Document.id) < tuple_(*after)
+            )
+        return query.order_by(
+            document_models.Document.created_at.desc(), document_models.Document.id.desc()
+        ).limit(limit).all()
+
+
+class AsyncDocumentRepository:
+    """
+    Async repository class for handling database operations related to documents.
+
+    It is used by the async routes.
+    Single-document reads go through the entity cache, which the write methods invalidate.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Initialize the AsyncDocumentRepository.
+
+        Args:
+            db (AsyncSession): The SQLAlchemy async database session.
+        """
+        self.db = db
+
+    async def create_document(self, document: document_models.Document):
         """
         Create a new document.
 
         Args:
             document (Document): The document to be created.
+
+        Returns:
+            Document: The created document.
         """
         try:
             self.db.add(document)
-            self.db.commit()
+            await self.db.commit()
         except:
-            self.db.rollback()
-        finally:
-            self.db.close()
+            await self.db.rollback()
+            raise
+        await self.db.refresh(document)
+        await self.invalidate(document)
+        return document
 
-    def get_document(self, document_id: int):
+    async def get_document(self, document_id: int, cached: bool = True):
         """
         Get a document by ID.
 
         Args:
             document_id (int): The ID of the document.
+            cached (bool): Whether the entity cache may serve the document. A
+                cached document is detached; pass False to get a row that can be modified.
 
         Returns:
             Document: The retrieved document.
         """
-        return self.db.query(document_models.Document).filter(document_models.Document.id == document_id).first()
+        cache = get_cache()
+        if cached:
+            data = await cache.get(document_key(document_id))
+            if data is not None:
+                return from_cache(document_models.Document, data)
+        document = await self.db.get(document_models.Document, document_id)
+        if document is not None:
+            await cache.set(document_key(document_id), to_cache(document))
+        return document
+
+    async def get_document_version(self, document_id: int) -> Optional[Tuple[int, Optional[datetime]]]:
+        """
+        Get the `updated_at` of a document without loading the whole row.
+
+        The entity cache is consulted first; on a miss only the `updated_at`
+        column is selected. Used to answer conditional requests cheaply.
+
+        Args:
+            document_id (int): The ID of the document.
+
+        Returns:
+            Optional[Tuple[int, Optional[datetime]]]: The ID and update time, or None if not found.
+        """
+        data = await get_cache().get(document_key(document_id))
+        if data is not None:
+            return data["id"], data["updated_at"]
+        query = select(document_models.Document.id, document_models.Document.updated_at).where(
+            document_models.Document.id == document_id
+        )
+        return (await self.db.execute(query)).first()
+
+    async def get_documents(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        owner_id: Optional[int] = None
+    ):
+        """
+        Get a page of documents, newest first.
+
+        Uses keyset pagination on `(created_at, id)`, so deep pages cost the
+        same as the first one. Filtering by owner is served by the
+        `(owner_id, created_at, id)` index. Pending documents are left out.
+
+        Args:
+            limit (int): The maximum number of documents to return.
+            after (Optional[Tuple[datetime, int]]): The `(created_at, id)` key to resume after.
+            owner_id (Optional[int]): Only return documents owned by this user.
+
+        Returns:
+            List[Document]: The documents of the page.
+        """
+        query = select(document_models.Document).where(
+            document_models.Document.status == document_models.STATUS_AVAILABLE
+        )
+        if owner_id is not None:
+            query = query.where(document_models.Document.owner_id == owner_id)
+        if after:
+            query = query.where(
+                tuple_(document_models.Document.created_at, document_models.Document.id) < tuple_(*after)
+            )
+        query = query.order_by(
+            document_models.Document.created_at.desc(), document_models.Document.id.desc()
+        ).limit(limit)
+        return (await self.db.scalars(query)).all()
+
+    async def search_documents(
+        self,
+        q: str,
+        limit: int,
+        after: Optional[Tuple[float, int]] = None,
+        owner_id: Optional[int] = None
+    ) -> List[Row]:
+        """
+        Get a page of the documents matching a full-text query, most relevant first.
+
+        Documents match on their title and description, or on the text
+        extracted from their file, through the full-text index (see
+        `utils.search`); a document matching both gets its best score. Results
+        are ordered by `(score, id)` descending, a higher score being more
+        relevant, and pages resume strictly after the `(score, id)` of the
+        previous page. Pending documents are left out.
+
+        Args:
+            q (str): The text to search for; every word must match.
+            limit (int): The maximum number of documents to return.
+            after (Optional[Tuple[float, int]]): The `(score, id)` key to resume after.
+            owner_id (Optional[int]): Only return documents owned by this user.
+
+        Returns:
+            List[Row]: `(Document, score)` rows.
+        """
+        Document, TextChunk = document_models.Document, text_chunk_models.TextChunk
+        if self.db.get_bind().dialect.name == "postgresql":
+            # The Postgres dialect is only loaded by deployments that use it.
+            from sqlalchemy.dialects.postgresql import REGCONFIG
+
+            tsquery = func.websearch_to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), q)
+            vector = literal_column("documents.search_vector")
+            chunk_vector = literal_column("text_chunks.search_vector")
+            metadata_matches = select(
+                Document.id, func.ts_rank_cd(vector, tsquery).label("score")
+            ).where(vector.op("@@")(tsquery))
+            chunk_matches = select(
+                TextChunk.content_hash, func.max(func.ts_rank_cd(chunk_vector, tsquery)).label("score")
+            ).where(chunk_vector.op("@@")(tsquery)).group_by(TextChunk.content_hash)
+        else:
+            query = fts5_query(q)
+            if query is None:
+                return []
+            # bm25() is lower for better matches; negate it so both dialects sort descending.
+            # It can only run in the query scanning the FTS table, so those
+            # queries are materialized rather than merged into the joins.
+            fts = literal_column("documents_fts")
+            metadata_matches = select(
+                literal_column("documents_fts.rowid").label("id"),
+                (-func.bm25(fts, TITLE_WEIGHT, DESCRIPTION_WEIGHT)).label("score")
+            ).select_from(text("documents_fts")).where(fts.op("MATCH")(query)).cte(
+                "metadata_matches"
+            ).prefix_with("MATERIALIZED")
+            metadata_matches = select(metadata_matches.c.id, metadata_matches.c.score)
+            chunk_fts = literal_column("text_chunks_fts")
+            chunk_scores = select(
+                literal_column("text_chunks_fts.rowid").label("id"),
+                (-func.bm25(chunk_fts, CONTENT_WEIGHT)).label("score")
+            ).select_from(text("text_chunks_fts")).where(chunk_fts.op("MATCH")(query)).cte(
+                "chunk_scores"
+            ).prefix_with("MATERIALIZED")
+            chunk_matches = select(
+                TextChunk.content_hash, func.max(chunk_scores.c.score).label("score")
+            ).join(chunk_scores, TextChunk.id == chunk_scores.c.id).group_by(TextChunk.content_hash)
 
-    def update_document(self, document_data: document_schemas.DocumentUpdate):
+        chunk_matches = chunk_matches.cte("chunk_matches")
+        content_matches = select(Document.id, chunk_matches.c.score).join(
+            chunk_matches, Document.content_hash == chunk_matches.c.content_hash
+        )
+        all_matches = union_all(metadata_matches, content_matches).subquery()
+        matches = select(
+            all_matches.c.id, func.max(all_matches.c.score).label("score")
+        ).group_by(all_matches.c.id).cte("matches")
+
+        query = select(Document, matches.c.score).join(matches, Document.id == matches.c.id).where(
+            Document.status == document_models.STATUS_AVAILABLE
+        )
+        if owner_id is not None:
+            query = query.where(Document.owner_id == owner_id)
+        if after:
+            query = query.where(tuple_(matches.c.score, matches.c.id) < tuple_(*after))
+        query = query.order_by(matches.c.score.desc(), matches.c.id.desc()).limit(limit)
+        return (await self.db.execute(query)).all()
+
+    async def update_document(self, document: document_models.Document):
         """
-        Update an existing document.
+        Persist the changes made to a document.
+
+        If the document stopped using a stored object, its reference is
+        released in the same transaction.
 
         Args:
             document (Document): The document to be updated.
+
+        Returns:
+            Document: The updated document.
+        """
+        await StoredObjectRepository(self.db).release(inspect(document).attrs.content_hash.history.deleted)
+        await self.db.commit()
+        await self.invalidate(document)
+        return document
+
+    async def delete_document(self, document: document_models.Document) -> bool:
+        """
+        Delete a document.
+
+        Args:
+            document (Document): The document to be deleted.
+
+        Returns:
+            bool: True once the document is deleted.
+        """
+        await self.db.delete(document)
+        await StoredObjectRepository(self.db).release([document.content_hash])
+        await self.db.commit()
+        await self.invalidate(document)
+        return True
+
+    async def delete_pending_documents(self, before: datetime) -> List[Row]:
+        """
+        Delete the documents still pending that were reserved before some time.
+
+        Args:
+            before (datetime): Delete the pending documents created before this time.
+
+        Returns:
+            List[Row]: The `id` and `file_url` of each deleted document.
+        """
+        query = delete(document_models.Document).where(
+            document_models.Document.status == document_models.STATUS_PENDING,
+            document_models.Document.created_at < before
+        ).returning(document_models.Document.id, document_models.Document.file_url)
+        try:
+            deleted = (await self.db.execute(query)).all()
+            await self.db.commit()
+        except:
+            await self.db.rollback()
+            raise
+        await get_cache().delete(*(document_key(row.id) for row in deleted))
+        return deleted
+
+    async def bulk_create_documents(self, rows: List[dict]) -> List[int]:
+        """
+        Insert documents with multi-row INSERTs, in one transaction.
+
+        Rows are sent in batches of `bulk_batch_size`.
+
+        Args:
+            rows (List[dict]): The column values of each document.
+
+        Returns:
+            List[int]: The IDs of the created documents, in the order of `rows`.
+        """
+        batch_size = get_settings().bulk_batch_size
+        query = insert(document_models.Document).returning(
+            document_models.Document.id, sort_by_parameter_order=True
+        )
+        ids = []
+        try:
+            for start in range(0, len(rows), batch_size):
+                ids.extend((await self.db.scalars(query, rows[start:start + batch_size])).all())
+            await self.db.commit()
+        except:
+            await self.db.rollback()
+            raise
+        await self.invalidate_many((None, row.get("owner_id")) for row in rows)
+        return ids
+
+    async def bulk_update_documents(self, rows: List[dict]) -> Tuple[List[int], List[str]]:
+        """
+        Update documents by primary key, in one transaction.
+
+        The existing IDs are looked up with `WHERE id IN`, then the rows are
+        sent as executemany UPDATEs, in batches of `bulk_batch_size`. Documents
+        whose `file_url` moves away from their stored object release it.
+
+        Args:
+            rows (List[dict]): The changed column values of each document, including its `id`.
+
+        Returns:
+            Tuple[List[int], List[str]]: The IDs that existed and were updated,
+            and the hashes of the released stored objects.
         """
-        doc = self.db.query(document_models.Document).filter(document_models.Document.id == document_data.id).first()
-        doc.title = document_data.get('title')
-        doc.file_type = document_data.get('file_type')
-        doc.file_url = document_data.get('file_url')
-        doc.description = document_data.get('description')
-        self.db.commit()
+        batch_size = get_settings().bulk_batch_size
+        existing = await self.get_existing([row["id"] for row in rows])
+        rows = [row for row in rows if row["id"] in existing]
+        released = []
+        for row in rows:
+            current = existing[row["id"]]
+            if current.content_hash and row.get("file_url", current.file_url) != current.file_url:
+                row.update(content_hash=None, size_bytes=None)
+                released.append(current.content_hash)
+        try:
+            for start in range(0, len(rows), batch_size):
+                await self.db.execute(update(document_models.Document), rows[start:start + batch_size])
+            await StoredObjectRepository(self.db).release(released)
+            await self.db.commit()
+        except:
+            await self.db.rollback()
+            raise
+        await self.invalidate_many((document_id, current.owner_id) for document_id, current in existing.items())
+        return list(existing), released
 
-    def delete_document(self, document_id: int):
+    async def bulk_delete_documents(self, ids: List[int]) -> Dict[int, Optional[str]]:
         """
-        Delete a document by ID.
+        Delete documents with `DELETE ... WHERE id IN`, in one transaction.
+
+        The references of the deleted documents on stored objects are released.
 
         Args:
-            document_id (int): The ID of the document to be deleted.
+            ids (List[int]): The IDs of the documents to delete.
+
+        Returns:
+            Dict[int, Optional[str]]: The `content_hash` of each deleted document, by ID.
         """
-        doc = self.db.query(document_models.Document).filter(document_models.Document.id == document_id).first()
-        return doc.delete()
+        batch_size = get_settings().bulk_batch_size
+        deleted = []
+        try:
+            for start in range(0, len(ids), batch_size):
+                query = delete(document_models.Document).where(
+                    document_models.Document.id.in_(ids[start:start + batch_size])
+                ).returning(
+                    document_models.Document.id,
+                    document_models.Document.owner_id,
+                    document_models.Document.content_hash
+                ).execution_options(synchronize_session=False)
+                deleted.extend((await self.db.execute(query)).all())
+            await StoredObjectRepository(self.db).release(row.content_hash for row in deleted)
+            await self.db.commit()
+        except:
+            await self.db.rollback()
+            raise
+        await self.invalidate_many((row.id, row.owner_id) for row in deleted)
+        return {row.id: row.content_hash for row in deleted}
 
+    async def get_existing(self, ids: List[int]) -> Dict[int, Row]:
+        """
+        Get the owner and stored object of the existing documents among `ids`.
+
+        Args:
+            ids (List[int]): The IDs of the documents.
+
+        Returns:
+            Dict[int, Row]: The `owner_id`, `file_url` and `content_hash` of each existing document, by ID.
+        """
+        batch_size = get_settings().bulk_batch_size
+        existing = {}
+        for start in range(0, len(ids), batch_size):
+            query = select(
+                document_models.Document.id,
+                document_models.Document.owner_id,
+                document_models.Document.file_url,
+                document_models.Document.content_hash
+            ).where(document_models.Document.id.in_(ids[start:start + batch_size]))
+            existing.update((row.id, row) for row in (await self.db.execute(query)).all())
+        return existing
+
+    async def invalidate_many(self, documents: Iterable[Tuple[Optional[int], Optional[int]]]):
+        """
+        Drop documents, and the cached owners that embed them, from the entity cache.
+
+        Args:
+            documents (Iterable[Tuple[Optional[int], Optional[int]]]): `(id, owner_id)` pairs;
+                either may be None, e.g. for new documents.
+        """
+        keys = set()
+        for document_id, owner_id in documents:
+            if document_id is not None:
+                keys.add(document_key(document_id))
+            if owner_id is not None:
+                keys.add(user_key(owner_id))
+        await get_cache().delete(*keys)
+
+    async def invalidate(self, document: document_models.Document):
+        """
+        Drop a document, and the cached owner that embeds it, from the entity cache.
+
+        Args:
+            document (Document): The document that changed.
+        """
+        keys = [document_key(document.id)]
+        if document.owner_id is not None:
+            keys.append(user_key(document.owner_id))
+        await get_cache().delete(*keys)
@@ -0,0 +1,232 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from collections import Counter
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+import models.stored_object as stored_object_models
+from repositories.text_chunk_repository import TextChunkRepository
+from services.storage.base import Storage
+
+TEXT_PENDING = "pending"
+TEXT_EXTRACTING = "extracting"
+TEXT_DONE = "done"
+TEXT_FAILED = "failed"
+
+
+class StoredObjectRepository:
+    """
+    Async repository class for the reference-counted objects behind uploaded documents.
+
+    `acquire`, `add` and `release` only stage their changes; they are
+    committed with the document changes they belong to, so a document and
+    its reference are always written together.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Initialize the StoredObjectRepository.
+
+        Args:
+            db (AsyncSession): The SQLAlchemy async database session.
+        """
+        self.db = db
+
+    async def get_key(self, content_hash: str) -> Optional[str]:
+        """
+        Get the storage key of the object with some content, without taking a reference.
+
+        Args:
+            content_hash (str): The SHA-256 of the content.
+
+        Returns:
+            Optional[str]: The storage key, or None if there is no object with this content.
+        """
+        query = select(stored_object_models.StoredObject.key).where(
+            stored_object_models.StoredObject.content_hash == content_hash
+        )
+        return (await self.db.scalars(query)).first()
+
+    async def acquire(self, content_hash: str) -> Optional[str]:
+        """
+        Take a reference on an existing object.
+
+        Args:
+            content_hash (str): The SHA-256 of the content.
+
+        Returns:
+            Optional[str]: The storage key of the object, or None if there is no object with this content.
+        """
+        query = update(stored_object_models.StoredObject).where(
+            stored_object_models.StoredObject.content_hash == content_hash
+        ).values(
+            ref_count=stored_object_models.StoredObject.ref_count + 1
+        ).returning(stored_object_models.StoredObject.key)
+        return (await self.db.scalars(query)).first()
+
+    async def add(self, content_hash: str, key: str, size_bytes: int, content_type: str, has_text: bool = False):
+        """
+        Record a new object with a single reference.
+
+        Args:
+            content_hash (str): The SHA-256 of the content.
+            key (str): The storage key of the object.
+            size_bytes (int): The size of the object.
+            content_type (str): The MIME type of the object.
+            has_text (bool): Whether to queue the object for text extraction.
+
+        Raises:
+            IntegrityError: If a concurrent upload recorded the same content first.
+        """
+        self.db.add(stored_object_models.StoredObject(
+            content_hash=content_hash, key=key, size_bytes=size_bytes, content_type=content_type, ref_count=1,
+            text_status=TEXT_PENDING if has_text else None
+        ))
+        await self.db.flush()
+
+    async def release(self, content_hashes: Iterable[Optional[str]]):
+        """
+        Drop one reference per hash. None entries are ignored.
+
+        Args:
+            content_hashes (Iterable[Optional[str]]): The hashes of the released objects.
+        """
+        counts = Counter(content_hash for content_hash in content_hashes if content_hash)
+        for content_hash, count in counts.items():
+            await self.db.execute(
+                update(stored_object_models.StoredObject).where(
+                    stored_object_models.StoredObject.content_hash == content_hash
+                ).values(ref_count=stored_object_models.StoredObject.ref_count - count)
+            )
+
+    async def collect_garbage(self, content_hashes: Iterable[Optional[str]], storage: Storage) -> List[str]:
+        """
+        Delete the objects among `content_hashes` that are no longer referenced.
+
+        Each row is deleted first, which locks it, and the transaction is only
+        committed once the file is gone from storage. An upload of the same
+        content waits on that lock and then stores the file anew, so it can
+        never be left pointing at a deleted file.
+
+        Args:
+            content_hashes (Iterable[Optional[str]]): The hashes of recently released objects.
+            storage (Storage): The storage backend holding the objects.
+
+        Returns:
+            List[str]: The hashes of the deleted objects.
+        """
+        collected = []
+        for content_hash in set(filter(None, content_hashes)):
+            query = delete(stored_object_models.StoredObject).where(
+                stored_object_models.StoredObject.content_hash == content_hash,
+                stored_object_models.StoredObject.ref_count <= 0
+            ).returning(stored_object_models.StoredObject.key)
+            try:
+                key = (await self.db.scalars(query)).first()
+                if key is not None:
+                    await TextChunkRepository(self.db).delete_chunks([content_hash])
+                    await storage.delete(key)
+                    collected.append(content_hash)
+                await self.db.commit()
+            except:
+                await self.db.rollback()
+                raise
+        return collected
+
+    async def claim_text_extractions(
+        self,
+        limit: int,
+        lease_seconds: float,
+        content_hashes: Optional[List[str]] = None
+    ) -> List[Row]:
+        """
+        Claim objects waiting for text extraction, and commit the claim.
+
+        Pending objects are claimed, as are objects whose extraction was
+        claimed more than `lease_seconds` ago, since the worker that claimed
+        them is presumed dead. Finished and failed objects are never claimed
+        again, so resuming after a crash only picks up unfinished work.
+
+        Args:
+            limit (int): The maximum number of objects to claim.
+            lease_seconds (float): How long a claim stays valid.
+            content_hashes (Optional[List[str]]): Only claim among these objects.
+
+        Returns:
+            List[Row]: The `content_hash`, `key` and `content_type` of each claimed object.
+        """
+        now = datetime.utcnow()
+        StoredObject = stored_object_models.StoredObject
+        candidates = select(StoredObject.content_hash).where(or_(
+            StoredObject.text_status == TEXT_PENDING,
+            and_(
+                StoredObject.text_status == TEXT_EXTRACTING,
+                StoredObject.text_claimed_at < now - timedelta(seconds=lease_seconds)
+            )
+        ))
+        if content_hashes is not None:
+            candidates = candidates.where(StoredObject.content_hash.in_(content_hashes))
+        candidates = candidates.limit(limit).with_for_update(skip_locked=True)
+        query = update(StoredObject).where(
+            StoredObject.content_hash.in_(candidates.scalar_subquery())
+        ).values(
+            text_status=TEXT_EXTRACTING, text_claimed_at=now
+        ).returning(StoredObject.content_hash, StoredObject.key, StoredObject.content_type)
+        try:
+            claimed = (await self.db.execute(query)).all()
+            await self.db.commit()
+        except:
+            await self.db.rollback()
+            raise
+        return claimed
+
+    async def finish_text_extraction(self, content_hash: str, chunks: List[tuple], seconds: float) -> bool:
+        """
+        Store the text of an object and mark its extraction done, in one transaction.
+
+        Args:
+            content_hash (str): The SHA-256 of the object.
+            chunks (List[tuple]): The `(page, text)` chunks in reading order.
+            seconds (float): The time spent extracting the text.
+
+        Returns:
+            bool: False if the object was deleted or finished by another worker meanwhile.
+        """
+        query = update(stored_object_models.StoredObject).where(
+            stored_object_models.StoredObject.content_hash == content_hash,
+            stored_object_models.StoredObject.text_status == TEXT_EXTRACTING
+        ).values(
+            text_status=TEXT_DONE,
+            text_extracted_at=datetime.utcnow(),
+            text_extraction_ms=round(seconds * 1000),
+            text_size_bytes=sum(len(text.encode()) for _, text in chunks),
+            text_chunk_count=len(chunks)
+        ).returning(stored_object_models.StoredObject.content_hash)
+        try:
+            if (await self.db.execute(query)).first() is None:
+                await self.db.rollback()
+                return False
+            await TextChunkRepository(self.db).replace_chunks(content_hash, chunks)
+            await self.db.commit()
+        except:
+            await self.db.rollback()
+            raise
+        return True
+
+    async def fail_text_extraction(self, content_hash: str):
+        """
+        Mark the text extraction of an object as failed, so it is not retried.
+
+        Args:
+            content_hash (str): The SHA-256 of the object.
+        """
+        try:
+            await self.db.execute(
+                update(stored_object_models.StoredObject).where(
+                    stored_object_models.StoredObject.content_hash == content_hash
+                ).values(text_status=TEXT_FAILED)
+            )
+            await self.db.commit()
+        except:
+            await self.db.rollback()
+            raise
@@ -0,0 +1,53 @@
+from typing import Iterable, List, Tuple
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import models.text_chunk as text_chunk_models
+from config.settings import get_settings
+
+
+class TextChunkRepository:
+    """
+    Async repository class for the text extracted from stored objects.
+
+    Writes are only staged; they are committed with the extraction status of
+    their object, so an object is never marked done with part of its text.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Initialize the TextChunkRepository.
+
+        Args:
+            db (AsyncSession): The SQLAlchemy async database session.
+        """
+        self.db = db
+
+    async def replace_chunks(self, content_hash: str, chunks: List[Tuple[int, str]]):
+        """
+        Replace the text of an object, in batches of `bulk_batch_size` rows.
+
+        Args:
+            content_hash (str): The SHA-256 of the object.
+            chunks (List[Tuple[int, str]]): The `(page, text)` chunks in reading order.
+        """
+        await self.delete_chunks([content_hash])
+        rows = [
+            {"content_hash": content_hash, "position": position, "page": page, "text": text}
+            for position, (page, text) in enumerate(chunks)
+        ]
+        batch_size = get_settings().bulk_batch_size
+        for start in range(0, len(rows), batch_size):
+            await self.db.execute(insert(text_chunk_models.TextChunk), rows[start:start + batch_size])
+
+    async def delete_chunks(self, content_hashes: Iterable[str]):
+        """
+        Delete the text of objects.
+
+        Args:
+            content_hashes (Iterable[str]): The SHA-256 of the objects.
+        """
+        content_hashes = list(content_hashes)
+        if content_hashes:
+            await self.db.execute(
+                delete(text_chunk_models.TextChunk).where(text_chunk_models.TextChunk.content_hash.in_(content_hashes))
+            )
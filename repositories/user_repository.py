@@ -1,13 +1,32 @@
 from datetime import datetime
-from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+from sqlalchemy import inspect, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, noload, selectinload
+import models.document as document_models
 import models.user as user_models
 import schemas.user as user_schemas
-from utils.auth.auth_handler import get_password_hash
+from repositories.stored_object_repository import StoredObjectRepository
+from utils.auth.password_hasher import get_password_hasher
+from utils.cache import document_key, from_cache, get_cache, get_token_cache, to_cache, user_email_key, user_key
+
+
+def documents_loader(include_documents: bool):
+    """
+    Return the loader option for `User.documents` in user listings.
+
+    `selectinload` fetches the documents of a whole page in one query, so
+    listings never issue a query per user. `noload` skips them entirely.
+    """
+    return selectinload(user_models.User.documents) if include_documents else noload(user_models.User.documents)
 
 
 class UserRepository:
     """
-    Repository class for handling database operations related to users.
+    Repository class for reading users on a sync `Session`.
+
+    The app reads and writes through `AsyncUserRepository`; this class is
+    kept as the sync baseline of the benchmarks.
     """
 
     def __init__(self, db: Session):
@@ -19,56 +38,232 @@ class UserRepository:
         """
         self.db = db
 
-    def create_user(self, user: user_schemas.UserCreate):
+    def get_user(self, user_id: int):
+        """
+        Get a user by ID.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            User: The retrieved user.
+        """
+        return self.db.query(user_models.User).filter(user_models.User.id == user_id).first()
+
+    def get_user_by_email(self, email: str):
+        return self.db.query(user_models.User).filter(user_models.User.email == email).first()
+
+    def get_users(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        include_documents: bool = False
+    ):
+        """
+        Get a page of users, newest first.
+
+        Uses keyset pagination on `(created_at, id)`, so deep pages cost the
+        same as the first one.
+
+        Args:
+            limit (int): The maximum number of users to return.
+            after (Optional[Tuple[datetime, int]]): The `(created_at, id)` key to resume after.
+            include_documents (bool): Load the documents of the page with one extra
+                query; otherwise `documents` is left empty.
+
+        Returns:
+            List[User]: The users of the page.
+        """
+        query = self.db.query(user_models.User).options(documents_loader(include_documents))
+        if after:
+            query = query.filter(tuple_(user_models.User.created_at, user_models.User.id) < tuple_(*after))
+        return query.order_by(user_models.User.created_at.desc(), user_models.User.id.desc()).limit(limit).all()
+
+
+class AsyncUserRepository:
+    """
+    Async repository class for handling database operations related to users.
+
+    It is used by the async routes.
+    Async sessions cannot lazy-load, so `User.documents` is always loaded
+    explicitly: eagerly for single users, and only on request for listings.
+
+    Lookups by ID and email go through the entity cache, which the write
+    methods invalidate. Password hashes are never cached.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Initialize the AsyncUserRepository.
+
+        Args:
+            db (AsyncSession): The SQLAlchemy async database session.
+        """
+        self.db = db
+
+    async def create_user(self, user: user_schemas.UserCreate):
         """
         Create a new user.
 
+        Hashing runs in the password hasher's executor so bcrypt does not block the event loop.
+
         Args:
-            user (User): The user to be created.
+            user (UserCreate): The user to be created.
+
+        Returns:
+            User: The created user.
         """
-        hashed_password = get_password_hash(user.password)
-        new_user = user_models.User(email=user.email, password=hashed_password)
+        hashed_password = await get_password_hasher().hash(user.password)
+        new_user = user_models.User(email=user.email, password=hashed_password, documents=[])
         self.db.add(new_user)
-        self.db.commit()
+        await self.db.commit()
         return new_user
 
-    def get_user(self, user_id: int):
+    async def get_user(self, user_id: int, cached: bool = True):
         """
         Get a user by ID.
 
         Args:
             user_id (int): The ID of the user.
+            cached (bool): Whether the entity cache may serve the user. A
+                cached user is detached; pass False to get a row that can be modified.
 
         Returns:
             User: The retrieved user.
         """
-        return self.db.query(user_models.User).filter(user_models.User.id == user_id).first()
-    
-    def get_user_by_email(self, email: str):
-        return self.db.query(user_models.User).filter(user_models.User.email == email).first()
-    
-    def get_users(self,skip: int = 0, limit: int = 100):
-        return self.db.query(user_models.User).offset(skip).limit(limit).all()
+        if cached:
+            data = await get_cache().get(user_key(user_id))
+            if data is not None:
+                return self.from_cache(data)
+        user = await self.db.get(user_models.User, user_id, options=[selectinload(user_models.User.documents)])
+        if user is not None:
+            await self.cache(user)
+        return user
+
+    async def get_user_by_email(self, email: str, cached: bool = True):
+        """
+        Get a user by email.
+
+        Args:
+            email (str): The email of the user.
+            cached (bool): Whether the entity cache may serve the user. Pass
+                False when the password hash or a modifiable row is needed.
+
+        Returns:
+            User: The retrieved user.
+        """
+        if cached:
+            user_id = await get_cache().get(user_email_key(email))
+            if user_id is not None:
+                return await self.get_user(user_id)
+        query = select(user_models.User).where(user_models.User.email == email).options(
+            selectinload(user_models.User.documents)
+        )
+        user = (await self.db.scalars(query)).first()
+        if user is not None:
+            await self.cache(user)
+        return user
 
-    def update_user(self, user: user_schemas.User):
+    async def get_users(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        include_documents: bool = False
+    ):
         """
-        Update an existing user.
+        Get a page of users, newest first.
+
+        Uses keyset pagination on `(created_at, id)`, so deep pages cost the
+        same as the first one.
+
+        Args:
+            limit (int): The maximum number of users to return.
+            after (Optional[Tuple[datetime, int]]): The `(created_at, id)` key to resume after.
+            include_documents (bool): Load the documents of the page with one extra
+                query; otherwise `documents` is left empty.
+
+        Returns:
+            List[User]: The users of the page.
+        """
+        query = select(user_models.User).options(documents_loader(include_documents))
+        if after:
+            query = query.where(tuple_(user_models.User.created_at, user_models.User.id) < tuple_(*after))
+        query = query.order_by(user_models.User.created_at.desc(), user_models.User.id.desc()).limit(limit)
+        return (await self.db.scalars(query)).all()
+
+    async def update_user(self, user: user_models.User):
+        """
+        Persist the changes made to a user.
 
         Args:
             user (User): The user to be updated.
+
+        Returns:
+            User: The updated user.
         """
-        user = self.get_user(user.id)
-        user.email = user.get('email')
-        user.is_active = user.get('is_active')
-        self.db.commit()
+        old_emails = inspect(user).attrs.email.history.deleted
+        await self.db.commit()
+        await get_cache().delete(
+            user_key(user.id), user_email_key(user.email), *(user_email_key(email) for email in old_emails)
+        )
+        await get_token_cache().invalidate_user(user.id)
         return user
 
-    def delete_user(self, user_id: int):
+    async def update_password(self, user: user_models.User, hashed_password: str):
+        """
+        Store a new password hash for a user.
+
+        Used to rehash passwords transparently, so `updated_at` is left alone.
+        The entity cache never holds password hashes and needs no invalidation.
+
+        Args:
+            user (User): The user.
+            hashed_password (str): The new hash.
+        """
+        user.password = hashed_password
+        await self.db.commit()
+
+    async def delete_user(self, user: user_models.User) -> bool:
+        """
+        Delete a user and their documents, releasing the documents' stored objects.
+
+        Args:
+            user (User): The user to be deleted.
+
+        Returns:
+            bool: True once the user is deleted.
+        """
+        await self.db.delete(user)
+        await StoredObjectRepository(self.db).release(document.content_hash for document in user.documents)
+        await self.db.commit()
+        await get_cache().delete(
+            user_key(user.id), user_email_key(user.email), *(document_key(document.id) for document in user.documents)
+        )
+        await get_token_cache().invalidate_user(user.id)
+        return True
+
+    async def cache(self, user: user_models.User):
         """
-        Delete a user by ID.
+        Store a user with their documents in the entity cache.
 
         Args:
-            user_id (int): The ID of the user to be deleted.
+            user (User): The user, with `documents` loaded.
         """
-        user = self.db.query(user_models.User).filter(user_models.User.id == user_id).first()
-        user.delete()
+        data = to_cache(user, exclude=("password",))
+        data["documents"] = [to_cache(document) for document in user.documents]
+        await get_cache().set(user_key(user.id), data)
+        await get_cache().set(user_email_key(user.email), user.id)
+
+    def from_cache(self, data: dict) -> user_models.User:
+        """
+        Rebuild a detached user with their documents from the entity cache.
+
+        Args:
+            data (dict): The cached user.
+
+        Returns:
+            User: The detached user.
+        """
+        user = from_cache(user_models.User, {key: value for key, value in data.items() if key != "documents"})
+        user.documents = [from_cache(document_models.Document, document) for document in data["documents"]]
+        return user
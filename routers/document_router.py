@@ -1,29 +1,126 @@
-from typing import List
+import os
+from typing import Optional
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     Depends,
+    Header,
     HTTPException,
+    Query,
+    Request,
+    Response,
     UploadFile
 )
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 # from models.document import Document
-from services.document_service import DocumentService
-from schemas.document import Document, DocumentCreate, DocumentUpdate
-from config.database import get_db
+from services.document_service import DocumentService, document_etag
+from schemas.document import (
+    BulkDocumentCreate,
+    BulkDocumentDelete,
+    BulkDocumentUpdate,
+    BulkResult,
+    Document,
+    DocumentCreate,
+    DocumentPage,
+    DocumentUpdate,
+    PresignedUpload,
+    PresignedUploadCreate
+)
+from config.database import get_async_db, get_read_db
+from config.settings import get_settings
+from utils.file_types import MIME_TYPES
+from utils.thumbnails import THUMBNAIL_CONTENT_TYPE
+from utils.http import cache_headers, if_range_matches, make_etag, not_modified, parse_range
 
 router = APIRouter()
 
 @router.post("/upload")
-def upload_document(file: UploadFile, db: Session = Depends(get_db)):
+async def upload_document(file: UploadFile, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    document_service = DocumentService(db)
+    return await document_service.upload_document(file, background_tasks)
+
+
+@router.post("/upload/presign", response_model=PresignedUpload)
+async def presign_upload(upload: PresignedUploadCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Reserve a document and get a presigned POST for uploading it directly to storage.
+
+    Args:
+        upload (PresignedUploadCreate): The metadata of the document to upload.
+
+    Returns:
+        PresignedUpload: The reserved document ID and the presigned POST.
+    """
+    document_service = DocumentService(db)
+    return await document_service.presign_upload(upload)
+
+
+@router.post("/upload/{document_id}/complete", response_model=Document)
+async def complete_upload(
+    document_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Confirm that a presigned upload has finished.
+
+    Args:
+        document_id (int): The ID of the reserved document.
+
+    Returns:
+        Document: The completed document.
+    """
+    document_service = DocumentService(db)
+    document = await document_service.complete_upload(document_id, background_tasks)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+
+# Registered before `/documents/{document_id}` so that "search" is not taken for a document ID.
+@router.get("/documents/search", response_model=DocumentPage)
+async def search_documents(
+    q: str = Query(..., min_length=1),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Search documents by title, description and file contents, most relevant first.
+
+    Every word of `q` must appear in the title or the description, or in one
+    chunk of the text extracted from the document's file; words are matched
+    on their stem, so "report" also finds "reports".
+
+    Args:
+        q (str): The text to search for.
+        limit (Optional[int]): The page size, capped at `max_page_size`.
+        cursor (Optional[str]): The `next_cursor` of the previous page.
+        owner_id (Optional[int]): Only return documents owned by this user.
+
+    Returns:
+        DocumentPage: The documents of the page and the cursor of the next page.
+    """
     document_service = DocumentService(db)
-    return document_service.upload_document(file)
+    return await document_service.search_documents(q, limit, cursor, owner_id)
 
 
 @router.get("/documents/{document_id}", response_model=Document)
-def get_document(document_id: int, db: Session = Depends(get_db)):
+async def get_document(
+    document_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
+):
     """
     Retrieve a document by its ID.
 
+    Conditional requests (If-None-Match / If-Modified-Since) are answered
+    from the document version alone, with a 304 and no body when unchanged.
+
     Args:
         document_id (int): The ID of the document.
 
@@ -31,26 +128,149 @@ def get_document(document_id: int, db: Session = Depends(get_db)):
         Document: The retrieved document.
     """
     document_service = DocumentService(db)
-    document = document_service.get_document(document_id)
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        version = await document_service.get_document_version(document_id)
+        if not version:
+            raise HTTPException(status_code=404, detail="Document not found")
+        etag = make_etag(*version)
+        if not_modified(request, etag, version[1]):
+            return Response(status_code=304, headers=cache_headers(etag, version[1]))
+
+    document = await document_service.get_document(document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
+    response.headers.update(cache_headers(document_etag(document), document.updated_at))
     return document
 
 
-@router.get("/documents", response_model=List[Document])
-def get_all_documents(db: Session = Depends(get_db)):
+@router.get("/documents/{document_id}/content")
+async def get_document_content(
+    document_id: int,
+    request: Request,
+    range: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Download the file of a document.
+
+    The file is streamed from storage in `download_chunk_size` chunks, so
+    memory use does not depend on its size. A single `Range` is answered
+    with 206 Partial Content, unless an `If-Range` validator no longer
+    matches. Whole files kept on local disk are sent with `FileResponse`.
+
+    Args:
+        document_id (int): The ID of the document.
+        range (Optional[str]): The byte range to return.
+        if_range (Optional[str]): Only honour `range` if the document still has this ETag or date.
+
+    Returns:
+        Response: The file, or the requested part of it.
+    """
+    document_service = DocumentService(db)
+    document, info = await document_service.get_document_content(document_id)
+    headers = cache_headers(document_etag(document), document.updated_at)
+    if not_modified(request, headers["ETag"], document.updated_at):
+        return Response(status_code=304, headers=headers)
+
+    headers["Accept-Ranges"] = "bytes"
+    media_type = MIME_TYPES.get(document.file_type, info.content_type or "application/octet-stream")
+    byte_range = None
+    if if_range_matches(if_range, headers["ETag"], document.updated_at):
+        byte_range = parse_range(range, info.size)
+
+    if byte_range is None:
+        path = document_service.storage.path(document.file_url)
+        if path is not None:
+            # With the stat result given up front, FileResponse does not
+            # recompute (and overwrite) the validators set below.
+            stat_result = await run_in_threadpool(os.stat, path)
+            response = FileResponse(path, media_type=media_type, stat_result=stat_result)
+            response.headers.update(headers)
+            return response
+        start, end, status_code = 0, info.size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    chunks = document_service.storage.stream(
+        document.file_url, start, end, chunk_size=get_settings().download_chunk_size
+    )
+    return StreamingResponse(chunks, status_code=status_code, media_type=media_type, headers=headers)
+
+
+@router.get("/documents/{document_id}/thumbnail")
+async def get_document_thumbnail(document_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    """
+    Retrieve the thumbnail of a document: a JPEG of at most `thumbnail_size`
+    pixels per side, downscaled from an image or rendered from a PDF's first page.
+
+    Thumbnails are generated in the background after upload, so this returns
+    404 until the thumbnail is ready.
+
+    Args:
+        document_id (int): The ID of the document.
+
+    Returns:
+        Response: The thumbnail.
+    """
+    document_service = DocumentService(db)
+    document, key = await document_service.get_thumbnail(document_id)
+    headers = cache_headers(make_etag(document.id, document.updated_at, key), document.updated_at)
+    headers["Cache-Control"] = f"private, max-age={get_settings().thumbnail_max_age}"
+    if not_modified(request, headers["ETag"], document.updated_at):
+        return Response(status_code=304, headers=headers)
+    content = await document_service.storage.get(key)
+    return Response(content=content, media_type=THUMBNAIL_CONTENT_TYPE, headers=headers)
+
+
+@router.get("/documents", response_model=DocumentPage)
+async def get_all_documents(
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Retrieve a page of documents, newest first.
+
+    Args:
+        limit (Optional[int]): The page size, capped at `max_page_size`.
+        cursor (Optional[str]): The `next_cursor` of the previous page.
+        owner_id (Optional[int]): Only return documents owned by this user.
+
+    Returns:
+        DocumentPage: The documents of the page and the cursor of the next page.
+    """
+    document_service = DocumentService(db)
+    return await document_service.get_all_documents(limit, cursor, owner_id)
+
+
+@router.get("/users/{user_id}/documents", response_model=DocumentPage)
+async def get_user_documents(
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
     """
-    Retrieve all documents.
+    Retrieve a page of the documents owned by a user, newest first.
+
+    Args:
+        user_id (int): The ID of the owner.
+        limit (Optional[int]): The page size, capped at `max_page_size`.
+        cursor (Optional[str]): The `next_cursor` of the previous page.
 
     Returns:
-        List[Document]: A list of all documents.
+        DocumentPage: The documents of the page and the cursor of the next page.
     """
     document_service = DocumentService(db)
-    return document_service.get_all_documents()
+    return await document_service.get_all_documents(limit, cursor, owner_id=user_id)
 
 
 @router.post("/documents", response_model=Document)
-def create_document(document_data: DocumentCreate, db: Session = Depends(get_db)):
+async def create_document(document_data: DocumentCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new document.
 
@@ -61,41 +281,101 @@ def create_document(document_data: DocumentCreate, db: Session = Depends(get_db)
         Document: The created document.
     """
     document_service = DocumentService(db)
-    return document_service.create_document(document_data)
+    return await document_service.create_document(document_data)
+
+
+# The bulk routes are registered before the `/documents/{document_id}` ones so
+# that "bulk" is not taken for a document ID.
+@router.post("/documents/bulk", response_model=BulkResult)
+async def bulk_create_documents(data: BulkDocumentCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create documents in bulk, in one transaction.
+
+    Args:
+        data (BulkDocumentCreate): The documents to create.
+
+    Returns:
+        BulkResult: The ID of each created document, in request order.
+    """
+    document_service = DocumentService(db)
+    return await document_service.bulk_create_documents(data)
+
+
+@router.patch("/documents/bulk", response_model=BulkResult)
+async def bulk_update_documents(data: BulkDocumentUpdate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Update documents in bulk, in one transaction.
+
+    Args:
+        data (BulkDocumentUpdate): The changes to apply, one item per document.
+
+    Returns:
+        BulkResult: The outcome of each item, in request order.
+    """
+    document_service = DocumentService(db)
+    return await document_service.bulk_update_documents(data)
+
+
+@router.delete("/documents/bulk", response_model=BulkResult)
+async def bulk_delete_documents(data: BulkDocumentDelete, db: AsyncSession = Depends(get_async_db)):
+    """
+    Delete documents in bulk, in one transaction.
+
+    Args:
+        data (BulkDocumentDelete): The IDs of the documents to delete.
+
+    Returns:
+        BulkResult: The outcome of each ID, in request order.
+    """
+    document_service = DocumentService(db)
+    return await document_service.bulk_delete_documents(data)
 
 
 @router.put("/documents/{document_id}", response_model=Document)
-def update_document(document_id: int, document_data: DocumentUpdate, db: Session = Depends(get_db)):
+async def update_document(
+    document_id: int,
+    document_data: DocumentUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Update an existing document.
 
     Args:
         document_id (int): The ID of the document to update.
         document_data (DocumentUpdate): The updated data for the document.
+        if_match (Optional[str]): Only update if the document still has this ETag.
 
     Returns:
         Document: The updated document.
     """
     document_service = DocumentService(db)
-    document = document_service.update_document(document_id, document_data)
+    document = await document_service.update_document(document_id, document_data, if_match)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
+    response.headers.update(cache_headers(document_etag(document), document.updated_at))
     return document
 
 
 @router.delete("/documents/{document_id}")
-def delete_document(document_id: int, db: Session = Depends(get_db)):
+async def delete_document(
+    document_id: int,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Delete a document.
 
     Args:
         document_id (int): The ID of the document to delete.
+        if_match (Optional[str]): Only delete if the document still has this ETag.
 
     Returns:
         dict: A dictionary indicating the success of the operation.
     """
     document_service = DocumentService(db)
-    result = document_service.delete_document(document_id)
+    result = await document_service.delete_document(document_id, if_match)
     if not result:
         raise HTTPException(status_code=404, detail="Document not found")
     return {"message": "Document deleted successfully"}
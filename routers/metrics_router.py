@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Response
+from utils.metrics import render
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Expose request, connection pool and cache metrics to Prometheus.
+
+    The endpoint is async so that the metrics are read on the event loop
+    thread, the only one that updates them.
+
+    Returns:
+        Response: The metrics in the Prometheus text format.
+    """
+    return Response(render(), media_type="text/plain; version=0.0.4")
@@ -1,21 +1,45 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 # from models.user import User
-from services.user_service import UserService
-from schemas.user import User,UserCreate, UserUpdate
+from services.user_service import UserService, user_etag
+from schemas.user import User,UserCreate, UserDocumentsPage, UserPage, UserUpdate
 import schemas.user as user_schemas
-from config.database import get_db
+from config.database import get_async_db, get_read_db
+from utils.auth.auth_handler import get_current_user
+from utils.http import cache_headers, not_modified
 
 
 router = APIRouter()
 
 
+@router.get("/users/me", response_model=User)
+async def get_current_user_profile(
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Retrieve the user the bearer token was issued to.
+
+    Returns:
+        User: The authenticated user.
+    """
+    user_service = UserService(db)
+    user = await user_service.get_user(current_user["user_id"])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
 @router.get("/users/{user_id}", response_model=User)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
     """
     Retrieve a user by their ID.
 
+    Conditional requests (If-None-Match / If-Modified-Since) get a 304 with
+    no body when the user is unchanged.
+
     Args:
         user_id (int): The ID of the user.
 
@@ -23,26 +47,42 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
         User: The retrieved user.
     """
     user_service = UserService(db)
-    user = user_service.get_user(user_id)
+    user = await user_service.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    headers = cache_headers(user_etag(user), user.updated_at)
+    if not_modified(request, headers["ETag"], user.updated_at):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return user
 
 
-@router.get("/users", response_model=List[User])
-def get_all_users(db: Session = Depends(get_db)):
+# `UserDocumentsPage` comes first: a `UserPage` fails its validation as its
+# users have no `documents`, while the reverse would silently drop them.
+@router.get("/users", response_model=Union[UserDocumentsPage, UserPage])
+async def get_all_users(
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    include: List[Literal["documents"]] = Query([]),
+    db: AsyncSession = Depends(get_read_db)
+):
     """
-    Retrieve all users.
+    Retrieve a page of users, newest first.
+
+    Args:
+        limit (Optional[int]): The page size, capped at `max_page_size`.
+        cursor (Optional[str]): The `next_cursor` of the previous page.
+        include (List[str]): `documents` to embed the documents of each user.
 
     Returns:
-        List[User]: A list of all users.
+        Union[UserDocumentsPage, UserPage]: The users of the page and the cursor of the next page.
     """
     user_service = UserService(db)
-    return user_service.get_all_users()
+    return await user_service.get_all_users(limit, cursor, include_documents="documents" in include)
 
 
 @router.post("/user/signup", response_model=user_schemas.User)
-def user_signup(user_data: user_schemas.UserCreate, db: Session = Depends(get_db)):
+async def user_signup(user_data: user_schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new user.
 
@@ -53,41 +93,69 @@ def user_signup(user_data: user_schemas.UserCreate, db: Session = Depends(get_db
         User: The created user.
     """
     user_service = UserService(db)
-    return user_service.create_user(user_data)
+    return await user_service.create_user(user_data)
+
+
+@router.post("/login")
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    """
+    Log a user in with their email and password.
+
+    Args:
+        form_data (OAuth2PasswordRequestForm): The email, as `username`, and the password.
+
+    Returns:
+        dict: The access token and its type.
+    """
+    user_service = UserService(db)
+    return await user_service.login(form_data.username, form_data.password)
 
 
 @router.put("/users/{user_id}", response_model=User)
-def update_user(user_id: int, user_data: UserUpdate, db: Session = Depends(get_db)):
+async def update_user(
+    user_id: int,
+    user_data: UserUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Update an existing user.
 
     Args:
         user_id (int): The ID of the user to update.
         user_data (UserUpdate): The updated data for the user.
+        if_match (Optional[str]): Only update if the user still has this ETag.
 
     Returns:
         User: The updated user.
     """
     user_service = UserService(db)
-    user = user_service.update_user(user_id, user_data)
+    user = await user_service.update_user(user_id, user_data, if_match)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    response.headers.update(cache_headers(user_etag(user), user.updated_at))
     return user
 
 
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
+async def delete_user(
+    user_id: int,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Delete a user.
 
     Args:
         user_id (int): The ID of the user to delete.
+        if_match (Optional[str]): Only delete if the user still has this ETag.
 
     Returns:
         dict: A dictionary indicating the success of the operation.
     """
     user_service = UserService(db)
-    result = user_service.delete_user(user_id)
+    result = await user_service.delete_user(user_id, if_match)
     if not result:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
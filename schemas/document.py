@@ -4,23 +4,24 @@ These models are used for data validation and serialization/deserialization.
 """
 from datetime import datetime
 from enum import Enum
+from typing import List, Literal, Optional
 from pydantic import BaseModel
+from utils.file_types import FILE_TYPES, LEGACY_FILE_TYPES
 
 
-class FileType(str, Enum):
-    """
+FileType = Enum(
+    "FileType",
+    {name.upper(): name for name in [*(file_type.name for file_type in FILE_TYPES), *LEGACY_FILE_TYPES]},
+    type=str
+)
+FileType.__doc__ = """
     Enumeration representing different file types.
 
-    This enum class defines the available file types as string values.
-    It allows us to restrict the file_type attribute to one of these predefined values.
+    The members are generated from the `FILE_TYPES` registry in `utils.file_types`,
+    so they always include the types uploads are validated against, plus the
+    `LEGACY_FILE_TYPES` existing documents may still carry.
     """
 
-    PDF = "pdf"
-    EXCEL = "excel"
-    DOC = "doc"
-    CSV = "csv"
-    #TODO: Add more file types as needed
-
 
 class DocumentBase(BaseModel):
     """
@@ -56,17 +57,34 @@ class DocumentUpdate(DocumentBase):
     pass
 
 
+class DocumentPatch(BaseModel):
+    """
+    Model for one item of a bulk update.
+
+    Only the attributes that are set are changed; the others keep their value.
+    """
+
+    id: int
+    title: Optional[str]
+    file_type: Optional[FileType]
+    file_url: Optional[str]
+    description: Optional[str]
+
+
 class Document(DocumentBase):
     """
     Model representing a document.
 
-    This model extends the DocumentBase model and adds the document_id, user_id,
-    created_at, and updated_at attributes.
+    This model extends the DocumentBase model and adds the id, owner_id, status,
+    content_hash, size_bytes, created_at, and updated_at attributes.
     It represents a document entity in the application.
     """
 
-    document_id: int
-    user_id: int
+    id: int
+    owner_id: Optional[int]
+    status: str
+    content_hash: Optional[str]
+    size_bytes: Optional[int]
     created_at: datetime
     updated_at: datetime
 
@@ -79,3 +97,87 @@ class Document(DocumentBase):
         """
 
         orm_mode = True
+
+
+class DocumentPage(BaseModel):
+    """
+    Model representing a page of documents.
+
+    `next_cursor` is passed back as `cursor` to fetch the next page and is
+    None on the last page.
+    """
+
+    items: List[Document]
+    next_cursor: Optional[str]
+
+
+class PresignedUploadCreate(BaseModel):
+    """
+    Model for requesting a presigned upload.
+
+    It carries the document metadata that is reserved before the client
+    uploads the file directly to storage.
+    """
+
+    title: str
+    description: str
+    content_type: str
+
+
+class PresignedUpload(BaseModel):
+    """
+    Model representing a presigned upload.
+
+    The client POSTs the file to `url` as multipart form data, including every
+    entry of `fields`, then confirms the upload with the completion endpoint.
+    """
+
+    document_id: int
+    key: str
+    url: str
+    fields: dict
+    expires_in: int
+
+
+class BulkDocumentCreate(BaseModel):
+    """
+    Model for creating documents in bulk.
+    """
+
+    items: List[DocumentCreate]
+
+
+class BulkDocumentUpdate(BaseModel):
+    """
+    Model for updating documents in bulk.
+    """
+
+    items: List[DocumentPatch]
+
+
+class BulkDocumentDelete(BaseModel):
+    """
+    Model for deleting documents in bulk.
+    """
+
+    ids: List[int]
+
+
+class BulkItemResult(BaseModel):
+    """
+    Model representing the outcome of one item of a bulk operation.
+
+    `index` is the position of the item in the request.
+    """
+
+    index: int
+    id: Optional[int]
+    status: Literal["created", "updated", "deleted", "not_found"]
+
+
+class BulkResult(BaseModel):
+    """
+    Model representing the outcome of a bulk operation, one entry per requested item.
+    """
+
+    items: List[BulkItemResult]
@@ -6,6 +6,7 @@ The User models represent user-related data, including registration and authenti
 """
 
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr
 from schemas.document import Document
 
@@ -39,20 +40,19 @@ class UserUpdate(UserBase):
     pass
 
 
-class User(UserBase):
+class UserSummary(UserBase):
     """
-    Model representing a user.
+    Model representing a user without their documents.
 
     This model extends the UserBase model and adds the user_id, created_at,
     and updated_at attributes.
-    It represents a user entity in the application.
+    It is the default representation in user listings, which then only need to load the users.
     """
 
     id: int
-    documents: list[Document] = []
     created_at: datetime
     updated_at: datetime
-    token: str
+    token: Optional[str] = None
 
     class Config:
         """
@@ -63,3 +63,37 @@ class User(UserBase):
         """
 
         orm_mode = True
+
+
+class User(UserSummary):
+    """
+    Model representing a user.
+
+    This model extends the UserSummary model and adds the documents of the user.
+    It represents a user entity in the application.
+    """
+
+    documents: List[Document]
+
+
+class UserPage(BaseModel):
+    """
+    Model representing a page of users.
+
+    `next_cursor` is passed back as `cursor` to fetch the next page and is
+    None on the last page.
+    """
+
+    items: List[UserSummary]
+    next_cursor: Optional[str]
+
+
+class UserDocumentsPage(BaseModel):
+    """
+    Model representing a page of users with their documents.
+
+    It is returned instead of `UserPage` when the documents are requested.
+    """
+
+    items: List[User]
+    next_cursor: Optional[str]
@@ -1,2 +1,2 @@
 @echo off
-poetry run uvicorn main:app --reload
\ No newline at end of file
+poetry run alembic upgrade head && poetry run uvicorn main:app --reload
\ No newline at end of file
@@ -1,57 +1,85 @@
-import time
-import json
+import asyncio
+import hashlib
 from uuid import uuid4
-import magic
-from typing import List, Optional, Union
-from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple, Union
+from datetime import datetime, timedelta
 from fastapi import (
     status,
+    BackgroundTasks,
     HTTPException,
     UploadFile
 )
-from sqlalchemy.orm import Session
-import boto3
-from botocore.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from config.database import get_async_session_maker
+from config.logger import Logger
 from config.settings import get_settings
-from repositories.document_repository import DocumentRepository
-from schemas.document import Document, DocumentCreate, DocumentUpdate
+from config.storage import get_storage
+from services.storage.base import ObjectInfo
+from services.text_extraction_service import TextExtractionService
+from services.thumbnail_service import ThumbnailService, source_thumbnail_key, thumbnail_key
+from repositories.document_repository import AsyncDocumentRepository
+from repositories.stored_object_repository import StoredObjectRepository
+from utils.file_types import SNIFF_SIZE, SUPPORTED_FILE_TYPES, TEXT_FILE_TYPES, get_detector
+from utils.http import check_if_match, make_etag
+from utils.upload_limit import upload_too_large
+from utils.pagination import decode_cursor, decode_rank_cursor, encode_rank_cursor, page_size, split_page
+from schemas.document import (
+    BulkDocumentCreate,
+    BulkDocumentDelete,
+    BulkDocumentUpdate,
+    BulkItemResult,
+    BulkResult,
+    Document,
+    DocumentCreate,
+    DocumentPage,
+    DocumentUpdate,
+    PresignedUpload,
+    PresignedUploadCreate
+)
+import models.document as document_models
+from models.document import STATUS_AVAILABLE, STATUS_PENDING
 
-TIME_STR = time.strftime("%Y-%m-%d-%H:%M:%S")
-KB = 1024
-MB = 1024*KB
 settings = get_settings()
 
-config = Config(
-    region_name=settings.aws_region,
-    aws_access_key_id=settings.aws_access_key_id,
-    aws_secret_access_key=settings.aws_secret_access_key
-)
+def document_etag(document: document_models.Document) -> str:
+    """
+    Return the strong ETag of a document version.
+    """
+    return make_etag(document.id, document.updated_at)
 
-s3 = boto3.client('s3', config=config)
-bucket = s3.Bucket(settings.aws_bucket_name)
 
-SUPPORTED_FILE_TYPES = {
-    'application/pdf': 'pdf',
-    'image/png': 'png',
-    'image/jpeg': 'jpeg'
-}
+async def prepend(chunks: AsyncIterator[bytes], *head: bytes) -> AsyncIterator[bytes]:
+    """
+    Yield `head` followed by the remaining `chunks`.
+    """
+    for chunk in head:
+        yield chunk
+    async for chunk in chunks:
+        yield chunk
+
 
 class DocumentService:
     """
     Service class for handling document-related operations.
     """
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         """
         Initialize the DocumentService.
 
+        Files are kept in the storage backend returned by `get_storage`.
+
         Args:
-            db (Session): The SQLAlchemy database session.
+            db (AsyncSession): The SQLAlchemy async database session.
         """
         self.db = db
-        self.repository = DocumentRepository(db)
+        self.repository = AsyncDocumentRepository(db)
+        self.storage = get_storage()
 
-    def get_document(self, document_id: int) -> Optional[Document]:
+    async def get_document(self, document_id: int) -> Optional[Document]:
         """
         Retrieve a document by its ID.
 
@@ -61,18 +89,90 @@ class DocumentService:
         Returns:
             Optional[Document]: The retrieved document, or None if not found.
         """
-        return self.repository.get_document(document_id)
+        return await self.repository.get_document(document_id)
+
+    async def get_document_content(self, document_id: int) -> Tuple[document_models.Document, ObjectInfo]:
+        """
+        Retrieve a document together with the metadata of its stored file.
+
+        Args:
+            document_id (int): The ID of the document.
+
+        Returns:
+            Tuple[Document, ObjectInfo]: The document and its file's metadata.
+
+        Raises:
+            HTTPException: 404 Not Found if the document or its file does not exist.
+        """
+        document = await self.repository.get_document(document_id)
+        if not document:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+        info = None
+        if document.status == STATUS_AVAILABLE and document.file_url:
+            info = await self.storage.info(document.file_url)
+        if info is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document content not found")
+        return document, info
 
-    def get_all_documents(self) -> List[Document]:
+    async def get_document_version(self, document_id: int) -> Optional[Tuple[int, Optional[datetime]]]:
         """
-        Retrieve all documents.
+        Retrieve just the version (`updated_at`) of a document, for conditional requests.
+
+        Args:
+            document_id (int): The ID of the document.
 
         Returns:
-            List[Document]: A list of all documents.
+            Optional[Tuple[int, Optional[datetime]]]: The ID and update time, or None if not found.
         """
-        return self.repository.get_all_documents()
+        return await self.repository.get_document_version(document_id)
 
-    def create_document(self, document_data: DocumentCreate) -> Document:
+    async def get_all_documents(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        owner_id: Optional[int] = None
+    ) -> DocumentPage:
+        """
+        Retrieve a page of documents, newest first.
+
+        Args:
+            limit (Optional[int]): The requested page size, capped at `max_page_size`.
+            cursor (Optional[str]): The cursor returned with the previous page.
+            owner_id (Optional[int]): Only return documents owned by this user.
+
+        Returns:
+            DocumentPage: The documents of the page and the cursor of the next page.
+        """
+        size = page_size(limit)
+        documents = await self.repository.get_documents(size + 1, decode_cursor(cursor), owner_id)
+        documents, next_cursor = split_page(documents, size)
+        return DocumentPage(items=documents, next_cursor=next_cursor)
+
+    async def search_documents(
+        self,
+        q: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        owner_id: Optional[int] = None
+    ) -> DocumentPage:
+        """
+        Retrieve a page of the documents matching a full-text query, most relevant first.
+
+        Args:
+            q (str): The text to search for; every word must match.
+            limit (Optional[int]): The requested page size, capped at `max_page_size`.
+            cursor (Optional[str]): The cursor returned with the previous page.
+            owner_id (Optional[int]): Only return documents owned by this user.
+
+        Returns:
+            DocumentPage: The documents of the page and the cursor of the next page.
+        """
+        size = page_size(limit)
+        rows = await self.repository.search_documents(q, size + 1, decode_rank_cursor(cursor), owner_id)
+        rows, next_cursor = split_page(rows, size, lambda row: encode_rank_cursor(row.score, row.Document.id))
+        return DocumentPage(items=[row.Document for row in rows], next_cursor=next_cursor)
+
+    async def create_document(self, document_data: DocumentCreate) -> Document:
         """
         Create a new document.
 
@@ -82,77 +182,206 @@ class DocumentService:
         Returns:
             Document: The created document.
         """
-        document = Document(
+        document = document_models.Document(
             title=document_data.title,
-            file_type=document_data.file_type,
+            file_type=document_data.file_type.value,
             file_url=document_data.file_url,
             description=document_data.description,
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow(),
         )
-        return self.repository.create_document(document)
+        return await self.repository.create_document(document)
 
-    def update_document(self, document_id: int, document_data: DocumentUpdate) -> Optional[Document]:
+    async def update_document(
+        self,
+        document_id: int,
+        document_data: DocumentUpdate,
+        if_match: Optional[str] = None
+    ) -> Optional[Document]:
         """
         Update an existing document.
 
         Args:
             document_id (int): The ID of the document to update.
             document_data (DocumentUpdate): The updated data for the document.
+            if_match (Optional[str]): The If-Match header; the update fails with 412 unless it matches.
 
         Returns:
             Optional[Document]: The updated document, or None if not found.
         """
-        document = self.repository.get_document(document_id)
+        document = await self.repository.get_document(document_id, cached=False)
         if document:
+            check_if_match(if_match, document_etag(document))
+            if document.content_hash and document_data.file_url and document_data.file_url != document.file_url:
+                # The document no longer points at its stored object.
+                document.content_hash = None
+                document.size_bytes = None
             document.title = document_data.title or document.title
-            document.file_type = document_data.file_type or document.file_type
+            document.file_type = document_data.file_type.value or document.file_type
             document.file_url = document_data.file_url or document.file_url
             document.description = document_data.description or document.description
             document.updated_at = datetime.utcnow()
-            return self.repository.update_document(document)
+            released = inspect(document).attrs.content_hash.history.deleted
+            document = await self.repository.update_document(document)
+            await self.collect_garbage(released)
+            return document
         return None
 
-    def delete_document(self, document_id: int) -> bool:
+    async def delete_document(self, document_id: int, if_match: Optional[str] = None) -> bool:
         """
         Delete a document.
 
         Args:
             document_id (int): The ID of the document to delete.
+            if_match (Optional[str]): The If-Match header; the delete fails with 412 unless it matches.
 
         Returns:
             bool: True if the document was deleted successfully, False otherwise.
         """
-        document = self.repository.get_document(document_id)
+        document = await self.repository.get_document(document_id, cached=False)
         if document:
-            return self.repository.delete_document(document)
+            check_if_match(if_match, document_etag(document))
+            content_hash = document.content_hash
+            await self.repository.delete_document(document)
+            await self.collect_garbage([content_hash])
+            return True
         return False
-    
-    def s3_upload(self, contents:bytes, key: str):
-        # logger.info("Uploading {key} to s3") 
-        bucket.put_object(key=key, Body=contents)
-        
-        
-    def validate_file(file):
-        if not file:
+
+    def check_bulk_size(self, count: int):
+        """
+        Reject bulk requests with more than `bulk_max_items` items.
+        """
+        if count > settings.bulk_max_items:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail='No file found!!'
+                detail=f'Too many items, the maximum is {settings.bulk_max_items}'
             )
 
-        contents = file.read()
-        file_size = len(contents)
-        if not 0 < file_size <= 1 * MB:
+    async def bulk_create_documents(self, data: BulkDocumentCreate) -> BulkResult:
+        """
+        Create documents in bulk, in one transaction.
+
+        Args:
+            data (BulkDocumentCreate): The documents to create.
+
+        Returns:
+            BulkResult: The ID of each created document.
+        """
+        self.check_bulk_size(len(data.items))
+        now = datetime.utcnow()
+        rows = [
+            {
+                "title": item.title,
+                "file_type": item.file_type.value,
+                "file_url": item.file_url,
+                "description": item.description,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for item in data.items
+        ]
+        ids = await self.repository.bulk_create_documents(rows)
+        return BulkResult(items=[
+            BulkItemResult(index=index, id=document_id, status="created")
+            for index, document_id in enumerate(ids)
+        ])
+
+    async def bulk_update_documents(self, data: BulkDocumentUpdate) -> BulkResult:
+        """
+        Update documents in bulk, in one transaction.
+
+        Only the attributes set on each item are changed. Items whose document
+        does not exist are reported as `not_found`.
+
+        Args:
+            data (BulkDocumentUpdate): The changes to apply.
+
+        Returns:
+            BulkResult: The outcome of each item.
+        """
+        self.check_bulk_size(len(data.items))
+        now = datetime.utcnow()
+        rows = []
+        for item in data.items:
+            row = item.dict(exclude_unset=True)
+            if row.get("file_type") is not None:
+                row["file_type"] = row["file_type"].value
+            row["updated_at"] = now
+            rows.append(row)
+        updated, released = await self.repository.bulk_update_documents(rows)
+        updated = set(updated)
+        await self.collect_garbage(released)
+        return BulkResult(items=[
+            BulkItemResult(index=index, id=item.id, status="updated" if item.id in updated else "not_found")
+            for index, item in enumerate(data.items)
+        ])
+
+    async def bulk_delete_documents(self, data: BulkDocumentDelete) -> BulkResult:
+        """
+        Delete documents in bulk, in one transaction.
+
+        Args:
+            data (BulkDocumentDelete): The IDs of the documents to delete.
+
+        Returns:
+            BulkResult: The outcome of each ID.
+        """
+        self.check_bulk_size(len(data.ids))
+        deleted = await self.repository.bulk_delete_documents(data.ids)
+        await self.collect_garbage(deleted.values())
+        return BulkResult(items=[
+            BulkItemResult(index=index, id=document_id, status="deleted" if document_id in deleted else "not_found")
+            for index, document_id in enumerate(data.ids)
+        ])
+
+    async def collect_garbage(self, content_hashes: Iterable[Optional[str]]):
+        """
+        Delete the stored objects among `content_hashes` that no document
+        references anymore, together with their thumbnails and extracted text.
+        """
+        for content_hash in await StoredObjectRepository(self.db).collect_garbage(content_hashes, self.storage):
+            await self.storage.delete(source_thumbnail_key(content_hash))
+
+    def validate_file(self, file: Optional[UploadFile]):
+        if not file:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail='Supported file size is 0 - 1 MB'
+                detail='No file found!!'
             )
 
-        return contents
+    async def read_chunks(self, file: UploadFile) -> AsyncIterator[bytes]:
+        """
+        Read an uploaded file in fixed-size chunks, enforcing the size limit on the file itself.
+
+        Chunks are read lazily, so peak memory per upload is bounded by
+        `upload_chunk_size` rather than by the size of the file. The request
+        body was already limited as it arrived, by `UploadSizeLimitMiddleware`.
 
+        Args:
+            file (UploadFile): The uploaded file.
+
+        Yields:
+            bytes: The next chunk of the file.
+        """
+        chunk_size = settings.upload_chunk_size
+        file_size = 0
+        while chunk := await file.read(chunk_size):
+            file_size += len(chunk)
+            if file_size > settings.max_upload_size:
+                raise upload_too_large(settings.max_upload_size)
+            yield chunk
 
-    def validate_file_type(contents):
-        file_type = magic.from_buffer(buffer=contents, mime=True)
+    def validate_file_type(self, header: bytes):
+        """
+        Detect the type of a file from its first bytes and check that it is supported.
+
+        Args:
+            header (bytes): The first bytes of the file; only `SNIFF_SIZE` bytes are inspected.
+
+        Returns:
+            str: The MIME type of the file.
+        """
+        file_type = get_detector().detect(header[:SNIFF_SIZE]) or 'unknown'
         if file_type not in SUPPORTED_FILE_TYPES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -161,9 +390,360 @@ class DocumentService:
 
         return file_type
 
+    async def hash_chunks(self, chunks: AsyncIterator[bytes], hasher) -> AsyncIterator[bytes]:
+        """
+        Feed chunks to a hash as they pass through.
+
+        Hashing runs in the threadpool; hashlib releases the GIL on large buffers.
+        """
+        async for chunk in chunks:
+            await run_in_threadpool(hasher.update, chunk)
+            yield chunk
+
+    async def upload_document(
+        self,
+        file: Union[UploadFile, None] = None,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> dict:
+        """
+        Stream an uploaded file to storage and create its document.
+
+        The type is sniffed from the first `SNIFF_SIZE` bytes and the SHA-256
+        of the spooled file is computed chunk by chunk, so it is never fully
+        buffered in memory. Files are stored once per content: if the same
+        content was uploaded before, nothing is written to storage and the new
+        document shares the existing object; otherwise the file is streamed
+        straight to its content key.
+
+        The thumbnail is generated, and the text of new files extracted, after
+        the response is sent.
+
+        Args:
+            file (UploadFile): The uploaded file.
+            background_tasks (Optional[BackgroundTasks]): The request's background
+                tasks; without them the derivatives are made before returning.
 
-    def upload_document(self, file: Union[UploadFile, None] = None) -> None:
-        contents = self.validate_file(file)
-        file_type = self.validate_file_type(contents)
-        key = f'{uuid4()}.{SUPPORTED_FILE_TYPES[file_type]}'
-        self.s3_upload(contents=contents, key=key)
\ No newline at end of file
+        Returns:
+            dict: The storage key, detected type, content hash and size of the
+            stored object, the ID of the new document, and whether the content
+            was already stored.
+        """
+        self.validate_file(file)
+        chunks = self.read_chunks(file)
+        first_chunk = await anext(chunks, b'')
+        if not first_chunk:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Uploaded file is empty'
+            )
+
+        file_type = self.validate_file_type(first_chunk)
+        hasher = hashlib.sha256()
+        size = 0
+        async for chunk in self.hash_chunks(prepend(chunks, first_chunk), hasher):
+            size += len(chunk)
+        content_hash = hasher.hexdigest()
+
+        async def store(key: str):
+            await file.seek(0)
+            await self.storage.put(key, self.read_chunks(file), content_type=file_type)
+
+        document, deduplicated = await self.create_content_document(
+            document_models.Document(
+                title=file.filename or content_hash,
+                description='',
+                file_type=SUPPORTED_FILE_TYPES[file_type],
+                content_hash=content_hash,
+                size_bytes=size,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow(),
+            ),
+            store,
+            content_type=file_type
+        )
+        await self.schedule_derivatives(document, background_tasks)
+        return {
+            "key": document.file_url,
+            "file_type": file_type,
+            "document_id": document.id,
+            "content_hash": content_hash,
+            "size_bytes": size,
+            "deduplicated": deduplicated,
+        }
+
+    async def schedule_derivatives(
+        self,
+        document: document_models.Document,
+        background_tasks: Optional[BackgroundTasks] = None
+    ):
+        """
+        Generate a document's thumbnail and extract its text after the response,
+        or right away without background tasks.
+
+        Nothing is scheduled for derivatives that are disabled or that the
+        document's type does not have.
+        """
+        jobs = []
+        if settings.thumbnails_enabled and thumbnail_key(document) is not None:
+            jobs.append((ThumbnailService().generate_for, document))
+        if settings.text_extraction_enabled and document.content_hash and document.file_type in TEXT_FILE_TYPES:
+            jobs.append((TextExtractionService().extract, [document.content_hash]))
+        for job, argument in jobs:
+            if background_tasks is not None:
+                background_tasks.add_task(job, argument)
+            else:
+                await job(argument)
+
+    async def get_thumbnail(self, document_id: int) -> Tuple[document_models.Document, str]:
+        """
+        Retrieve a document together with the storage key of its thumbnail.
+
+        Args:
+            document_id (int): The ID of the document.
+
+        Returns:
+            Tuple[Document, str]: The document and the key of its thumbnail.
+
+        Raises:
+            HTTPException: 404 Not Found if the document or its thumbnail does not exist.
+        """
+        document = await self.repository.get_document(document_id)
+        if not document:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+        key = thumbnail_key(document) if document.status == STATUS_AVAILABLE else None
+        if key is None or not await self.storage.exists(key):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Thumbnail not available")
+        return document, key
+
+    async def create_content_document(
+        self,
+        document: document_models.Document,
+        store: Callable[[str], Awaitable[None]],
+        content_type: str
+    ) -> Tuple[document_models.Document, bool]:
+        """
+        Create a document for some content, storing the content only if it is new.
+
+        Args:
+            document (Document): The new document, with `content_hash` and `size_bytes` set.
+            store (Callable[[str], Awaitable[None]]): Writes the content under the given key.
+            content_type (str): The MIME type of the content.
+
+        Returns:
+            Tuple[Document, bool]: The created document, and whether the content was already stored.
+        """
+        document.file_url, deduplicated = await self.acquire_content(
+            document.content_hash, document.size_bytes, document.file_type, store, content_type
+        )
+        document = await self.repository.create_document(document)
+        return document, deduplicated
+
+    async def acquire_content(
+        self,
+        content_hash: str,
+        size_bytes: int,
+        file_type: str,
+        store: Callable[[str], Awaitable[None]],
+        content_type: str
+    ) -> Tuple[str, bool]:
+        """
+        Take a reference on the stored object of some content, storing the content only if it is new.
+
+        `store` is only called, with the content key, when no stored object has
+        the same hash. The reference is staged, to be committed together with
+        the document. When two uploads of new content race, both write the same
+        bytes to the same key, and the loser retries and shares the winner's
+        object. A race rolls back the session, expiring its objects.
+
+        Args:
+            content_hash (str): The SHA-256 of the content.
+            size_bytes (int): The size of the content.
+            file_type (str): The file type of the content, a name from `FILE_TYPES`.
+            store (Callable[[str], Awaitable[None]]): Writes the content under the given key.
+            content_type (str): The MIME type of the content.
+
+        Returns:
+            Tuple[str, bool]: The storage key of the content, and whether it was already stored.
+        """
+        objects = StoredObjectRepository(self.db)
+        key = f'{content_hash}.{file_type}'
+        stored = False
+        if await objects.get_key(content_hash) is None:
+            await store(key)
+            stored = True
+        for attempt in range(3):
+            existing_key = await objects.acquire(content_hash)
+            if existing_key is not None:
+                return existing_key, True
+            if not stored:
+                # The object was collected since it was looked up.
+                await store(key)
+                stored = True
+            try:
+                await objects.add(content_hash, key, size_bytes, content_type, has_text=file_type in TEXT_FILE_TYPES)
+                return key, False
+            except IntegrityError:
+                # A concurrent upload of the same content recorded it first.
+                await self.db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail='Could not store the file, try again'
+        )
+
+    async def presign_upload(self, upload: PresignedUploadCreate) -> PresignedUpload:
+        """
+        Reserve a pending document and return a presigned POST for uploading it directly to storage.
+
+        The POST policy pins the content type and enforces `max_upload_size`,
+        so the file bytes never pass through the API.
+
+        Args:
+            upload (PresignedUploadCreate): The metadata of the document to upload.
+
+        Returns:
+            PresignedUpload: The reserved document ID and the presigned POST.
+        """
+        if upload.content_type not in SUPPORTED_FILE_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f'Unsupported file type: {upload.content_type}. Supported file types are {SUPPORTED_FILE_TYPES}'
+            )
+
+        key = f'{uuid4()}.{SUPPORTED_FILE_TYPES[upload.content_type]}'
+        presigned = self.storage.presign_upload(
+            key, upload.content_type, settings.max_upload_size, settings.presigned_url_expiry
+        )
+        if presigned is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Direct uploads are not supported by the configured storage, use /upload instead'
+            )
+        document = await self.repository.create_document(document_models.Document(
+            title=upload.title,
+            description=upload.description,
+            file_type=SUPPORTED_FILE_TYPES[upload.content_type],
+            file_url=key,
+            status=STATUS_PENDING,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        ))
+        return PresignedUpload(
+            document_id=document.id,
+            key=key,
+            url=presigned['url'],
+            fields=presigned['fields'],
+            expires_in=settings.presigned_url_expiry
+        )
+
+    async def complete_upload(
+        self,
+        document_id: int,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> Optional[document_models.Document]:
+        """
+        Confirm a presigned upload and mark its document as available.
+
+        The object must exist in storage, and its type is sniffed from its
+        first `SNIFF_SIZE` bytes, fetched with a ranged read. Objects of an
+        unsupported type or over `max_upload_size` are deleted, together
+        with their document.
+
+        The object is then hashed and registered like a direct upload: it is
+        moved to its content key, or dropped in favour of an existing object
+        with the same content, so deleting the document releases it and its
+        thumbnail, and its text is extracted.
+
+        Args:
+            document_id (int): The ID of the reserved document.
+            background_tasks (Optional[BackgroundTasks]): The request's background
+                tasks, used to generate the thumbnail after the response.
+
+        Returns:
+            Optional[Document]: The completed document, or None if not found.
+        """
+        document = await self.repository.get_document(document_id, cached=False)
+        if not document:
+            return None
+        if document.status != STATUS_PENDING:
+            return document
+
+        info = await self.storage.info(document.file_url)
+        if info is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail='File has not been uploaded yet'
+            )
+
+        try:
+            # The POST policy caps the size, but not every S3-compatible store enforces it.
+            if info.size > settings.max_upload_size:
+                raise upload_too_large(settings.max_upload_size)
+            file_type = self.validate_file_type(await self.storage.get(document.file_url, 0, SNIFF_SIZE - 1))
+        except HTTPException:
+            await self.storage.delete(document.file_url)
+            await self.repository.delete_document(document)
+            raise
+
+        upload_key = document.file_url
+        hasher = hashlib.sha256()
+        size = 0
+        chunks = self.storage.stream(upload_key, chunk_size=settings.upload_chunk_size)
+        async for chunk in self.hash_chunks(chunks, hasher):
+            size += len(chunk)
+
+        async def store(key: str):
+            await self.storage.move(upload_key, key)
+
+        content_hash = hasher.hexdigest()
+        key, deduplicated = await self.acquire_content(
+            content_hash, size, SUPPORTED_FILE_TYPES[file_type], store, file_type
+        )
+        if inspect(document).expired_attributes:
+            # A race in `acquire_content` rolled back the session; reload the document.
+            await self.db.refresh(document)
+        document.file_type = SUPPORTED_FILE_TYPES[file_type]
+        document.content_hash = content_hash
+        document.size_bytes = size
+        document.file_url = key
+        document.status = STATUS_AVAILABLE
+        document.updated_at = datetime.utcnow()
+        document = await self.repository.update_document(document)
+        if deduplicated:
+            await self.storage.delete(upload_key)
+        await self.schedule_derivatives(document, background_tasks)
+        return document
+
+    async def expire_pending_uploads(self) -> int:
+        """
+        Delete the presigned uploads that were not completed within
+        `pending_upload_expiry` seconds, with their file if it was uploaded.
+
+        Returns:
+            int: The number of deleted documents.
+        """
+        before = datetime.utcnow() - timedelta(seconds=settings.pending_upload_expiry)
+        deleted = await self.repository.delete_pending_documents(before)
+        for document in deleted:
+            await self.storage.delete(document.file_url)
+        return len(deleted)
+
+
+async def expire_pending_uploads(interval: float):
+    """
+    Delete abandoned presigned uploads every `interval` seconds.
+
+    Args:
+        interval (float): The seconds between two cleanups.
+    """
+    while True:
+        try:
+            async with get_async_session_maker()() as db:
+                expired = await DocumentService(db).expire_pending_uploads()
+            if expired:
+                Logger.info("Deleted %d abandoned uploads", expired)
+        except Exception:
+            # A rollback failing on cancellation replaces the CancelledError; stop anyway.
+            if asyncio.current_task().cancelling():
+                raise
+            Logger.exception("Could not delete abandoned uploads")
+        await asyncio.sleep(interval)
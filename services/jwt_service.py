@@ -1,23 +1,23 @@
 from datetime import datetime, timedelta
-import jwt
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from config.settings import get_settings
 import repositories.user_repository as user_repository
-import schemas.user as user_schemas
-from passlib.context import CryptContext
+from utils.cache import get_token_cache
 
 JWT_SECRET_KEY = get_settings().jwt_secret_key
 JWT_ALGORITHM = get_settings().jwt_algorithm
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 class JWTService:
     @staticmethod
     def create_access_token(*, data: dict, expires_delta: timedelta = None):
+        # PyJWT loads `cryptography`; import it on first use to keep cold starts short.
+        import jwt
+
         to_encode = data.copy()
         if expires_delta:
             expire = datetime.utcnow() + expires_delta
@@ -28,21 +28,42 @@ class JWTService:
         return encoded_jwt
 
     @staticmethod
-    def decode_access_token(token: str):
+    async def decode_access_token(token: str, db: AsyncSession) -> dict:
+        """
+        Verify an access token and resolve the user it was issued to.
+
+        Verified tokens are cached until they expire, so a repeated token costs
+        neither signature verification nor a user lookup. The cache entries of
+        a user are dropped when the user is updated or deleted.
+
+        Args:
+            token (str): The encoded token.
+            db (AsyncSession): The session used to look the user up on a cache miss.
+
+        Returns:
+            dict: The decoded `claims` and the `user_id` of the token.
+        """
         credentials_exception = HTTPException(
             status_code=400,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+        token_cache = get_token_cache()
+        entry = await token_cache.get(token)
+        if entry is not None:
+            return entry
+
+        import jwt
+
         try:
             payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-            email: str = payload.get("sub")
-            if email is None:
-                raise credentials_exception
-            token_data = user_schemas.User(email=email)
         except jwt.PyJWTError:
             raise credentials_exception
-        user = user_repository.get_user_by_email(email=token_data.email)
-        if user is None:
+        email = payload.get("sub")
+        if email is None:
+            raise credentials_exception
+        user = await user_repository.AsyncUserRepository(db).get_user_by_email(email)
+        if user is None or user.is_active is False:
             raise credentials_exception
-        return user
+        await token_cache.set(token, payload, user.id)
+        return {"claims": payload, "user_id": user.id}
@@ -0,0 +1,183 @@
+"""
+This module defines the interface of the storage backends holding document files.
+
+Objects are addressed by key and always move as streams of chunks, so no
+backend needs to hold a whole file in memory. Methods are async; backends
+built on blocking clients run them in the threadpool.
+"""
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+from starlette.concurrency import run_in_threadpool
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    """
+    Metadata of a stored object.
+    """
+
+    size: int
+    content_type: Optional[str] = None
+
+
+class Storage:
+    """
+    Interface for storage backends.
+    """
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes], content_type: str) -> int:
+        """
+        Store an object from a stream of chunks.
+
+        The object only becomes visible once the stream is exhausted; if it
+        fails, nothing is stored.
+
+        Args:
+            key (str): The object key.
+            chunks (AsyncIterator[bytes]): The object contents.
+            content_type (str): The MIME type of the object.
+
+        Returns:
+            int: The size of the stored object in bytes.
+        """
+        raise NotImplementedError
+
+    async def stream(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 1024 * 1024
+    ) -> AsyncIterator[bytes]:
+        """
+        Read an object, or a byte range of it, in chunks.
+
+        Args:
+            key (str): The object key.
+            start (int): The offset of the first byte.
+            end (Optional[int]): The offset of the last byte, inclusive; defaults to the end of the object.
+            chunk_size (int): The maximum size of each chunk.
+
+        Yields:
+            bytes: The next chunk.
+        """
+        raise NotImplementedError
+        yield b''
+
+    async def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        """
+        Read an object, or a byte range of it, into memory.
+
+        Only meant for small reads such as sniffing a file's header.
+
+        Args:
+            key (str): The object key.
+            start (int): The offset of the first byte.
+            end (Optional[int]): The offset of the last byte, inclusive; defaults to the end of the object.
+
+        Returns:
+            bytes: The requested bytes.
+        """
+        return b''.join([chunk async for chunk in self.stream(key, start, end)])
+
+    async def info(self, key: str) -> Optional[ObjectInfo]:
+        """
+        Get the metadata of an object.
+
+        Args:
+            key (str): The object key.
+
+        Returns:
+            Optional[ObjectInfo]: The metadata, or None if the object does not exist.
+        """
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        """
+        Check whether an object exists.
+
+        Args:
+            key (str): The object key.
+        """
+        return await self.info(key) is not None
+
+    async def move(self, source_key: str, key: str):
+        """
+        Move an object to another key, replacing any object already there.
+
+        Args:
+            source_key (str): The current key of the object.
+            key (str): The new key.
+        """
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        """
+        Delete an object. Deleting a missing object is not an error.
+
+        Args:
+            key (str): The object key.
+        """
+        raise NotImplementedError
+
+    def path(self, key: str) -> Optional[str]:
+        """
+        Return the local file path of an object, for backends that store files on disk.
+
+        Downloads of such objects can be served straight from the file
+        (`FileResponse`) instead of being streamed through the application.
+
+        Args:
+            key (str): The object key.
+
+        Returns:
+            Optional[str]: The file path, or None if the backend is not file based.
+        """
+        return None
+
+    @asynccontextmanager
+    async def local_file(self, key: str) -> AsyncIterator[str]:
+        """
+        Provide an object as a local file, for code that needs a path, like worker processes.
+
+        File based backends hand out the file itself. Otherwise the object is
+        streamed to a temporary file, which is removed on exit, so it is never
+        held in memory.
+
+        Args:
+            key (str): The object key.
+
+        Yields:
+            str: The file path; the file must not be modified.
+        """
+        path = self.path(key)
+        if path is not None:
+            yield path
+            return
+        fd, path = await run_in_threadpool(tempfile.mkstemp, prefix='storage-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                async for chunk in self.stream(key):
+                    await run_in_threadpool(file.write, chunk)
+            yield path
+        finally:
+            await run_in_threadpool(os.remove, path)
+
+    def presign_upload(self, key: str, content_type: str, max_size: int, expires_in: int) -> Optional[dict]:
+        """
+        Create a presigned POST that lets clients upload an object directly.
+
+        Args:
+            key (str): The object key.
+            content_type (str): The MIME type the upload must have.
+            max_size (int): The maximum size of the upload in bytes.
+            expires_in (int): Seconds until the presigned POST expires.
+
+        Returns:
+            Optional[dict]: The `url` and form `fields` of the POST, or None if
+            the backend does not support direct uploads.
+        """
+        return None
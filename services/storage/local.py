@@ -0,0 +1,100 @@
+"""
+This module provides the local filesystem storage backend.
+
+Objects are plain files under a root directory, so single-node and on-prem
+deployments need no S3 at all. Uploads are written to a temporary file in the
+same directory and renamed into place once complete, so readers never see a
+partial file. Because objects are real files, downloads can be served with
+`FileResponse` straight from disk.
+"""
+import mimetypes
+import os
+import tempfile
+from typing import AsyncIterator, Optional
+from starlette.concurrency import run_in_threadpool
+from services.storage.base import ObjectInfo, Storage
+
+
+class LocalStorage(Storage):
+    """
+    Storage backend keeping objects as files under a root directory.
+    """
+
+    def __init__(self, root: str):
+        """
+        Initialize the LocalStorage.
+
+        Args:
+            root (str): The directory holding the objects; it is created if missing.
+        """
+        self.root = os.path.realpath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> Optional[str]:
+        path = os.path.realpath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root or path == self.root:
+            raise ValueError(f'Invalid object key: {key}')
+        return path
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes], content_type: str) -> int:
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        await run_in_threadpool(os.makedirs, directory, exist_ok=True)
+        fd, temp_path = await run_in_threadpool(tempfile.mkstemp, dir=directory, prefix='.upload-')
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                async for chunk in chunks:
+                    await run_in_threadpool(file.write, chunk)
+                    size += len(chunk)
+                await run_in_threadpool(file.flush)
+                await run_in_threadpool(os.fsync, file.fileno())
+            await run_in_threadpool(os.replace, temp_path, path)
+        except BaseException:
+            await run_in_threadpool(self.remove, temp_path)
+            raise
+        return size
+
+    async def stream(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 1024 * 1024
+    ) -> AsyncIterator[bytes]:
+        file = await run_in_threadpool(open, self.path(key), 'rb')
+        try:
+            await run_in_threadpool(file.seek, start)
+            remaining = None if end is None else end + 1 - start
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await run_in_threadpool(file.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await run_in_threadpool(file.close)
+
+    async def info(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            stat = await run_in_threadpool(os.stat, self.path(key))
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(size=stat.st_size, content_type=mimetypes.guess_type(key)[0])
+
+    async def move(self, source_key: str, key: str):
+        path = self.path(key)
+        await run_in_threadpool(os.makedirs, os.path.dirname(path), exist_ok=True)
+        await run_in_threadpool(os.replace, self.path(source_key), path)
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self.remove, self.path(key))
+
+    @staticmethod
+    def remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
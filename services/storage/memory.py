@@ -0,0 +1,49 @@
+"""
+This module provides the in-memory storage backend.
+
+It keeps objects in a dict of the process, so it needs no infrastructure at
+all. Meant for tests and local experiments; objects are lost on restart and
+not shared between workers.
+"""
+from typing import AsyncIterator, Dict, Optional, Tuple
+from services.storage.base import ObjectInfo, Storage
+
+
+class MemoryStorage(Storage):
+    """
+    Storage backend keeping objects in process memory.
+    """
+
+    def __init__(self):
+        self.objects: Dict[str, Tuple[bytes, str]] = {}
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes], content_type: str) -> int:
+        contents = b''.join([chunk async for chunk in chunks])
+        self.objects[key] = (contents, content_type)
+        return len(contents)
+
+    async def stream(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 1024 * 1024
+    ) -> AsyncIterator[bytes]:
+        if key not in self.objects:
+            raise FileNotFoundError(key)
+        contents = self.objects[key][0]
+        stop = len(contents) if end is None else min(end + 1, len(contents))
+        for offset in range(start, stop, chunk_size):
+            yield contents[offset:min(offset + chunk_size, stop)]
+
+    async def info(self, key: str) -> Optional[ObjectInfo]:
+        if key not in self.objects:
+            return None
+        contents, content_type = self.objects[key]
+        return ObjectInfo(size=len(contents), content_type=content_type)
+
+    async def move(self, source_key: str, key: str):
+        self.objects[key] = self.objects.pop(source_key)
+
+    async def delete(self, key: str):
+        self.objects.pop(key, None)
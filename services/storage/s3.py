@@ -0,0 +1,154 @@
+"""
+This module provides the S3 storage backend.
+
+boto3 is blocking, so every call runs in the threadpool.
+"""
+from typing import AsyncIterator, Optional
+from botocore.exceptions import ClientError
+from starlette.concurrency import run_in_threadpool
+from services.storage.base import ObjectInfo, Storage
+
+# S3 rejects multipart parts smaller than 5 MB (except the last one).
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+async def parts(chunks: AsyncIterator[bytes], part_size: int) -> AsyncIterator[bytes]:
+    """
+    Regroup chunks into parts of at least `part_size` bytes; the last one may be smaller.
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= part_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+class S3Storage(Storage):
+    """
+    Storage backend keeping objects in an S3 bucket.
+    """
+
+    def __init__(self, client, bucket: str):
+        """
+        Initialize the S3Storage.
+
+        Args:
+            client: The boto3 S3 client.
+            bucket (str): The name of the bucket.
+        """
+        self.client = client
+        self.bucket = bucket
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes], content_type: str) -> int:
+        """
+        Upload an object.
+
+        Objects that fit in a single part are sent with one `put_object`;
+        larger ones go through a multipart upload, which is aborted if
+        anything fails so no orphaned parts are left in the bucket.
+        """
+        stream = parts(chunks, MIN_PART_SIZE)
+        first_part = await anext(stream, b'')
+        second_part = await anext(stream, None)
+        if second_part is None:
+            await run_in_threadpool(
+                self.client.put_object, Bucket=self.bucket, Key=key, Body=first_part, ContentType=content_type
+            )
+            return len(first_part)
+
+        upload_id = (await run_in_threadpool(
+            self.client.create_multipart_upload, Bucket=self.bucket, Key=key, ContentType=content_type
+        ))['UploadId']
+        uploaded = []
+        size = 0
+        try:
+            part_number = 0
+            for part in (first_part, second_part):
+                part_number += 1
+                uploaded.append(await self.upload_part(key, upload_id, part_number, part))
+                size += len(part)
+            async for part in stream:
+                part_number += 1
+                uploaded.append(await self.upload_part(key, upload_id, part_number, part))
+                size += len(part)
+            await run_in_threadpool(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': uploaded}
+            )
+        except Exception:
+            await run_in_threadpool(
+                self.client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+        return size
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        part = await run_in_threadpool(
+            self.client.upload_part,
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        return {'ETag': part['ETag'], 'PartNumber': part_number}
+
+    async def stream(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 1024 * 1024
+    ) -> AsyncIterator[bytes]:
+        byte_range = f'bytes={start}-{"" if end is None else end}'
+        body = (await run_in_threadpool(
+            self.client.get_object, Bucket=self.bucket, Key=key, Range=byte_range
+        ))['Body']
+        try:
+            while chunk := await run_in_threadpool(body.read, chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    async def info(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            head = await run_in_threadpool(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as error:
+            if error.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+        return ObjectInfo(size=head['ContentLength'], content_type=head.get('ContentType'))
+
+    async def move(self, source_key: str, key: str):
+        """
+        Copy the object server side, then delete the source.
+
+        The managed copy switches to a multipart copy for objects above 5 GB.
+        """
+        await run_in_threadpool(self.client.copy, {'Bucket': self.bucket, 'Key': source_key}, self.bucket, key)
+        await self.delete(source_key)
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    def presign_upload(self, key: str, content_type: str, max_size: int, expires_in: int) -> Optional[dict]:
+        """
+        Create a presigned POST whose policy pins the content type and size limit.
+        """
+        presigned = self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_size]
+            ],
+            ExpiresIn=expires_in
+        )
+        return {'url': presigned['url'], 'fields': presigned['fields']}
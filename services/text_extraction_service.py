@@ -0,0 +1,136 @@
+"""
+This module runs the text extraction of uploaded files into the search index.
+
+Extraction is CPU bound, so it runs in a dedicated process pool. Work is
+tracked on the stored objects themselves (`text_status`): an object is
+claimed, extracted, and its chunks and "done" status are committed together,
+one object at a time. A crash loses at most the objects being extracted,
+whose claims expire after `text_extraction_lease_seconds` and are picked up
+again by `resume`; finished objects are never extracted twice.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from multiprocessing import get_context
+from typing import List, Optional
+from sqlalchemy.engine import Row
+from config.database import get_async_session_maker
+from config.logger import Logger
+from config.settings import get_settings
+from config.storage import get_storage
+from repositories.stored_object_repository import StoredObjectRepository
+from utils.file_types import SUPPORTED_FILE_TYPES
+from utils.text_extraction import TextExtractionError, extract_text
+
+
+@lru_cache
+def get_text_extraction_executor() -> ProcessPoolExecutor:
+    """
+    Return the process pool extracting text, sized by `text_extraction_workers`.
+
+    Workers are spawned rather than forked, since the server process runs threads.
+    """
+    return ProcessPoolExecutor(
+        max_workers=get_settings().text_extraction_workers or os.cpu_count() or 1,
+        mp_context=get_context('spawn')
+    )
+
+
+class TextExtractionService:
+    """
+    Service class for extracting the text of stored files into the search index.
+    """
+
+    def __init__(self):
+        """
+        Initialize the TextExtractionService.
+        """
+        self.storage = get_storage()
+
+    async def extract(self, content_hashes: Optional[List[str]] = None) -> int:
+        """
+        Extract the text of the objects waiting for it, batch by batch, until none is left.
+
+        Failures are logged rather than raised. Only a file the parser rejects
+        is marked as failed; other objects are retried when their claim expires.
+
+        Args:
+            content_hashes (Optional[List[str]]): Only extract these objects,
+                e.g. the one just uploaded; by default every waiting object.
+
+        Returns:
+            int: The number of objects whose text was stored.
+        """
+        settings = get_settings()
+        if not settings.text_extraction_enabled:
+            return 0
+        extracted = 0
+        while True:
+            async with get_async_session_maker()() as db:
+                claimed = await StoredObjectRepository(db).claim_text_extractions(
+                    settings.text_extraction_batch_size, settings.text_extraction_lease_seconds, content_hashes
+                )
+            if not claimed:
+                return extracted
+            # Objects of a batch are extracted concurrently, each committed on its own.
+            results = await asyncio.gather(*(self.extract_object(stored_object) for stored_object in claimed))
+            extracted += sum(results)
+
+    async def resume(self):
+        """
+        Extract the text of every waiting object, including those left behind by a crash.
+        """
+        try:
+            extracted = await self.extract()
+            if extracted:
+                Logger.info("Extracted the text of %d stored objects", extracted)
+        except Exception:
+            Logger.exception("Could not resume text extraction")
+
+    async def extract_object(self, stored_object: Row) -> bool:
+        """
+        Extract and store the text of one claimed object.
+
+        A file the parser rejects is marked as failed and not retried. Other
+        errors, e.g. from storage, the database or a worker process dying,
+        leave the claim to expire, so the object is retried later; so does
+        cancellation.
+
+        Args:
+            stored_object (Row): The `content_hash`, `key` and `content_type` of the object.
+
+        Returns:
+            bool: True if the text was stored.
+        """
+        settings = get_settings()
+        try:
+            async with self.storage.local_file(stored_object.key) as path:
+                try:
+                    chunks, seconds = await asyncio.get_running_loop().run_in_executor(
+                        get_text_extraction_executor(), extract_text, path,
+                        SUPPORTED_FILE_TYPES[stored_object.content_type], settings.text_chunk_size
+                    )
+                except TextExtractionError:
+                    Logger.exception("Could not extract the text of %s", stored_object.key)
+                    async with get_async_session_maker()() as db:
+                        await StoredObjectRepository(db).fail_text_extraction(stored_object.content_hash)
+                    return False
+            async with get_async_session_maker()() as db:
+                stored = await StoredObjectRepository(db).finish_text_extraction(
+                    stored_object.content_hash, chunks, seconds
+                )
+        except BrokenProcessPool:
+            # A worker died, failing every file of the pool with it; start a fresh pool.
+            get_text_extraction_executor.cache_clear()
+            Logger.exception("Text extraction of %s was interrupted, it will be retried", stored_object.key)
+            return False
+        except Exception:
+            Logger.exception("Could not store the text of %s, it will be retried", stored_object.key)
+            return False
+        if stored:
+            Logger.info(
+                "Extracted %d chunks of text from %s in %d ms", len(chunks), stored_object.key, round(seconds * 1000)
+            )
+        return stored
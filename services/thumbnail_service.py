@@ -0,0 +1,108 @@
+"""
+This module runs the post-upload derivative pipeline: document thumbnails.
+
+Rendering is CPU bound, so it runs in a dedicated process pool and never on
+the event loop or the threadpool. Thumbnails are stored through the storage
+backend next to the files they derive from. Uploaded files are content
+addressed, so their thumbnails are too, and a file uploaded twice is only
+rendered once.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from multiprocessing import get_context
+from typing import Optional
+from config.logger import Logger
+from config.settings import get_settings
+from config.storage import get_storage
+from utils.file_types import MIME_TYPES
+from utils.thumbnails import THUMBNAIL_CONTENT_TYPE, render_thumbnail
+import models.document as document_models
+
+
+@lru_cache
+def get_thumbnail_executor() -> ProcessPoolExecutor:
+    """
+    Return the process pool rendering thumbnails, sized by `thumbnail_workers`.
+
+    Workers are spawned rather than forked, since the server process runs threads.
+    """
+    return ProcessPoolExecutor(
+        max_workers=get_settings().thumbnail_workers or os.cpu_count() or 1,
+        mp_context=get_context('spawn')
+    )
+
+
+def source_thumbnail_key(source: str) -> str:
+    """
+    Return the storage key of the thumbnail of some content, given its hash or storage key.
+    """
+    return f'thumbnails/{source}.jpeg'
+
+
+def thumbnail_key(document: document_models.Document) -> Optional[str]:
+    """
+    Return the storage key of a document's thumbnail, or None if its type has no thumbnails.
+    """
+    if document.file_type not in MIME_TYPES or not (document.content_hash or document.file_url):
+        return None
+    return source_thumbnail_key(document.content_hash or document.file_url)
+
+
+async def single(data: bytes):
+    yield data
+
+
+class ThumbnailService:
+    """
+    Service class for generating and serving document thumbnails.
+    """
+
+    def __init__(self):
+        """
+        Initialize the ThumbnailService.
+        """
+        self.storage = get_storage()
+
+    async def generate(self, source_key: str, file_type: str, key: str):
+        """
+        Render and store the thumbnail of a stored file, unless it already exists.
+
+        The worker reads the file from disk (see `Storage.local_file`).
+        Failures are logged rather than raised: a missing thumbnail must not
+        fail the upload it belongs to.
+
+        Args:
+            source_key (str): The storage key of the file.
+            file_type (str): The file type of the file, a name from `FILE_TYPES`.
+            key (str): The storage key of the thumbnail.
+        """
+        settings = get_settings()
+        try:
+            if await self.storage.exists(key):
+                return
+            async with self.storage.local_file(source_key) as path:
+                try:
+                    thumbnail = await asyncio.get_running_loop().run_in_executor(
+                        get_thumbnail_executor(), render_thumbnail, path, file_type, settings.thumbnail_size
+                    )
+                except BrokenProcessPool:
+                    # A worker died, e.g. on a file that crashed the renderer; start a fresh pool.
+                    get_thumbnail_executor.cache_clear()
+                    raise
+            await self.storage.put(key, single(thumbnail), THUMBNAIL_CONTENT_TYPE)
+        except Exception:
+            Logger.exception("Could not generate thumbnail %s for %s", key, source_key)
+
+    async def generate_for(self, document: document_models.Document):
+        """
+        Generate the thumbnail of a document, if thumbnails are enabled and its type has them.
+
+        Args:
+            document (Document): The document.
+        """
+        key = thumbnail_key(document)
+        if get_settings().thumbnails_enabled and key is not None:
+            await self.generate(document.file_url, document.file_type, key)
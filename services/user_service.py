@@ -1,12 +1,24 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime
 from datetime import timedelta
-from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from repositories.user_repository import UserRepository
-from schemas.user import User, UserCreate, UserUpdate
-from utils.auth.auth_handler import verify_password
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from repositories.user_repository import AsyncUserRepository
+from services.document_service import DocumentService
+from schemas.user import User, UserCreate, UserDocumentsPage, UserPage, UserUpdate
+from utils.auth.password_hasher import get_password_hasher
 from services.jwt_service  import JWTService
+from utils.http import check_if_match, make_etag
+from utils.pagination import decode_cursor, page_size, split_page
+
+
+def user_etag(user) -> str:
+    """
+    Return the strong ETag of a user version.
+
+    The user representation embeds their documents, so their versions are part of the tag.
+    """
+    return make_etag(user.id, user.updated_at, *((document.id, document.updated_at) for document in user.documents))
 
 
 class UserService:
@@ -14,17 +26,17 @@ class UserService:
     Service class for handling user-related operations.
     """
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         """
         Initialize the UserService.
 
         Args:
-            db (Session): The SQLAlchemy database session.
+            db (AsyncSession): The SQLAlchemy async database session.
         """
         self.db = db
-        self.repository = UserRepository(db)
+        self.repository = AsyncUserRepository(db)
 
-    def get_user(self, user_id: int) -> Optional[User]:
+    async def get_user(self, user_id: int) -> Optional[User]:
         """
         Retrieve a user by their ID.
 
@@ -34,18 +46,32 @@ class UserService:
         Returns:
             Optional[User]: The retrieved user, or None if not found.
         """
-        return self.repository.get_user(user_id)
-
-    def get_all_users(self) -> List[User]:
+        return await self.repository.get_user(user_id)
+
+    async def get_all_users(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        include_documents: bool = False
+    ) -> Union[UserPage, UserDocumentsPage]:
         """
-        Retrieve all users.
+        Retrieve a page of users, newest first.
+
+        Args:
+            limit (Optional[int]): The requested page size, capped at `max_page_size`.
+            cursor (Optional[str]): The cursor returned with the previous page.
+            include_documents (bool): Embed the documents of each user.
 
         Returns:
-            List[User]: A list of all users.
+            Union[UserPage, UserDocumentsPage]: The users of the page and the cursor of the next page.
         """
-        return self.repository.get_all_users()
+        size = page_size(limit)
+        users = await self.repository.get_users(size + 1, decode_cursor(cursor), include_documents)
+        users, next_cursor = split_page(users, size)
+        page = UserDocumentsPage if include_documents else UserPage
+        return page(items=users, next_cursor=next_cursor)
 
-    def create_user(self, user_data: UserCreate) -> User:
+    async def create_user(self, user_data: UserCreate) -> User:
         """
         Create a new user.
 
@@ -60,50 +86,95 @@ class UserService:
         expires_delta = timedelta(hours=2)  # Set the token expiration time as desired
         token = JWTService.create_access_token(data={"sub": user_data.email}, expires_delta=expires_delta)
         # Assign the token to the user
-        new_user = self.repository.create_user(user_data)
+        new_user = await self.repository.create_user(user_data)
         new_user.token = token
         return new_user
 
-    def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[User]:
+    async def update_user(self, user_id: int, user_data: UserUpdate, if_match: Optional[str] = None) -> Optional[User]:
         """
         Update an existing user.
 
         Args:
             user_id (int): The ID of the user to update.
             user_data (UserUpdate): The updated data for the user.
+            if_match (Optional[str]): The If-Match header; the update fails with 412 unless it matches.
 
         Returns:
             Optional[User]: The updated user, or None if not found.
         """
-        user = self.repository.get_user(user_id)
+        user = await self.repository.get_user(user_id, cached=False)
         if user:
-            user.username = user_data.username or user.username
+            check_if_match(if_match, user_etag(user))
             user.email = user_data.email or user.email
             user.updated_at = datetime.utcnow()
-            return self.repository.update_user(user)
+            return await self.repository.update_user(user)
         return None
 
-    def delete_user(self, user_id: int) -> bool:
+    async def delete_user(self, user_id: int, if_match: Optional[str] = None) -> bool:
         """
         Delete a user.
 
         Args:
             user_id (int): The ID of the user to delete.
+            if_match (Optional[str]): The If-Match header; the delete fails with 412 unless it matches.
 
         Returns:
             bool: True if the user was deleted successfully, False otherwise.
         """
-        user = self.repository.get_user(user_id)
+        user = await self.repository.get_user(user_id, cached=False)
         if user:
-            return self.repository.delete_user(user)
+            check_if_match(if_match, user_etag(user))
+            content_hashes = [document.content_hash for document in user.documents]
+            await self.repository.delete_user(user)
+            await DocumentService(self.db).collect_garbage(content_hashes)
+            return True
         return False
-    
-    def authenticate_user(self, email: str, password: str):
-        user = self.repository.get_user_by_email(self.db, email)
+
+    async def authenticate_user(self, email: str, password: str):
+        """
+        Check a user's credentials.
+
+        A password hashed with outdated bcrypt rounds is rehashed with the
+        current ones once it has been verified.
+
+        Args:
+            email (str): The email of the user.
+            password (str): The plain password.
+
+        Returns:
+            The user if the credentials are valid, False otherwise.
+        """
+        user = await self.repository.get_user_by_email(email, cached=False)
         if not user:
             return False
 
-        # verify password is just auitil so it cant be moved here 
-        if not verify_password(password, user.hashed_password):
+        verified, new_hash = await get_password_hasher().verify_and_update(password, user.password)
+        if not verified:
             return False
+        if new_hash:
+            await self.repository.update_password(user, new_hash)
         return user
+
+    async def login(self, email: str, password: str) -> dict:
+        """
+        Authenticate a user and issue an access token.
+
+        Args:
+            email (str): The email of the user.
+            password (str): The plain password.
+
+        Returns:
+            dict: The access token and its type.
+
+        Raises:
+            HTTPException: 401 Unauthorized if the credentials are invalid.
+        """
+        user = await self.authenticate_user(email, password)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect email or password",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        token = JWTService.create_access_token(data={"sub": user.email}, expires_delta=timedelta(hours=2))
+        return {"access_token": token, "token_type": "bearer"}
@@ -0,0 +1,84 @@
+"""
+Shared fixtures of the test suite.
+
+The app runs against a scratch SQLite database, migrated with alembic once
+per session, and in-memory storage. Caching and background work are off, so
+every request reaches the database and does all its work before returning.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+# Settings are read on import, so point the app at a scratch database first.
+os.environ.update(
+    DB_URL=f'sqlite:///{tempfile.mkdtemp()}/test.sqlite',
+    DB_ASYNC_URL='',
+    DB_REPLICA_URLS='[]',
+    STORAGE_BACKEND='memory',
+    CACHE_BACKEND='none',
+    TEXT_EXTRACTION_ENABLED='false',
+    TEXT_EXTRACTION_RESUME='false',
+    PENDING_UPLOAD_CLEANUP_SECONDS='0',
+    THUMBNAILS_ENABLED='false',
+    DB_QUERY_HEADERS='true',
+    METRICS_MULTIPROCESS_DIR='',
+    LOG_FILE='',
+    LOG_CONSOLE_LEVEL='WARNING',
+)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from config.database import get_async_engine, get_async_session_maker, get_engine  # noqa: E402
+from utils.cache import get_cache, get_token_cache  # noqa: E402
+# Register every model, so relationships resolve in tests that never import the app.
+import models.user  # noqa: E402,F401
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    subprocess.run(
+        [sys.executable, '-m', 'alembic', 'upgrade', 'head'], cwd=PROJECT_ROOT, check=True, capture_output=True
+    )
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture
+def db():
+    with Session(get_engine()) as session:
+        yield session
+
+
+@pytest.fixture
+async def async_db():
+    async with get_async_session_maker()() as session:
+        yield session
+    # The next test may run on another event loop; don't hand it this loop's connections.
+    await get_async_engine().dispose()
+
+
+@pytest.fixture
+def client():
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+        # Like `async_db`: the next client runs another event loop.
+        client.portal.call(get_async_engine().dispose)
+
+
+@pytest.fixture
+def fresh_caches():
+    # The backends are created once per process; let the test create its own.
+    get_cache.cache_clear()
+    get_token_cache.cache_clear()
+    yield
+    get_cache.cache_clear()
+    get_token_cache.cache_clear()
@@ -0,0 +1,86 @@
+"""
+Create, read, update and delete through the async engine, in the
+repositories and in the routes built on them.
+"""
+import pytest
+from models.document import Document
+from repositories.document_repository import AsyncDocumentRepository
+from repositories.user_repository import AsyncUserRepository
+from schemas.user import UserCreate
+
+DOCUMENT = {'title': 'Report', 'file_type': 'pdf', 'file_url': 'report.pdf', 'description': 'Quarterly report'}
+
+
+@pytest.mark.anyio
+async def test_document_repository_crud(async_db):
+    repository = AsyncDocumentRepository(async_db)
+    document = await repository.create_document(Document(**DOCUMENT))
+    assert document.id is not None
+
+    document = await repository.get_document(document.id, cached=False)
+    assert document.title == 'Report'
+
+    document.title = 'Annual report'
+    await repository.update_document(document)
+    async_db.expunge_all()
+    assert (await repository.get_document(document.id, cached=False)).title == 'Annual report'
+
+    await repository.delete_document(document)
+    assert await repository.get_document(document.id, cached=False) is None
+
+
+@pytest.mark.anyio
+async def test_user_repository_crud(async_db):
+    repository = AsyncUserRepository(async_db)
+    user = await repository.create_user(UserCreate(email='async-repository@example.com', password='secret'))
+    assert user.id is not None and user.password != 'secret'
+
+    async_db.expunge_all()
+    user = await repository.get_user_by_email('async-repository@example.com', cached=False)
+    assert user.documents == []
+
+    user.email = 'async-repository-renamed@example.com'
+    await repository.update_user(user)
+    async_db.expunge_all()
+    assert (await repository.get_user(user.id, cached=False)).email == 'async-repository-renamed@example.com'
+
+    await repository.delete_user(user)
+    assert await repository.get_user(user.id, cached=False) is None
+
+
+def test_document_routes(client):
+    created = client.post('/documents', json=DOCUMENT)
+    assert created.status_code == 200
+    document_id = created.json()['id']
+
+    assert client.get(f'/documents/{document_id}').json()['title'] == 'Report'
+    assert document_id in [item['id'] for item in client.get('/documents').json()['items']]
+
+    updated = client.put(f'/documents/{document_id}', json={**DOCUMENT, 'title': 'Annual report'})
+    assert updated.status_code == 200
+    assert client.get(f'/documents/{document_id}').json()['title'] == 'Annual report'
+
+    assert client.delete(f'/documents/{document_id}').status_code == 200
+    assert client.get(f'/documents/{document_id}').status_code == 404
+
+
+def test_user_routes(client):
+    signup = client.post('/user/signup', json={'email': 'async-routes@example.com', 'password': 'secret'})
+    assert signup.status_code == 200
+    user_id = signup.json()['id']
+
+    login = client.post('/login', data={'username': 'async-routes@example.com', 'password': 'secret'})
+    assert login.status_code == 200 and login.json()['access_token']
+    authorization = {'Authorization': f"Bearer {login.json()['access_token']}"}
+    assert client.get('/users/me', headers=authorization).json()['id'] == user_id
+    wrong = client.post('/login', data={'username': 'async-routes@example.com', 'password': 'wrong'})
+    assert wrong.status_code in (401, 403)
+
+    updated = client.put(f'/users/{user_id}', json={'email': 'async-routes-renamed@example.com'})
+    assert updated.status_code == 200
+    assert client.get(f'/users/{user_id}').json()['email'] == 'async-routes-renamed@example.com'
+
+    assert client.delete(f'/users/{user_id}').status_code == 200
+    assert client.get(f'/users/{user_id}').status_code == 404
+    # Deleting the user retires their token.
+    assert client.get('/users/me', headers=authorization).status_code == 400
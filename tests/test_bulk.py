@@ -0,0 +1,72 @@
+"""
+Bulk create, update and delete of documents, reported item by item.
+"""
+from config.settings import get_settings
+
+DOCUMENT = {'title': 'Report', 'file_type': 'pdf', 'file_url': 'report.pdf', 'description': 'Quarterly report'}
+MISSING_ID = 2 ** 31 - 1
+
+
+def bulk_create(client, count):
+    response = client.post('/documents/bulk', json={'items': [{**DOCUMENT, 'title': f'Report {i}'} for i in range(count)]})
+    assert response.status_code == 200
+    return response.json()['items']
+
+
+def test_bulk_create_reports_each_id_in_order(client):
+    items = bulk_create(client, 3)
+    assert [(item['index'], item['status']) for item in items] == [(0, 'created'), (1, 'created'), (2, 'created')]
+    assert [client.get(f"/documents/{item['id']}").json()['title'] for item in items] == [
+        'Report 0', 'Report 1', 'Report 2'
+    ]
+
+
+def test_bulk_update_reports_missing_documents(client):
+    first, second = [item['id'] for item in bulk_create(client, 2)]
+
+    response = client.patch('/documents/bulk', json={'items': [
+        {'id': first, 'title': 'Renamed'},
+        {'id': MISSING_ID, 'title': 'Nobody'},
+        {'id': second, 'description': 'Only the description'},
+    ]})
+    assert response.status_code == 200
+    assert response.json()['items'] == [
+        {'index': 0, 'id': first, 'status': 'updated'},
+        {'index': 1, 'id': MISSING_ID, 'status': 'not_found'},
+        {'index': 2, 'id': second, 'status': 'updated'},
+    ]
+    assert client.get(f'/documents/{first}').json()['title'] == 'Renamed'
+    # Attributes that are not set keep their value.
+    assert client.get(f'/documents/{second}').json()['title'] == 'Report 1'
+    assert client.get(f'/documents/{second}').json()['description'] == 'Only the description'
+
+
+def test_bulk_delete_reports_missing_documents(client):
+    first, second = [item['id'] for item in bulk_create(client, 2)]
+
+    response = client.request('DELETE', '/documents/bulk', json={'ids': [first, MISSING_ID, second]})
+    assert response.status_code == 200
+    assert [item['status'] for item in response.json()['items']] == ['deleted', 'not_found', 'deleted']
+    assert client.get(f'/documents/{first}').status_code == 404
+    assert client.get(f'/documents/{second}').status_code == 404
+
+
+def test_more_than_bulk_max_items_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'bulk_max_items', 2)
+    (existing,) = [item['id'] for item in bulk_create(client, 1)]
+
+    items = [{**DOCUMENT, 'title': f'Over {i}'} for i in range(3)]
+    assert client.post('/documents/bulk', json={'items': items}).status_code == 400
+    assert client.patch('/documents/bulk', json={'items': [{'id': existing, 'title': 'Over'}] * 3}).status_code == 400
+    assert client.request('DELETE', '/documents/bulk', json={'ids': [existing] * 3}).status_code == 400
+    assert client.get(f'/documents/{existing}').json()['title'] == 'Report 0'
+
+
+def test_bulk_update_invalidates_cached_documents(client, monkeypatch, fresh_caches):
+    monkeypatch.setattr(get_settings(), 'cache_backend', 'memory')
+    (document_id,) = [item['id'] for item in bulk_create(client, 1)]
+    # Caches the document.
+    assert client.get(f'/documents/{document_id}').json()['title'] == 'Report 0'
+
+    client.patch('/documents/bulk', json={'items': [{'id': document_id, 'title': 'Renamed'}]})
+    assert client.get(f'/documents/{document_id}').json()['title'] == 'Renamed'
@@ -0,0 +1,20 @@
+"""
+Cache backends and their setup.
+"""
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from config.settings import get_settings
+
+
+def test_redis_backend_without_redis_fails_at_startup(monkeypatch, fresh_caches):
+    from main import app
+
+    monkeypatch.setattr(get_settings(), 'cache_backend', 'redis')
+    # A None entry makes the import fail as if the package were not installed.
+    monkeypatch.setitem(sys.modules, 'redis', None)
+    monkeypatch.setitem(sys.modules, 'redis.asyncio', None)
+
+    with pytest.raises(RuntimeError, match='`redis` extra'):
+        with TestClient(app):
+            pass
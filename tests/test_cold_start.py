@@ -0,0 +1,48 @@
+"""
+Importing the app has no side effects a Lambda cold start would pay for or
+fail on: logging is set up on first use, and only to the console under Lambda.
+"""
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, logging, sys, threading
+import main
+state = {"threads": threading.active_count(), "handlers": len(logging.getLogger("my_app").handlers)}
+if "log" in sys.argv:
+    from config.logger import Logger
+    Logger.info("first record")
+    state["types"] = sorted(type(handler).__name__ for handler in logging.getLogger("my_app").handlers)
+print(json.dumps(state))
+'''
+
+
+@pytest.fixture
+def read_only_root(tmp_path):
+    # A file where the log directory should be: opening logger/app.log fails, even as root.
+    (tmp_path / 'logger').write_text('')
+    return tmp_path
+
+
+def run_child(cwd, *args, **env):
+    environ = {key: value for key, value in os.environ.items() if not key.startswith('LOG_')}
+    environ.update(PYTHONPATH=PROJECT_ROOT, **env)
+    result = subprocess.run([sys.executable, '-c', CHILD, *args], cwd=cwd, env=environ, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_import_does_not_set_up_logging(read_only_root):
+    state = run_child(read_only_root, LOG_QUEUE='true')
+    assert state['threads'] == 1
+    assert state['handlers'] == 0
+
+
+def test_lambda_logs_to_the_console_only(read_only_root):
+    state = run_child(read_only_root, 'log', AWS_LAMBDA_FUNCTION_NAME='documents')
+    assert state['types'] == ['StreamHandler']
@@ -0,0 +1,51 @@
+"""
+ETags of documents and users: GET answers If-None-Match with a 304, and
+PUT and DELETE refuse a stale If-Match with a 412.
+"""
+import uuid
+import pytest
+
+DOCUMENT = {'title': 'Report', 'file_type': 'pdf', 'file_url': 'report.pdf', 'description': 'Quarterly report'}
+
+
+def new_document(client):
+    return f"/documents/{client.post('/documents', json=DOCUMENT).json()['id']}", DOCUMENT
+
+
+def new_user(client):
+    signup = client.post('/user/signup', json={'email': f'{uuid.uuid4().hex}@example.com', 'password': 'secret'})
+    return f"/users/{signup.json()['id']}", {'email': f'{uuid.uuid4().hex}@example.com'}
+
+
+@pytest.fixture(params=[new_document, new_user], ids=['document', 'user'])
+def resource(request, client):
+    return request.param(client)
+
+
+def test_matching_if_none_match_is_not_modified(client, resource):
+    url, _ = resource
+    etag = client.get(url).headers['ETag']
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['ETag'] == etag
+
+    assert client.get(url, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_stale_if_match_is_refused(client, resource):
+    url, data = resource
+    stale = client.get(url).headers['ETag']
+
+    updated = client.put(url, json=data, headers={'If-Match': stale})
+    assert updated.status_code == 200
+    current = updated.headers['ETag']
+    assert current != stale
+
+    assert client.put(url, json=data, headers={'If-Match': stale}).status_code == 412
+    assert client.delete(url, headers={'If-Match': stale}).status_code == 412
+    assert client.get(url).headers['ETag'] == current
+
+    assert client.delete(url, headers={'If-Match': current}).status_code == 200
+    assert client.get(url).status_code == 404
@@ -0,0 +1,76 @@
+"""
+Downloads of document files: whole files, single byte ranges and If-Range,
+from memory storage (streamed) and local storage (whole files sent with
+`FileResponse`).
+"""
+from uuid import uuid4
+import pytest
+import routers.document_router
+from services.storage.local import LocalStorage
+from services.storage.memory import MemoryStorage
+from tests.files import make_pdf
+
+
+@pytest.fixture(params=['memory', 'local'])
+def download(request, client, tmp_path, monkeypatch):
+    storage = MemoryStorage() if request.param == 'memory' else LocalStorage(str(tmp_path))
+    monkeypatch.setattr('services.document_service.get_storage', lambda: storage)
+    file_responses = []
+    FileResponse = routers.document_router.FileResponse
+
+    def file_response(*args, **kwargs):
+        file_responses.append(args)
+        return FileResponse(*args, **kwargs)
+
+    monkeypatch.setattr(routers.document_router, 'FileResponse', file_response)
+
+    # Unique content: a stored object of earlier content lives in another test's storage.
+    data = make_pdf(f'download {uuid4().hex}')
+    document_id = client.post('/upload', files={'file': ('download.pdf', data, 'application/pdf')}).json()['document_id']
+    return request.param, f'/documents/{document_id}/content', data, file_responses
+
+
+def test_whole_file(client, download):
+    backend, url, data, file_responses = download
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers['accept-ranges'] == 'bytes'
+    assert response.headers['content-type'] == 'application/pdf'
+    assert len(file_responses) == (1 if backend == 'local' else 0)
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-9', slice(0, 10)),
+    ('bytes=10-', slice(10, None)),
+    ('bytes=-5', slice(-5, None)),
+    ('bytes=5-999999', slice(5, None)),
+])
+def test_byte_range(client, download, header, expected):
+    backend, url, data, file_responses = download
+    response = client.get(url, headers={'Range': header})
+    assert response.status_code == 206
+    assert response.content == data[expected]
+    start = expected.indices(len(data))[0]
+    assert response.headers['content-range'] == f'bytes {start}-{start + len(data[expected]) - 1}/{len(data)}'
+    assert file_responses == []
+
+
+def test_unsatisfiable_range(client, download):
+    backend, url, data, file_responses = download
+    response = client.get(url, headers={'Range': f'bytes={len(data)}-'})
+    assert response.status_code == 416
+    assert response.headers['content-range'] == f'bytes */{len(data)}'
+
+
+def test_if_range(client, download):
+    backend, url, data, file_responses = download
+    etag = client.get(url).headers['etag']
+
+    current = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert current.status_code == 206
+    assert current.content == data[:10]
+
+    stale = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == data
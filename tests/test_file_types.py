@@ -0,0 +1,60 @@
+"""
+The file type registry and the detectors sniffing uploads.
+"""
+import io
+from uuid import uuid4
+import pytest
+from PIL import Image
+from config.settings import get_settings
+from schemas.document import FileType
+from utils.file_types import DETECTORS, FILE_TYPES, LEGACY_FILE_TYPES, SNIFF_SIZE, SignatureDetector, get_detector
+from tests.files import make_pdf
+
+
+def make_image(format: str) -> bytes:
+    output = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(output, format=format)
+    return output.getvalue()
+
+
+FILES = {
+    'application/pdf': make_pdf('file types'),
+    'image/png': make_image('PNG'),
+    'image/jpeg': make_image('JPEG'),
+}
+
+
+def test_file_type_enum_follows_the_registry():
+    assert {member.value for member in FileType} == {
+        *(file_type.name for file_type in FILE_TYPES), *LEGACY_FILE_TYPES
+    }
+    assert set(FILES) == {file_type.mime_type for file_type in FILE_TYPES}
+
+
+@pytest.mark.parametrize('detector', DETECTORS)
+@pytest.mark.parametrize('mime_type', FILES)
+def test_detectors_recognise_supported_types_from_the_header(detector, mime_type):
+    assert DETECTORS[detector]().detect(FILES[mime_type][:SNIFF_SIZE]) == mime_type
+
+
+def test_signature_detector_only_knows_supported_types():
+    assert SignatureDetector().detect(b'plain text') is None
+    assert DETECTORS['signature+magic']().detect(b'plain text') == 'text/plain'
+
+
+@pytest.fixture(params=DETECTORS)
+def detector(request, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'file_type_detector', request.param)
+    get_detector.cache_clear()
+    yield request.param
+    get_detector.cache_clear()
+
+
+def test_uploads_are_sniffed_by_the_configured_detector(client, detector):
+    accepted = client.post('/upload', files={'file': ('image.png', make_image('PNG') + uuid4().bytes, 'text/plain')})
+    assert accepted.status_code == 200
+    assert client.get(f"/documents/{accepted.json()['document_id']}").json()['file_type'] == 'png'
+
+    # The declared content type is not trusted.
+    rejected = client.post('/upload', files={'file': ('fake.pdf', b'plain text', 'application/pdf')})
+    assert rejected.status_code == 400
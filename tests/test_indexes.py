@@ -0,0 +1,13 @@
+"""
+The paginated listings must be served by their composite indexes.
+"""
+import pytest
+from benchmarks.explain_indexes import CHECKS, capture_statement, explain
+from config.database import get_engine
+
+
+@pytest.mark.parametrize('index_name, run_query', [check[1:] for check in CHECKS], ids=[check[0] for check in CHECKS])
+def test_listing_uses_index(index_name, run_query):
+    engine = get_engine()
+    plan = explain(engine, *capture_statement(engine, run_query))
+    assert index_name in plan, plan
@@ -0,0 +1,59 @@
+"""
+Keyset pagination of the document listings, overall and per owner.
+"""
+from datetime import datetime, timedelta
+from uuid import uuid4
+import pytest
+from models.document import Document
+from models.user import User
+
+
+def pages(client, url, limit):
+    """
+    Follow the cursors of a listing and return the ID of every item, page by page.
+    """
+    result, cursor = [], None
+    while True:
+        page = client.get(url, params={'limit': limit, **({'cursor': cursor} if cursor else {})}).json()
+        assert len(page['items']) <= limit
+        result.append([item['id'] for item in page['items']])
+        cursor = page['next_cursor']
+        if not cursor:
+            return result
+
+
+@pytest.fixture
+def owners(db):
+    """
+    Two users with five documents each, and the IDs of those documents, newest first.
+    """
+    now = datetime.utcnow()
+    owners = []
+    for _ in range(2):
+        documents = [
+            Document(title=f'Document {i}', file_type='pdf', file_url=f'{uuid4().hex}.pdf', description='',
+                     created_at=now - timedelta(minutes=i), updated_at=now)
+            for i in range(5)
+        ]
+        user = User(email=f'{uuid4().hex}@example.com', password='', created_at=now, updated_at=now, documents=documents)
+        db.add(user)
+        owners.append((user, documents))
+    db.commit()
+    return [(user.id, [document.id for document in documents]) for user, documents in owners]
+
+
+def test_user_documents_are_paged_newest_first(client, owners):
+    (user_id, document_ids), _ = owners
+
+    assert pages(client, f'/users/{user_id}/documents', 2) == [document_ids[0:2], document_ids[2:4], document_ids[4:]]
+
+
+def test_owner_filter_matches_the_user_listing(client, owners):
+    for user_id, document_ids in owners:
+        assert sum(pages(client, f'/documents?owner_id={user_id}', 3), []) == document_ids
+
+
+def test_user_without_documents_has_an_empty_listing(client):
+    user_id = client.post('/user/signup', json={'email': f'{uuid4().hex}@example.com', 'password': 'secret'}).json()['id']
+
+    assert client.get(f'/users/{user_id}/documents').json() == {'items': [], 'next_cursor': None}
@@ -0,0 +1,108 @@
+"""
+The logging pipeline: JSON lines, sampling of DEBUG records, and handlers
+running behind a queue.
+"""
+import json
+import logging
+import queue
+import sys
+from config.settings import Settings
+from logger.logging import DebugSampler, JsonFormatter, LocalQueueHandler, create_handlers, create_pipeline
+
+
+def make_record(level=logging.INFO, msg='hello %s', args=('world',), **extra):
+    record = logging.LogRecord('my_app', level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_json_lines_carry_the_message_and_extra_fields():
+    entry = json.loads(JsonFormatter().format(make_record(document_id=7, size=1.5)))
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'my_app'
+    assert entry['message'] == 'hello world'
+    assert entry['time'].endswith('+00:00')
+    assert (entry['document_id'], entry['size']) == (7, 1.5)
+    assert 'args' not in entry and 'exception' not in entry
+
+
+def test_json_lines_carry_the_exception():
+    try:
+        raise ValueError('broken')
+    except ValueError:
+        record = make_record(exc_info=sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert 'ValueError: broken' in entry['exception']
+
+
+def test_debug_sampler_only_drops_debug_records():
+    assert not DebugSampler(0).filter(make_record(logging.DEBUG))
+    assert DebugSampler(0).filter(make_record(logging.INFO))
+    assert DebugSampler(1).filter(make_record(logging.DEBUG))
+
+
+def test_debug_sampler_rate(monkeypatch):
+    values = iter([0.1, 0.9] * 50)
+    monkeypatch.setattr('logger.logging.random.random', lambda: next(values))
+    sampler = DebugSampler(0.5)
+    assert sum(sampler.filter(make_record(logging.DEBUG)) for _ in range(100)) == 50
+
+
+def test_handlers_sharing_a_sampler_keep_the_same_records():
+    sampler = DebugSampler(0.5)
+    records = [make_record(logging.DEBUG) for _ in range(100)]
+    first = [sampler.filter(record) for record in records]
+    assert [sampler.filter(record) for record in records] == first
+
+
+def pipeline(handlers, **values):
+    """
+    Return a logger writing to `handlers` through the pipeline, its handlers and its listener.
+
+    Stopping the listener waits for the queued records to be written.
+    """
+    handlers, listener = create_pipeline(Settings(**values), handlers)
+    logger = logging.Logger('pipeline-test', logging.DEBUG)
+    for handler in handlers:
+        logger.addHandler(handler)
+    return logger, handlers, listener
+
+
+def test_queued_records_reach_the_handlers():
+    output = ListHandler()
+    logger, handlers, listener = pipeline([output], log_queue=True, log_debug_sample_rate=0)
+    assert [type(handler) for handler in handlers] == [LocalQueueHandler]
+
+    logger.debug('dropped')
+    logger.info('kept %d', 1)
+    listener.stop()
+    assert [record.getMessage() for record in output.records] == ['kept 1']
+
+
+def test_full_queue_drops_records_without_blocking():
+    handler = LocalQueueHandler(queue.Queue(1))
+    handler.handle(make_record())
+    handler.handle(make_record())
+    assert handler.dropped == 1
+
+
+def test_json_file_output(tmp_path):
+    log_file = tmp_path / 'app.log'
+    settings = dict(log_format='json', log_file=str(log_file), log_file_level='INFO', log_console_level='CRITICAL')
+    logger, _, listener = pipeline(create_handlers(Settings(**settings)), log_queue=True, **settings)
+
+    logger.info('uploaded %s', 'a.pdf', extra={'document_id': 3})
+    logger.debug('not written')
+    listener.stop()
+    (line,) = log_file.read_text().splitlines()
+    assert json.loads(line)['message'] == 'uploaded a.pdf'
+    assert json.loads(line)['document_id'] == 3
@@ -0,0 +1,79 @@
+"""
+Per-route request metrics, their Prometheus exposition at /metrics, and
+their aggregation across workers.
+"""
+from uuid import uuid4
+from utils.metrics import Metric, merge
+from tests.files import make_pdf
+
+DOCUMENT = {'title': 'Report', 'file_type': 'pdf', 'file_url': 'report.pdf', 'description': 'Quarterly report'}
+
+
+def scrape(client) -> dict:
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    samples = {}
+    for line in response.text.splitlines():
+        if not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples
+
+
+def delta(before: dict, after: dict, series: str) -> float:
+    return after.get(series, 0) - before.get(series, 0)
+
+
+def test_requests_are_counted_per_route_template(client):
+    document_id = client.post('/documents', json=DOCUMENT).json()['id']
+    before = scrape(client)
+
+    client.get(f'/documents/{document_id}')
+    client.get(f'/documents/{document_id}')
+    client.get(f'/no-such-path/{uuid4().hex}')
+    after = scrape(client)
+
+    route = 'method="GET",route="/documents/{document_id}"'
+    assert delta(before, after, f'http_requests_total{{{route},status="200"}}') == 2
+    assert delta(before, after, f'http_request_duration_seconds_count{{{route}}}') == 2
+    assert delta(before, after, f'http_response_bytes_total{{{route}}}') > 0
+    assert delta(before, after, 'http_requests_total{method="GET",route="<unmatched>",status="404"}') == 1
+
+
+def test_upload_sizes_are_recorded(client):
+    before = scrape(client)
+    data = make_pdf(f'metrics {uuid4().hex}')
+    client.post('/upload', files={'file': ('metrics.pdf', data, 'application/pdf')})
+    after = scrape(client)
+
+    labels = 'method="POST",route="/upload"'
+    assert delta(before, after, f'http_request_size_bytes_count{{{labels}}}') == 1
+    assert delta(before, after, f'http_request_bytes_total{{{labels}}}') > len(data)
+
+
+def snapshot_of(*metrics: Metric) -> dict:
+    return {metric.name: metric.snapshot() for metric in metrics}
+
+
+def worker(requests: int, latency: float, in_progress: int, wait_max: float) -> dict:
+    counter = Metric('http_requests_total', 'counter', '', ('route',))
+    counter.inc(('/documents',), requests)
+    histogram = Metric('http_request_duration_seconds', 'histogram', '', ('route',), (0.1, 1.0))
+    histogram.observe(('/documents',), latency)
+    gauge = Metric('http_requests_in_progress', 'gauge', '', ())
+    gauge.inc((), in_progress)
+    wait = Metric('db_pool_wait_seconds_max', 'gauge', '', ())
+    wait.inc((), wait_max)
+    return snapshot_of(counter, histogram, gauge, wait)
+
+
+def test_workers_are_merged():
+    merged = merge([(worker(2, 0.05, 1, 0.2), True), (worker(3, 0.5, 4, 0.7), True), (worker(5, 5.0, 9, 9.0), False)])
+
+    # Counters and histograms include exited workers.
+    assert merged['http_requests_total']['values'] == {('/documents',): 10}
+    assert merged['http_request_duration_seconds']['values'] == {('/documents',): [1, 1, 1, 5.55]}
+    # Gauges only count live workers; the longest wait is the maximum, not the sum.
+    assert merged['http_requests_in_progress']['values'] == {(): 5}
+    assert merged['db_pool_wait_seconds_max']['values'] == {(): 0.7}
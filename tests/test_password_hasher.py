@@ -0,0 +1,65 @@
+"""
+The bounded password-hashing queue, and rehashing of legacy hashes on login.
+"""
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+from models.user import User
+from utils.auth.password_hasher import BCRYPT_ROUNDS, PasswordHasher
+
+
+@pytest.mark.anyio
+async def test_calls_beyond_the_queue_are_rejected():
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        hasher = PasswordHasher(executor, workers=1, queue_size=1)
+        # One call runs, one waits for the worker.
+        calls = [asyncio.ensure_future(hasher.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as error:
+            await hasher.run(release.wait)
+        assert error.value.status_code == 503
+        assert error.value.headers['Retry-After'] == '1'
+
+        release.set()
+        assert await asyncio.gather(*calls) == [True, True]
+        # Finished calls make room again.
+        assert hasher.in_flight == 0
+        assert await hasher.run(len, 'secret') == 6
+
+
+def test_login_with_a_full_queue_is_unavailable(client, monkeypatch):
+    email = f'{uuid.uuid4().hex}@example.com'
+    client.post('/user/signup', json={'email': email, 'password': 'secret'})
+    hasher = PasswordHasher(None, workers=1, queue_size=0)
+    hasher.in_flight = 1
+    monkeypatch.setattr('services.user_service.get_password_hasher', lambda: hasher)
+
+    response = client.post('/login', data={'username': email, 'password': 'secret'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_login_rehashes_a_legacy_hash(client, db):
+    email = f'{uuid.uuid4().hex}@example.com'
+    legacy = bcrypt.using(rounds=4).hash('secret')
+    user = User(email=email, password=legacy)
+    db.add(user)
+    db.commit()
+
+    assert client.post('/login', data={'username': email, 'password': 'secret'}).status_code == 200
+    db.refresh(user)
+    rehashed = user.password
+    assert rehashed != legacy
+    assert bcrypt.from_string(rehashed).rounds == BCRYPT_ROUNDS
+    assert bcrypt.verify('secret', rehashed)
+
+    # An up-to-date hash is kept as it is.
+    assert client.post('/login', data={'username': email, 'password': 'secret'}).status_code == 200
+    db.refresh(user)
+    assert user.password == rehashed
@@ -0,0 +1,119 @@
+"""
+Documents reserved for a presigned upload are only listed once the upload is
+completed, and are deleted if the file is rejected or never arrives.
+Completed uploads are stored by content, like direct uploads.
+"""
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from config.storage import get_storage
+from models.document import STATUS_PENDING, Document
+from services.document_service import DocumentService, expire_pending_uploads
+from services.thumbnail_service import source_thumbnail_key
+
+
+async def chunks(data: bytes):
+    yield data
+
+
+async def reserve(db, key: str, created_at: datetime) -> Document:
+    document = Document(
+        title='Pending', description='', file_type='pdf', file_url=key, status=STATUS_PENDING,
+        created_at=created_at, updated_at=created_at
+    )
+    db.add(document)
+    await db.commit()
+    return document
+
+
+@pytest.mark.anyio
+async def test_pending_documents_are_not_listed(async_db):
+    document = await reserve(async_db, 'pending-listed.pdf', datetime.utcnow())
+    page = await DocumentService(async_db).get_all_documents(limit=100)
+    assert document.id not in [item.id for item in page.items]
+
+
+@pytest.mark.anyio
+async def test_rejected_upload_is_deleted(async_db):
+    document = await reserve(async_db, 'pending-rejected.pdf', datetime.utcnow())
+    await get_storage().put('pending-rejected.pdf', chunks(b'not a supported file'), 'application/pdf')
+
+    with pytest.raises(HTTPException) as error:
+        await DocumentService(async_db).complete_upload(document.id)
+    assert error.value.status_code == 400
+    assert not await get_storage().exists('pending-rejected.pdf')
+    assert await DocumentService(async_db).get_document(document.id) is None
+
+
+@pytest.mark.anyio
+async def test_abandoned_uploads_expire(async_db):
+    abandoned = await reserve(async_db, 'pending-abandoned.pdf', datetime.utcnow() - timedelta(days=2))
+    recent = await reserve(async_db, 'pending-recent.pdf', datetime.utcnow())
+    await get_storage().put('pending-abandoned.pdf', chunks(b'%PDF-1.4'), 'application/pdf')
+    abandoned_id, recent_id = abandoned.id, recent.id
+
+    service = DocumentService(async_db)
+    assert await service.expire_pending_uploads() == 1
+    assert not await get_storage().exists('pending-abandoned.pdf')
+    assert await service.get_document(abandoned_id) is None
+    assert await service.get_document(recent_id) is not None
+
+
+@pytest.mark.anyio
+async def test_completed_upload_is_released_on_delete(async_db):
+    storage = get_storage()
+    document = await reserve(async_db, 'pending-completed.pdf', datetime.utcnow())
+    await storage.put('pending-completed.pdf', chunks(b'%PDF-1.4 completed upload'), 'application/pdf')
+
+    service = DocumentService(async_db)
+    document = await service.complete_upload(document.id)
+    content_hash = hashlib.sha256(b'%PDF-1.4 completed upload').hexdigest()
+    assert document.content_hash == content_hash
+    assert document.file_url == f'{content_hash}.pdf'
+    assert not await storage.exists('pending-completed.pdf')
+    await storage.put(source_thumbnail_key(content_hash), chunks(b'thumbnail'), 'image/jpeg')
+
+    assert await service.delete_document(document.id)
+    assert not await storage.exists(f'{content_hash}.pdf')
+    assert not await storage.exists(source_thumbnail_key(content_hash))
+
+
+@pytest.mark.anyio
+async def test_completed_upload_shares_stored_content(async_db):
+    storage = get_storage()
+    service = DocumentService(async_db)
+    documents = []
+    for key in ('pending-first.pdf', 'pending-second.pdf'):
+        document = await reserve(async_db, key, datetime.utcnow())
+        await storage.put(key, chunks(b'%PDF-1.4 shared upload'), 'application/pdf')
+        documents.append(await service.complete_upload(document.id))
+    first, second = documents
+
+    assert first.file_url == second.file_url
+    assert not await storage.exists('pending-second.pdf')
+    await service.delete_document(first.id)
+    assert await storage.exists(second.file_url)
+    await service.delete_document(second.id)
+    assert not await storage.exists(second.file_url)
+
+
+@pytest.mark.anyio
+async def test_cleanup_stops_when_cancelled_mid_rollback(monkeypatch):
+    started = asyncio.Event()
+
+    async def expire(self):
+        started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            # Like a rollback on a connection already gone.
+            raise ValueError('no active connection')
+
+    monkeypatch.setattr(DocumentService, 'expire_pending_uploads', expire)
+    job = asyncio.create_task(expire_pending_uploads(3600))
+    await started.wait()
+    job.cancel()
+    with pytest.raises(ValueError):
+        await asyncio.wait_for(job, 5)
@@ -0,0 +1,66 @@
+"""
+Connection pool profiles, and the pool metrics reported for the engines in use.
+"""
+from functools import lru_cache
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+import config.database
+from config.database import TimedAsyncAdaptedQueuePool, TimedQueuePool, engine_options, pool_metrics
+from config.settings import Settings
+
+
+def settings(**values) -> Settings:
+    return Settings(db_url='sqlite:///pools.sqlite', **values)
+
+
+def test_server_profile_splits_the_connection_budget_across_workers():
+    options = engine_options(settings(db_max_connections=90, web_concurrency=3), asynchronous=True)
+    assert options['poolclass'] is TimedAsyncAdaptedQueuePool
+    assert options['pool_size'] == 30
+    # Sync connections are only used from the threadpool.
+    assert engine_options(settings(db_max_connections=90, web_concurrency=1))['pool_size'] == 40
+
+
+def test_lambda_profile_keeps_at_most_one_connection():
+    options = engine_options(settings(db_profile='lambda'))
+    assert (options['pool_size'], options['max_overflow']) == (1, 0)
+    assert engine_options(settings(db_profile='lambda', db_lambda_null_pool=True)) == {'poolclass': NullPool}
+
+
+@pytest.fixture
+def engines(monkeypatch, tmp_path):
+    """
+    Replace the app's engines with ones that are not created yet.
+    """
+    created = []
+
+    @lru_cache
+    def get_engine():
+        engine = create_engine(f'sqlite:///{tmp_path}/pools.sqlite', poolclass=TimedQueuePool, pool_size=3, max_overflow=2)
+        created.append(engine)
+        return engine
+
+    @lru_cache
+    def get_async_engine():
+        raise AssertionError('the async engine must not be created')
+
+    monkeypatch.setattr(config.database, 'get_engine', get_engine)
+    monkeypatch.setattr(config.database, 'get_async_engine', get_async_engine)
+    yield get_engine, created
+    for engine in created:
+        engine.dispose()
+
+
+def test_pool_metrics_only_report_created_engines(engines):
+    get_engine, created = engines
+
+    snapshot = pool_metrics.snapshot()
+    assert created == []
+    assert (snapshot['size'], snapshot['checked_out'], snapshot['overflow']) == (0, 0, 0)
+
+    checkouts = snapshot['checkouts']
+    with get_engine().connect():
+        snapshot = pool_metrics.snapshot()
+    assert snapshot['checkouts'] == checkouts + 1
+    assert (snapshot['size'], snapshot['checked_out'], snapshot['overflow']) == (3, 1, 0)
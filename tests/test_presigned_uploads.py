@@ -0,0 +1,90 @@
+"""
+The presigned upload flow against an in-process S3 (moto): presign, POST
+straight to the bucket with `requests`, which moto intercepts, then complete,
+which sniffs the type of the object and deletes rejected uploads.
+"""
+import base64
+import json
+import boto3
+import pytest
+import requests
+from fastapi import HTTPException
+from moto import mock_aws
+from config.settings import get_settings
+from schemas.document import PresignedUploadCreate
+from services.document_service import DocumentService
+from services.storage.s3 import S3Storage
+from tests.files import make_pdf
+
+BUCKET = 'documents'
+
+
+@pytest.fixture
+def s3_storage(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        storage = S3Storage(client, BUCKET)
+        monkeypatch.setattr('services.document_service.get_storage', lambda: storage)
+        yield storage
+
+
+async def presign(async_db):
+    return await DocumentService(async_db).presign_upload(
+        PresignedUploadCreate(title='Direct', description='', content_type='application/pdf')
+    )
+
+
+def post(presigned, data: bytes) -> int:
+    return requests.post(presigned.url, data=presigned.fields, files={'file': ('direct.pdf', data)}).status_code
+
+
+@pytest.mark.anyio
+async def test_policy_pins_type_and_size(async_db, s3_storage):
+    presigned = await presign(async_db)
+    policy = json.loads(base64.b64decode(presigned.fields['policy']))
+    assert {'Content-Type': 'application/pdf'} in policy['conditions']
+    assert ['content-length-range', 1, get_settings().max_upload_size] in policy['conditions']
+
+
+@pytest.mark.anyio
+async def test_upload_is_completed(async_db, s3_storage):
+    presigned = await presign(async_db)
+    assert post(presigned, make_pdf('direct upload')) == 204
+
+    document = await DocumentService(async_db).complete_upload(presigned.document_id)
+    assert document.status == 'available'
+    assert document.file_type == 'pdf'
+    assert document.file_url == f'{document.content_hash}.pdf'
+    assert await s3_storage.exists(document.file_url)
+    assert not await s3_storage.exists(presigned.key)
+
+
+@pytest.mark.anyio
+async def test_upload_over_the_size_limit_is_deleted(async_db, s3_storage, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'max_upload_size', 64)
+    presigned = await presign(async_db)
+    # moto accepts the POST where S3 would enforce content-length-range; completing rejects it.
+    post(presigned, make_pdf('far more than sixty-four bytes'))
+
+    service = DocumentService(async_db)
+    with pytest.raises(HTTPException) as error:
+        await service.complete_upload(presigned.document_id)
+    assert error.value.status_code == 413
+    assert not await s3_storage.exists(presigned.key)
+    assert await service.get_document(presigned.document_id) is None
+
+
+@pytest.mark.anyio
+async def test_upload_of_unsupported_type_is_deleted(async_db, s3_storage):
+    presigned = await presign(async_db)
+    assert post(presigned, b'not a pdf at all') == 204
+
+    service = DocumentService(async_db)
+    with pytest.raises(HTTPException) as error:
+        await service.complete_upload(presigned.document_id)
+    assert error.value.status_code == 400
+    assert not await s3_storage.exists(presigned.key)
+    assert await service.get_document(presigned.document_id) is None
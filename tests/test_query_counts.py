@@ -0,0 +1,54 @@
+"""
+User listings must cost the same number of statements whatever the page size.
+
+A count that grows with the page size is an N+1 query. Counts are read from
+the `X-DB-Query-Count` header that `QueryStats` adds to every response.
+"""
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.orm import Session
+from config.database import get_engine
+from models.document import Document
+from models.user import User
+
+USERS = 20
+
+
+@pytest.fixture(scope='module')
+def users():
+    now = datetime.utcnow()
+    with Session(get_engine()) as db:
+        users = [
+            User(
+                email=f'query-counts-{i}@example.com', password='', created_at=now - timedelta(seconds=i),
+                updated_at=now,
+                documents=[
+                    Document(title=f'Document {j}', file_type='pdf', file_url=f'{i}-{j}.pdf', description='',
+                             created_at=now, updated_at=now)
+                    for j in range(3)
+                ]
+            )
+            for i in range(USERS)
+        ]
+        db.add_all(users)
+        db.commit()
+        return [user.id for user in users]
+
+
+@pytest.mark.parametrize('limit', [1, 10, USERS])
+@pytest.mark.parametrize('path, expected', [
+    ('/users?limit={limit}', 1),
+    ('/users?limit={limit}&include=documents', 2),
+])
+def test_user_listing_statements(client, users, path, limit, expected):
+    response = client.get(path.format(limit=limit))
+    assert response.status_code == 200
+    assert len(response.json()['items']) == limit
+    assert int(response.headers['x-db-query-count']) == expected
+
+
+def test_user_statements(client, users):
+    response = client.get(f'/users/{users[0]}')
+    assert response.status_code == 200
+    assert len(response.json()['documents']) == 3
+    assert int(response.headers['x-db-query-count']) == 2
@@ -0,0 +1,45 @@
+"""
+Statement shapes and the statements counted for a request.
+"""
+import pytest
+from fastapi import BackgroundTasks, FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from config.database import get_engine
+from utils.query_stats import QueryStatsMiddleware, statement_shape
+
+
+@pytest.mark.parametrize('statement', [
+    'SELECT * FROM documents WHERE id IN (?, ?, ?)',
+    'SELECT * FROM documents WHERE id IN (%(id_1_1)s, %(id_1_2)s)',
+    'SELECT * FROM documents WHERE id IN ($1, $2)',
+    'SELECT * FROM documents WHERE id IN ($1::INTEGER, $2::INTEGER, $3::INTEGER)',
+    'SELECT * FROM documents\n  WHERE id IN ($1::INTEGER)',
+])
+def test_parameter_lists_form_one_shape(statement):
+    assert statement_shape(statement) == 'SELECT * FROM documents WHERE id IN (?)'
+
+
+def test_background_statements_are_not_counted():
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+    counts = []
+
+    def query():
+        with get_engine().connect() as connection:
+            connection.execute(text('SELECT 1'))
+
+    def background(request: Request):
+        query()
+        counts.append(request.scope['query_stats'].count)
+
+    @app.get('/')
+    def route(request: Request, background_tasks: BackgroundTasks):
+        query()
+        background_tasks.add_task(background, request)
+        return {}
+
+    with TestClient(app) as client:
+        response = client.get('/')
+    assert response.headers['x-db-query-count'] == '1'
+    assert counts == [1]
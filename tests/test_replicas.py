@@ -0,0 +1,93 @@
+"""
+Reads go round-robin to healthy replicas, skip a failing one for
+`db_replica_retry_seconds`, and fall back to the primary. SQLite copies of
+the test database stand in for the replicas; each one holds a marker
+document naming it.
+"""
+import shutil
+import sqlite3
+import time
+import pytest
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+import config.database
+from config.database import ReplicaSet
+from config.settings import get_settings
+from models.document import Document
+
+
+def make_replica(path, name: str) -> str:
+    path.parent.mkdir(exist_ok=True)
+    shutil.copy(make_url(get_settings().db_url).database, path)
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            # Far above the IDs the primary hands out meanwhile.
+            "INSERT INTO documents (id, title, description, file_type, file_url, status, created_at, updated_at)"
+            " SELECT COALESCE(MAX(id), 0) + 1000000, ?, '', 'pdf', 'replica.pdf', 'available', '2020-01-01', '2020-01-01'"
+            " FROM documents",
+            (name,)
+        )
+    return f'sqlite:///{path}'
+
+
+def replica_set(*urls: str) -> ReplicaSet:
+    # No pooling: each test runs on its own event loop.
+    return ReplicaSet(get_settings().copy(update={
+        'db_replica_urls': list(urls), 'db_profile': 'lambda', 'db_lambda_null_pool': True
+    }))
+
+
+async def served_by(replicas: ReplicaSet) -> str:
+    async with await replicas.session() as db:
+        markers = await db.scalars(select(Document.title).where(Document.title.like('replica-%')))
+        return markers.first() or 'primary'
+
+
+@pytest.mark.anyio
+async def test_reads_go_round_robin(tmp_path):
+    replicas = replica_set(
+        make_replica(tmp_path / 'a.sqlite', 'replica-a'), make_replica(tmp_path / 'b.sqlite', 'replica-b')
+    )
+    served = [await served_by(replicas) for _ in range(4)]
+    assert sorted(served) == ['replica-a', 'replica-a', 'replica-b', 'replica-b']
+    assert served[0] != served[1] and served[1] != served[2]
+
+
+@pytest.mark.anyio
+async def test_failing_replica_is_skipped_until_retry(tmp_path):
+    missing = tmp_path / 'missing' / 'down.sqlite'
+    replicas = replica_set(f'sqlite:///{missing}', make_replica(tmp_path / 'up.sqlite', 'replica-up'))
+
+    assert [await served_by(replicas) for _ in range(3)] == ['replica-up'] * 3
+    retry_seconds = get_settings().db_replica_retry_seconds
+    assert replicas.down_until[0] == pytest.approx(time.monotonic() + retry_seconds, abs=5)
+
+    # Back up, but still skipped until its retry time.
+    make_replica(missing, 'replica-down')
+    assert [await served_by(replicas) for _ in range(2)] == ['replica-up'] * 2
+    replicas.down_until[0] = 0
+    assert sorted([await served_by(replicas) for _ in range(2)]) == ['replica-down', 'replica-up']
+
+
+@pytest.mark.anyio
+async def test_falls_back_to_the_primary(tmp_path):
+    replicas = replica_set(f'sqlite:///{tmp_path}/missing/down.sqlite')
+    assert await served_by(replicas) == 'primary'
+    assert replicas.down_until[0] > time.monotonic()
+
+
+def test_client_reads_its_writes_from_the_primary(client, tmp_path, monkeypatch):
+    replicas = replica_set(make_replica(tmp_path / 'stale.sqlite', 'replica-stale'))
+    monkeypatch.setattr(config.database, 'get_replicas', lambda: replicas)
+    monkeypatch.setattr(get_settings(), 'db_read_your_writes_seconds', 60)
+
+    created = client.post('/documents', json={
+        'title': 'Fresh', 'file_type': 'pdf', 'file_url': 'fresh.pdf', 'description': ''
+    })
+    assert config.database.LAST_WRITE_COOKIE in created.cookies
+    document_id = created.json()['id']
+    # The replica was copied before the write; only the primary has the document.
+    assert client.get(f'/documents/{document_id}').status_code == 200
+    client.cookies.clear()
+    assert client.get(f'/documents/{document_id}').status_code == 404
+
@@ -0,0 +1,77 @@
+"""
+Full-text search over document metadata and extracted file text: ranking,
+owner scoping and keyset pagination.
+"""
+from uuid import uuid4
+import pytest
+from config.settings import get_settings
+from models.document import Document
+from tests.files import make_pdf
+
+
+@pytest.fixture
+def word():
+    # A word no other test's documents contain.
+    return 'zq' + uuid4().hex[:12]
+
+
+def create(client, title, description=''):
+    return client.post('/documents', json={
+        'title': title, 'file_type': 'pdf', 'file_url': f'{uuid4().hex}.pdf', 'description': description
+    }).json()['id']
+
+
+def upload(client, filename, text):
+    data = make_pdf(text)
+    return client.post('/upload', files={'file': (filename, data, 'application/pdf')}).json()['document_id']
+
+
+def search(client, **params):
+    response = client.get('/documents/search', params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.fixture
+def text_extraction(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'text_extraction_enabled', True)
+
+
+def test_title_outranks_description_outranks_file_text(client, word, text_extraction):
+    in_content = upload(client, 'scan.pdf', f'invoice {word}')
+    in_description = create(client, 'Report', f'About {word}')
+    in_title = create(client, f'{word} report')
+
+    assert [item['id'] for item in search(client, q=word)['items']] == [in_title, in_description, in_content]
+
+
+def test_metadata_and_file_text_matches_are_merged(client, word, text_extraction):
+    both = upload(client, f'{word}.pdf', f'invoice {word}')
+
+    assert [item['id'] for item in search(client, q=word)['items']] == [both]
+
+
+def test_search_is_scoped_to_an_owner(client, db, word):
+    owner_id = client.post('/user/signup', json={'email': f'{word}@example.com', 'password': 'secret'}).json()['id']
+    owned = create(client, f'{word} owned')
+    create(client, f'{word} unowned')
+    db.get(Document, owned).owner_id = owner_id
+    db.commit()
+
+    assert [item['id'] for item in search(client, q=word, owner_id=owner_id)['items']] == [owned]
+    assert len(search(client, q=word)['items']) == 2
+
+
+def test_pages_resume_after_the_previous_one(client, word):
+    # Same score for all, so the pages are ordered by ID alone.
+    ids = sorted((create(client, f'{word} report') for _ in range(5)), reverse=True)
+
+    seen, cursor = [], None
+    while True:
+        page = search(client, q=word, limit=2, **({'cursor': cursor} if cursor else {}))
+        assert len(page['items']) <= 2
+        seen += [item['id'] for item in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert seen == ids
@@ -0,0 +1,135 @@
+"""
+The storage backends: streamed puts and reads, moves, and failed uploads
+leaving nothing behind, including S3 multipart uploads (against moto).
+"""
+import os
+from uuid import uuid4
+import boto3
+import pytest
+from moto import mock_aws
+from config.settings import get_settings
+from services.storage.local import LocalStorage
+from services.storage.memory import MemoryStorage
+from services.storage.s3 import MIN_PART_SIZE, S3Storage, parts
+from tests.files import make_pdf
+
+BUCKET = 'documents'
+
+
+async def chunks(data: bytes, chunk_size: int):
+    for offset in range(0, len(data), chunk_size):
+        yield data[offset:offset + chunk_size]
+
+
+async def failing_chunks(data: bytes, chunk_size: int):
+    async for chunk in chunks(data, chunk_size):
+        yield chunk
+    raise OSError('client disconnected')
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture(params=['memory', 'local', 's3'])
+def storage(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStorage()
+    if request.param == 'local':
+        return LocalStorage(str(tmp_path))
+    return S3Storage(request.getfixturevalue('s3_client'), BUCKET)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('sizes, part_size, expected', [
+    ([3, 3, 3, 3], 5, [6, 6]),
+    ([4, 4, 1], 5, [8, 1]),
+    ([5, 2], 5, [5, 2]),
+    ([], 5, []),
+])
+async def test_parts_regroup_chunks(sizes, part_size, expected):
+    async def sized_chunks():
+        for size in sizes:
+            yield b'x' * size
+
+    assert [len(part) async for part in parts(sized_chunks(), part_size)] == expected
+
+
+@pytest.mark.anyio
+async def test_put_stream_move_and_delete(storage):
+    data = os.urandom(100_000)
+    assert await storage.put('uploads/a.bin', chunks(data, 4096), 'application/octet-stream') == len(data)
+
+    assert b''.join([chunk async for chunk in storage.stream('uploads/a.bin', chunk_size=30_000)]) == data
+    assert [len(chunk) async for chunk in storage.stream('uploads/a.bin', chunk_size=30_000)] == [
+        30_000, 30_000, 30_000, 10_000
+    ]
+    assert await storage.get('uploads/a.bin', 10, 19) == data[10:20]
+    assert (await storage.info('uploads/a.bin')).size == len(data)
+
+    await storage.move('uploads/a.bin', 'a.bin')
+    assert not await storage.exists('uploads/a.bin')
+    assert await storage.get('a.bin') == data
+
+    await storage.delete('a.bin')
+    await storage.delete('a.bin')
+    assert await storage.info('a.bin') is None
+
+
+@pytest.mark.anyio
+async def test_failed_put_stores_nothing(storage, tmp_path):
+    with pytest.raises(OSError):
+        await storage.put('a.bin', failing_chunks(b'x' * 10_000, 4096), 'application/octet-stream')
+    assert not await storage.exists('a.bin')
+    if isinstance(storage, LocalStorage):
+        assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.anyio
+async def test_s3_large_put_is_a_multipart_upload(s3_client):
+    storage = S3Storage(s3_client, BUCKET)
+    data = os.urandom(2 * MIN_PART_SIZE + 1024)
+
+    assert await storage.put('large.bin', chunks(data, 1024 * 1024), 'application/octet-stream') == len(data)
+    assert await storage.get('large.bin') == data
+    # Objects uploaded in parts carry the part count in their ETag.
+    assert s3_client.head_object(Bucket=BUCKET, Key='large.bin')['ETag'].endswith('-3"')
+
+
+@pytest.mark.anyio
+async def test_s3_failed_multipart_upload_is_aborted(s3_client):
+    storage = S3Storage(s3_client, BUCKET)
+
+    with pytest.raises(OSError):
+        await storage.put('large.bin', failing_chunks(b'x' * (2 * MIN_PART_SIZE), 1024 * 1024), 'application/pdf')
+    assert not await storage.exists('large.bin')
+    assert s3_client.list_multipart_uploads(Bucket=BUCKET).get('Uploads', []) == []
+
+
+def test_uploads_reach_storage_in_chunks(client, monkeypatch):
+    class RecordingStorage(MemoryStorage):
+        async def put(self, key, chunks, content_type):
+            async def recorded():
+                async for chunk in chunks:
+                    chunk_sizes.append(len(chunk))
+                    yield chunk
+            return await super().put(key, recorded(), content_type)
+
+    chunk_sizes = []
+    storage = RecordingStorage()
+    monkeypatch.setattr('services.document_service.get_storage', lambda: storage)
+    monkeypatch.setattr(get_settings(), 'upload_chunk_size', 1024)
+    data = make_pdf(f'chunks {uuid4().hex}') + b'\n' * 5000
+
+    response = client.post('/upload', files={'file': ('chunks.pdf', data, 'application/pdf')})
+    assert response.status_code == 200
+    assert sum(chunk_sizes) == len(data)
+    assert max(chunk_sizes) <= 1024
+    (stored,) = [contents for contents, _ in storage.objects.values()]
+    assert stored == data
@@ -0,0 +1,43 @@
+"""
+The text of uploaded PDFs is extracted into the search index, whether they
+were uploaded through the API or directly to storage with a presigned POST.
+"""
+from datetime import datetime
+import pytest
+from config.settings import get_settings
+from config.storage import get_storage
+from models.document import STATUS_PENDING, Document
+from models.stored_object import StoredObject
+from repositories.stored_object_repository import TEXT_DONE
+from services.document_service import DocumentService
+from tests.files import make_pdf
+
+
+async def chunks(data: bytes):
+    yield data
+
+
+@pytest.fixture
+def text_extraction(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'text_extraction_enabled', True)
+
+
+@pytest.mark.anyio
+async def test_presigned_upload_is_extracted_and_searchable(async_db, text_extraction):
+    now = datetime.utcnow()
+    document = Document(
+        title='Scan', description='', file_type='pdf', file_url='presigned-scan.pdf', status=STATUS_PENDING,
+        created_at=now, updated_at=now
+    )
+    async_db.add(document)
+    await async_db.commit()
+    await get_storage().put('presigned-scan.pdf', chunks(make_pdf('quarterly zanzibar invoice')), 'application/pdf')
+
+    service = DocumentService(async_db)
+    document = await service.complete_upload(document.id)
+
+    stored_object = await async_db.get(StoredObject, document.content_hash, populate_existing=True)
+    assert stored_object.text_status == TEXT_DONE
+    assert stored_object.text_chunk_count == 1
+    page = await service.search_documents('zanzibar')
+    assert [item.id for item in page.items] == [document.id]
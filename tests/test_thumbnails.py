@@ -0,0 +1,61 @@
+"""
+Thumbnails are rendered after upload when enabled, served with cache
+headers, and not scheduled at all when disabled.
+"""
+import io
+from uuid import uuid4
+import pytest
+from fastapi import BackgroundTasks
+from PIL import Image
+from config.settings import get_settings
+from models.document import Document
+from services.document_service import DocumentService
+from services.thumbnail_service import ThumbnailService, get_thumbnail_executor
+
+
+def make_png(width: int, height: int) -> bytes:
+    output = io.BytesIO()
+    # A random colour keeps the content, and so its stored object, unique.
+    Image.new('RGB', (width, height), tuple(uuid4().bytes[:3])).save(output, format='PNG')
+    return output.getvalue()
+
+
+@pytest.fixture
+def thumbnails(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'thumbnails_enabled', True)
+    monkeypatch.setattr(get_settings(), 'thumbnail_workers', 1)
+    yield
+    get_thumbnail_executor().shutdown()
+    get_thumbnail_executor.cache_clear()
+
+
+def test_thumbnail_is_rendered_after_upload(client, thumbnails):
+    upload = client.post('/upload', files={'file': ('wide.png', make_png(1000, 500), 'image/png')})
+    url = f"/documents/{upload.json()['document_id']}/thumbnail"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'image/jpeg'
+    assert Image.open(io.BytesIO(response.content)).size == (256, 128)
+    assert 'max-age' in response.headers['cache-control']
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.anyio
+async def test_nothing_is_scheduled_when_disabled(async_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'thumbnails_enabled', False)
+    document = Document(title='Image', description='', file_type='png', file_url='image.png', content_hash='0' * 64)
+
+    background_tasks = BackgroundTasks()
+    await DocumentService(async_db).schedule_derivatives(document, background_tasks)
+    assert background_tasks.tasks == []
+
+
+def test_disabled_thumbnails_are_not_rendered(client, monkeypatch):
+    generated = []
+    monkeypatch.setattr(ThumbnailService, 'generate', lambda self, *args: generated.append(args))
+
+    upload = client.post('/upload', files={'file': ('image.png', make_png(10, 10), 'image/png')})
+    assert upload.status_code == 200
+    assert generated == []
+    assert client.get(f"/documents/{upload.json()['document_id']}/thumbnail").status_code == 404
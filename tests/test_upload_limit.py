@@ -0,0 +1,88 @@
+"""
+Uploads larger than `max_upload_size` are rejected from their Content-Length,
+or as the body arrives when it has none, before the form is parsed.
+"""
+import pytest
+from fastapi import HTTPException
+from config.settings import get_settings
+from utils.upload_limit import MULTIPART_OVERHEAD, UploadSizeLimitMiddleware
+
+BOUNDARY = 'limit-test-boundary'
+
+
+def multipart(data: bytes) -> bytes:
+    return (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="big.pdf"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'.encode() + data + f'\r\n--{BOUNDARY}--\r\n'.encode()
+    )
+
+
+@pytest.fixture
+def max_upload_size(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'max_upload_size', 1024)
+    return 1024
+
+
+def upload_scope(headers=()):
+    return {'type': 'http', 'method': 'POST', 'path': '/upload', 'headers': list(headers)}
+
+
+@pytest.mark.anyio
+async def test_content_length_over_limit_is_rejected_unread(max_upload_size):
+    async def app(scope, receive, send):
+        raise AssertionError('the app must not run')
+
+    async def receive():
+        raise AssertionError('the body must not be read')
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    content_length = str(max_upload_size + MULTIPART_OVERHEAD + 1).encode()
+    await UploadSizeLimitMiddleware(app)(upload_scope([(b'content-length', content_length)]), receive, send)
+    assert sent[0]['status'] == 413
+
+
+@pytest.mark.anyio
+async def test_body_is_not_read_past_the_limit(max_upload_size):
+    received = []
+
+    async def app(scope, receive, send):
+        while True:
+            await receive()
+
+    async def receive():
+        received.append(4096)
+        return {'type': 'http.request', 'body': b'x' * 4096, 'more_body': True}
+
+    with pytest.raises(HTTPException) as error:
+        await UploadSizeLimitMiddleware(app)(upload_scope(), receive, None)
+    assert error.value.status_code == 413
+    assert sum(received) - 4096 <= max_upload_size + MULTIPART_OVERHEAD
+
+
+def test_content_length_over_limit_is_rejected(client, max_upload_size):
+    response = client.post('/upload', files={'file': ('big.pdf', b'%PDF' * (MULTIPART_OVERHEAD // 2), 'application/pdf')})
+    assert response.status_code == 413
+
+
+def test_streamed_body_over_limit_is_rejected(client, max_upload_size):
+    body = multipart(b'%PDF' * (MULTIPART_OVERHEAD // 2))
+
+    def stream():
+        for start in range(0, len(body), 4096):
+            yield body[start:start + 4096]
+
+    # A generator body is sent chunked, without a Content-Length.
+    response = client.post('/upload', content=stream(), headers={
+        'content-type': f'multipart/form-data; boundary={BOUNDARY}'
+    })
+    assert response.status_code == 413
+    assert 'content-length' not in response.request.headers
+
+
+def test_file_over_limit_within_overhead_is_rejected(client, max_upload_size):
+    response = client.post('/upload', files={'file': ('big.pdf', b'%PDF' * max_upload_size, 'application/pdf')})
+    assert response.status_code == 413
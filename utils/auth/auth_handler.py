@@ -1,18 +1,16 @@
 from fastapi import Depends
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import get_read_db
 from services.jwt_service import JWTService
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)):
+    """
+    Dependency resolving the bearer token of a request.
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    return JWTService.decode_access_token(token)
+    Returns:
+        dict: The `claims` and `user_id` of the token.
+    """
+    return await JWTService.decode_access_token(token, db)
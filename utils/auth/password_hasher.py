@@ -0,0 +1,140 @@
+"""
+This module runs bcrypt hashing and verification off the request path.
+
+bcrypt is deliberately slow, so calls go to a dedicated, size-limited executor
+rather than Starlette's shared threadpool, where they would starve every other
+endpoint. The pool is a thread pool by default; bcrypt releases the GIL, so
+threads hash in parallel. A process pool isolates the work from the server
+entirely but is not available on AWS Lambda.
+
+Requests beyond the worker count wait in a bounded queue. Once it is full,
+new requests fail fast with 503 instead of piling up.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from config.settings import get_settings
+
+# Pinning min and max to the configured rounds makes hashes made with any other
+# cost "need an update", so they are rehashed on the next successful login.
+BCRYPT_ROUNDS = get_settings().bcrypt_rounds
+
+
+@lru_cache
+def get_password_context():
+    """
+    Return the passlib context, loading passlib on first use.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
+
+
+def verify_password(plain_password, hashed_password):
+    return get_password_context().verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password, hashed_password):
+    """
+    Verify a password and rehash it if its hash uses outdated settings.
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the password matched, and the new
+        hash to store, or None if the current one is up to date.
+    """
+    return get_password_context().verify_and_update(plain_password, hashed_password)
+
+
+def get_password_hash(password):
+    return get_password_context().hash(password)
+
+
+class PasswordHasher:
+    """
+    Async front end to a bounded bcrypt executor.
+    """
+
+    def __init__(self, executor: Executor, workers: int, queue_size: int):
+        """
+        Initialize the PasswordHasher.
+
+        Args:
+            executor (Executor): The executor running the bcrypt calls.
+            workers (int): The number of workers of the executor.
+            queue_size (int): How many calls may wait for a worker before new ones are rejected.
+        """
+        self.executor = executor
+        self.limit = workers + queue_size
+        # Only touched from the event loop thread, so it needs no locking.
+        self.in_flight = 0
+
+    async def run(self, fn, *args):
+        """
+        Run a bcrypt call in the executor.
+
+        Raises:
+            HTTPException: 503 Service Unavailable if the queue is full.
+        """
+        if self.in_flight >= self.limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress, try again later",
+                headers={"Retry-After": "1"}
+            )
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password.
+
+        Args:
+            password (str): The plain password.
+
+        Returns:
+            str: The bcrypt hash.
+        """
+        return await self.run(get_password_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password, and rehash it if its hash was made with other rounds.
+
+        Args:
+            password (str): The plain password.
+            hashed_password (str): The stored hash.
+
+        Returns:
+            Tuple[bool, Optional[str]]: Whether the password matched, and the new
+            hash to store, or None if the stored one is up to date.
+        """
+        return await self.run(verify_and_update_password, password, hashed_password)
+
+
+@lru_cache
+def get_password_hasher() -> PasswordHasher:
+    """
+    Return the password hasher configured by the `password_hash_*` settings.
+
+    The executor is created on first use, so processes that never hash a
+    password do not start workers.
+    """
+    settings = get_settings()
+    workers = settings.password_hash_workers or os.cpu_count() or 1
+    if settings.password_hash_executor == "process":
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+    return PasswordHasher(executor, workers, settings.password_hash_queue_size)
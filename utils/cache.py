@@ -0,0 +1,322 @@
+"""
+This module provides the read-through entity cache used by the repositories.
+
+Entities are cached as plain dicts of their column values (see `to_cache` and
+`from_cache`), so cached rows are detached from any session and can be shared
+between requests or, with the Redis backend, between workers.
+
+The in-process `MemoryCache` is an LRU with a TTL. Invalidations only reach the
+worker that made the write, so with several workers other workers may serve a
+stale entry until it expires; use the Redis backend when that matters.
+
+`TokenCache` uses the same backends, with its own capacity, to remember
+access tokens that have already been verified.
+"""
+import hashlib
+import pickle
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Optional, Type
+from sqlalchemy import inspect
+from config.settings import get_settings
+
+
+class CacheBackend:
+    """
+    Interface for cache backends.
+
+    Every backend counts hits, misses and evictions in `stats`.
+    """
+
+    def __init__(self):
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Get a cached value.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss.
+        """
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Cache a value.
+
+        Args:
+            key (str): The cache key.
+            value (Any): The value; it must be picklable.
+            ttl (Optional[float]): Seconds until the entry expires; defaults to `cache_ttl_seconds`.
+        """
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        """
+        Invalidate cached values.
+
+        Args:
+            *keys (str): The cache keys.
+        """
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """
+    Backend that caches nothing, used when caching is disabled.
+    """
+
+    async def get(self, key: str) -> Optional[Any]:
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        pass
+
+    async def delete(self, *keys: str):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-process LRU cache with per-entry expiry.
+
+    It is only touched from the event loop thread, so it needs no locking.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+                self.stats["evictions"] += 1
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.entries.pop(key, None)
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache shared by all workers, backed by Redis.
+
+    Requires the `redis` package, installed with the `redis` extra. Evictions
+    are done by Redis itself and are not counted here.
+
+    Raises:
+        RuntimeError: If the `redis` package is not installed.
+    """
+
+    def __init__(self, url: str, ttl: float):
+        super().__init__()
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError(
+                'cache_backend is "redis" but the redis package is not installed; '
+                'install the `redis` extra or choose another cache_backend'
+            ) from None
+        self.redis = redis.asyncio.from_url(url)
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.redis.get(key)
+        self.stats["hits" if value is not None else "misses"] += 1
+        return pickle.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self.redis.set(key, pickle.dumps(value), px=int((self.ttl if ttl is None else ttl) * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.redis.delete(*keys)
+
+
+def make_cache(max_entries: int) -> CacheBackend:
+    """
+    Create a backend of the type selected by the `cache_backend` setting.
+
+    Args:
+        max_entries (int): The capacity of an in-process backend.
+    """
+    settings = get_settings()
+    if settings.cache_backend == "redis":
+        return RedisCache(settings.cache_url, settings.cache_ttl_seconds)
+    if settings.cache_backend == "memory":
+        return MemoryCache(max_entries, settings.cache_ttl_seconds)
+    return NullCache()
+
+
+@lru_cache
+def get_cache() -> CacheBackend:
+    """
+    Return the entity cache backend.
+    """
+    return make_cache(get_settings().cache_max_entries)
+
+
+class TokenCache:
+    """
+    Cache of access tokens that have already been verified.
+
+    Entries are keyed by the SHA-256 digest of the token, hold its claims and
+    the ID of the user it resolved to, and expire with the token. Each entry
+    also records the user's token generation; `invalidate_user` starts a new
+    generation, which retires every cached token of that user at once without
+    having to track them.
+
+    With an in-process backend the invalidation only reaches the worker that
+    made the change, so entries are kept at most `max_ttl` seconds: a deleted
+    or deactivated user is locked out of the other workers within that time.
+
+    Args:
+        backend (CacheBackend): The backend holding the entries.
+        max_ttl (Optional[float]): The longest an entry is kept; None to keep
+            it until the token expires.
+    """
+
+    def __init__(self, backend: CacheBackend, max_ttl: Optional[float] = None):
+        self.backend = backend
+        self.max_ttl = max_ttl
+
+    async def get(self, token: str) -> Optional[dict]:
+        """
+        Get a verified token.
+
+        Args:
+            token (str): The encoded token.
+
+        Returns:
+            Optional[dict]: The `claims` and `user_id` of the token, or None if
+            it is not cached or its user changed since.
+        """
+        entry = await self.backend.get(token_key(token))
+        if entry is None:
+            return None
+        if entry["generation"] != await self.backend.get(user_tokens_key(entry["user_id"])):
+            return None
+        return entry
+
+    async def set(self, token: str, claims: dict, user_id: int):
+        """
+        Cache a verified token until it expires, or for `max_ttl` seconds if sooner.
+
+        Args:
+            token (str): The encoded token.
+            claims (dict): The decoded claims; tokens without `exp` are not cached.
+            user_id (int): The ID of the user the token resolved to.
+        """
+        if "exp" not in claims:
+            return
+        ttl = claims["exp"] - time.time()
+        if self.max_ttl is not None:
+            ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        generation = await self.backend.get(user_tokens_key(user_id))
+        if generation is None:
+            generation = uuid.uuid4().hex
+            await self.backend.set(user_tokens_key(user_id), generation, ttl)
+        await self.backend.set(
+            token_key(token), {"claims": claims, "user_id": user_id, "generation": generation}, ttl
+        )
+
+    async def invalidate_user(self, user_id: int):
+        """
+        Drop every cached token of a user.
+
+        Args:
+            user_id (int): The ID of the user.
+        """
+        await self.backend.delete(user_tokens_key(user_id))
+
+
+@lru_cache
+def get_token_cache() -> TokenCache:
+    """
+    Return the verified-token cache, bounded by `token_cache_max_entries`.
+
+    Only the Redis backend shares invalidations between workers; with the
+    others, entries are kept at most `cache_ttl_seconds`.
+    """
+    settings = get_settings()
+    max_ttl = None if settings.cache_backend == "redis" else settings.cache_ttl_seconds
+    return TokenCache(make_cache(settings.token_cache_max_entries), max_ttl)
+
+
+def document_key(document_id: int) -> str:
+    return f"document:{document_id}"
+
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def user_email_key(email: str) -> str:
+    return f"user-email:{email}"
+
+
+def token_key(token: str) -> str:
+    return f"token:{hashlib.sha256(token.encode()).hexdigest()}"
+
+
+def user_tokens_key(user_id: int) -> str:
+    return f"user-tokens:{user_id}"
+
+
+def to_cache(instance, exclude: tuple = ()) -> dict:
+    """
+    Snapshot the column values of an ORM instance.
+
+    Args:
+        instance: The ORM instance.
+        exclude (tuple): Attribute names to leave out, e.g. secrets.
+
+    Returns:
+        dict: The column values, keyed by attribute name.
+    """
+    return {
+        attr.key: getattr(instance, attr.key)
+        for attr in inspect(instance).mapper.column_attrs
+        if attr.key not in exclude
+    }
+
+
+def from_cache(model: Type, data: dict):
+    """
+    Rebuild a transient ORM instance from a `to_cache` snapshot.
+
+    The instance is not attached to a session and must not be modified or
+    added to one; load the row from the database to change it.
+
+    Args:
+        model (Type): The ORM model class.
+        data (dict): The column values.
+
+    Returns:
+        The transient ORM instance.
+    """
+    return model(**data)
@@ -0,0 +1,122 @@
+"""
+This module is the single registry of file types the application accepts.
+
+It also provides the detectors used to identify uploaded files. Detectors only
+ever look at a bounded prefix of a file (`SNIFF_SIZE` bytes), which is captured
+while the upload streams in, so detection cost does not grow with file size.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+from config.settings import get_settings
+
+# libmagic and the signature detector only need the head of a file.
+SNIFF_SIZE = 8 * 1024
+
+
+@dataclass(frozen=True)
+class FileTypeSpec:
+    """
+    A supported file type.
+
+    `name` is the value stored on documents and exposed by the `FileType` enum,
+    and doubles as the extension of stored objects. `signatures` are the magic
+    byte prefixes used by the signature detector. Files of types with
+    `has_text` get their text extracted into the search index.
+    """
+
+    name: str
+    mime_type: str
+    signatures: Tuple[bytes, ...]
+    has_text: bool = False
+
+
+FILE_TYPES = (
+    FileTypeSpec(name='pdf', mime_type='application/pdf', signatures=(b'%PDF-',), has_text=True),
+    FileTypeSpec(name='png', mime_type='image/png', signatures=(b'\x89PNG\r\n\x1a\n',)),
+    FileTypeSpec(name='jpeg', mime_type='image/jpeg', signatures=(b'\xff\xd8\xff',)),
+)
+
+# Types documents could be created with before uploads were validated. Stored
+# documents may still carry them, but no upload is ever accepted as one.
+LEGACY_FILE_TYPES = ('excel', 'doc', 'csv')
+
+SUPPORTED_FILE_TYPES = {file_type.mime_type: file_type.name for file_type in FILE_TYPES}
+MIME_TYPES = {file_type.name: file_type.mime_type for file_type in FILE_TYPES}
+TEXT_FILE_TYPES = frozenset(file_type.name for file_type in FILE_TYPES if file_type.has_text)
+
+
+class FileTypeDetector:
+    """
+    Interface for detecting the MIME type of a file from its first bytes.
+    """
+
+    def detect(self, header: bytes) -> Optional[str]:
+        """
+        Detect the MIME type of a file.
+
+        Args:
+            header (bytes): The first bytes of the file; only `SNIFF_SIZE` bytes are inspected.
+
+        Returns:
+            Optional[str]: The detected MIME type, or None if it could not be determined.
+        """
+        raise NotImplementedError
+
+
+class MagicDetector(FileTypeDetector):
+    """
+    Detector backed by libmagic. Recognises any type libmagic knows about.
+    """
+
+    def __init__(self):
+        import magic
+        self.magic = magic.Magic(mime=True)
+
+    def detect(self, header: bytes) -> Optional[str]:
+        return self.magic.from_buffer(header[:SNIFF_SIZE])
+
+
+class SignatureDetector(FileTypeDetector):
+    """
+    Pure-Python detector matching the magic byte signatures in `FILE_TYPES`.
+
+    It only recognises supported types, which is all upload validation needs.
+    """
+
+    def detect(self, header: bytes) -> Optional[str]:
+        for file_type in FILE_TYPES:
+            if header.startswith(file_type.signatures):
+                return file_type.mime_type
+        return None
+
+
+class SignatureMagicDetector(FileTypeDetector):
+    """
+    Detector that tries signatures first and falls back to libmagic.
+
+    Supported files never reach libmagic; unsupported ones still get an
+    accurate MIME type for the error message.
+    """
+
+    def __init__(self):
+        self.signature_detector = SignatureDetector()
+        self.magic_detector = MagicDetector()
+
+    def detect(self, header: bytes) -> Optional[str]:
+        return self.signature_detector.detect(header) or self.magic_detector.detect(header)
+
+
+DETECTORS = {
+    'magic': MagicDetector,
+    'signature': SignatureDetector,
+    'signature+magic': SignatureMagicDetector,
+}
+
+
+@lru_cache
+def get_detector() -> FileTypeDetector:
+    """
+    Return the detector selected by the `file_type_detector` setting.
+    """
+    return DETECTORS[get_settings().file_type_detector]()
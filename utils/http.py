@@ -0,0 +1,182 @@
+"""
+This module provides helpers for HTTP conditional requests.
+
+Resources get a strong ETag derived from their ID and `updated_at`, and a
+Last-Modified date. `not_modified` evaluates If-None-Match / If-Modified-Since
+for cheap revalidation of GETs, and `check_if_match` evaluates If-Match so
+PUT and DELETE can be made conditional (optimistic concurrency).
+`parse_range` and `if_range_matches` implement partial downloads.
+"""
+import hashlib
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException, Request, status
+
+RANGE_PATTERN = re.compile(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", re.IGNORECASE)
+
+
+def make_etag(id: int, updated_at: Optional[datetime], *extra) -> str:
+    """
+    Build a strong ETag for a resource version.
+
+    Args:
+        id (int): The ID of the resource.
+        updated_at (Optional[datetime]): The last update time of the resource.
+        *extra: Anything else the representation depends on.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    version = repr((id, updated_at.isoformat() if updated_at else None, extra))
+    return f'"{hashlib.sha256(version.encode()).hexdigest()[:32]}"'
+
+
+def http_date(value: Optional[datetime]) -> Optional[str]:
+    """
+    Format a naive UTC datetime as an HTTP date.
+    """
+    if value is None:
+        return None
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def cache_headers(etag: str, updated_at: Optional[datetime]) -> dict:
+    """
+    Return the validator headers of a resource version.
+    """
+    headers = {"ETag": etag}
+    if updated_at is not None:
+        headers["Last-Modified"] = http_date(updated_at)
+    return headers
+
+
+def etag_matches(header: str, etag: str, weak: bool) -> bool:
+    """
+    Check whether an If-Match / If-None-Match header lists an ETag.
+
+    Args:
+        header (str): The header value.
+        etag (str): The current ETag.
+        weak (bool): Use weak comparison (ignore `W/` prefixes), as If-None-Match does.
+
+    Returns:
+        bool: True if the header is `*` or lists the ETag.
+    """
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: str, updated_at: Optional[datetime]) -> bool:
+    """
+    Evaluate If-None-Match, or failing that If-Modified-Since, against a resource version.
+
+    Args:
+        request (Request): The incoming request.
+        etag (str): The current ETag.
+        updated_at (Optional[datetime]): The last update time of the resource.
+
+    Returns:
+        bool: True if a 304 Not Modified should be returned.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag, weak=True)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or updated_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have a one-second resolution.
+    return updated_at.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def check_if_match(if_match: Optional[str], etag: str):
+    """
+    Reject a write whose If-Match header does not match the current ETag.
+
+    Args:
+        if_match (Optional[str]): The If-Match header, if any.
+        etag (str): The current ETag.
+
+    Raises:
+        HTTPException: 412 Precondition Failed if the resource has changed.
+    """
+    if if_match is not None and not etag_matches(if_match, etag, weak=False):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Resource has been modified"
+        )
+
+
+def if_range_matches(if_range: Optional[str], etag: str, updated_at: Optional[datetime]) -> bool:
+    """
+    Evaluate If-Range: whether a Range request may be served partially.
+
+    Args:
+        if_range (Optional[str]): The If-Range header, an ETag or an HTTP date.
+        etag (str): The current ETag.
+        updated_at (Optional[datetime]): The last update time of the resource.
+
+    Returns:
+        bool: True if there is no If-Range or it matches the current version;
+        otherwise the whole representation must be sent.
+    """
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return updated_at is not None and if_range == http_date(updated_at)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header.
+
+    Multiple ranges and malformed headers are ignored, as RFC 9110 allows, and
+    the whole representation is sent instead.
+
+    Args:
+        header (Optional[str]): The Range header.
+        size (int): The size of the representation in bytes.
+
+    Returns:
+        Optional[Tuple[int, int]]: The first and last byte offsets (inclusive),
+        or None to send the whole representation.
+
+    Raises:
+        HTTPException: 416 Range Not Satisfiable if the range lies outside the representation.
+    """
+    match = RANGE_PATTERN.fullmatch(header or "")
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+
+    if not first:
+        # Suffix range: the last `last` bytes.
+        start, end = (max(size - int(last), 0) if int(last) else size), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    if start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
@@ -0,0 +1,342 @@
+"""
+This module records request metrics and renders them in the Prometheus text format.
+
+`MetricsMiddleware` counts every HTTP request by method, route template and
+status, and records its latency, the bytes it received and sent, the number
+of requests in flight and, from `utils.query_stats`, its SQL statements. Metrics live in plain dicts of the worker
+process; they are only updated from the event loop thread, so no lock is
+taken on the request path.
+
+Each uvicorn worker has its own metrics. With `metrics_multiprocess_dir` set,
+every worker writes a snapshot to `<pid>.json` in that directory every
+`metrics_flush_seconds` and on shutdown, and `/metrics` adds up the snapshots
+of all workers: counters and histograms of every worker, including exited
+ones, and gauges of the live workers only. Empty the directory when the
+server starts, or the counters of the previous run are included.
+
+Values kept elsewhere, such as the connection pool and cache counters, are
+read when a snapshot is taken by `collectors`, functions returning metrics.
+"""
+import asyncio
+import bisect
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from config.database import pool_metrics
+from config.settings import get_settings
+from utils.cache import get_cache, get_token_cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 1 KiB to 1 GiB in powers of 4.
+SIZE_BUCKETS = tuple(1024 * 4 ** power for power in range(11))
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Route label of requests that matched no route, so that probing random paths
+# does not create a series per path.
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Metric:
+    """
+    A named metric of one kind, with a value per combination of label values.
+
+    Args:
+        name (str): The metric name.
+        kind (str): "counter", "gauge" or "histogram".
+        help (str): The description shown in the exposition.
+        labels (Sequence[str]): The label names.
+        buckets (Sequence[float]): The upper bounds of the histogram buckets.
+    """
+
+    def __init__(self, name: str, kind: str, help: str, labels: Sequence[str], buckets: Sequence[float] = ()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Histogram values are [count per bucket..., count above the last bucket, sum].
+        self.values = defaultdict(lambda: [0] * (len(self.buckets) + 2)) if buckets else defaultdict(float)
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        self.values[labels] += amount
+
+    def dec(self, labels: Tuple[str, ...], amount: float = 1):
+        self.values[labels] -= amount
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        counts = self.values[labels]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def snapshot(self) -> dict:
+        return {
+            "kind": self.kind,
+            "help": self.help,
+            "labels": self.labels,
+            "buckets": self.buckets,
+            "samples": [[list(labels), value] for labels, value in self.values.items()],
+        }
+
+
+REQUESTS = Metric("http_requests_total", "counter", "HTTP requests handled.", ("method", "route", "status"))
+LATENCY = Metric(
+    "http_request_duration_seconds", "histogram", "Time to handle an HTTP request, until its last byte was sent.",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+IN_PROGRESS = Metric("http_requests_in_progress", "gauge", "HTTP requests being handled.", ("method",))
+REQUEST_BYTES = Metric("http_request_bytes_total", "counter", "Bytes of request bodies received.", ("method", "route"))
+RESPONSE_BYTES = Metric("http_response_bytes_total", "counter", "Bytes of response bodies sent.", ("method", "route"))
+UPLOAD_SIZE = Metric(
+    "http_request_size_bytes", "histogram", "Size of the body of requests that had one.",
+    ("method", "route"), SIZE_BUCKETS,
+)
+DB_QUERIES = Metric(
+    "http_request_db_queries", "histogram", "SQL statements executed for an HTTP request.",
+    ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Metric(
+    "http_request_db_seconds", "histogram", "Time spent executing SQL statements for an HTTP request.",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+DB_SLOW_QUERIES = Metric(
+    "db_slow_queries_total", "counter", "SQL statements slower than db_slow_query_ms.", ("method", "route")
+)
+DB_N_PLUS_ONE = Metric(
+    "db_n_plus_one_total", "counter", "Statements repeated more than db_n_plus_one_threshold times in a request.",
+    ("method", "route"),
+)
+METRICS = (
+    REQUESTS, LATENCY, IN_PROGRESS, REQUEST_BYTES, RESPONSE_BYTES, UPLOAD_SIZE,
+    DB_QUERIES, DB_TIME, DB_SLOW_QUERIES, DB_N_PLUS_ONE,
+)
+
+# Gauges that are combined across workers by taking the maximum, not the sum.
+MAX_GAUGES = {"db_pool_wait_seconds_max"}
+
+
+def make_metric(name: str, kind: str, help: str, values: Dict[Tuple[str, ...], float], labels=()) -> Metric:
+    metric = Metric(name, kind, help, labels)
+    metric.values.update(values)
+    return metric
+
+
+def collect_pool_metrics() -> List[Metric]:
+    """
+    Report `pool_metrics`, the connection pool checkouts of this worker.
+    """
+    pool = pool_metrics.snapshot()
+    return [
+        make_metric("db_pool_checkouts_total", "counter", "Connections checked out of the pool.",
+                         {(): pool["checkouts"]}),
+        make_metric("db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection.",
+                         {(): pool["timeouts"]}),
+        make_metric("db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection.",
+                         {(): pool["wait_seconds_total"]}),
+        make_metric("db_pool_wait_seconds_max", "gauge", "Longest wait for a pooled connection.",
+                         {(): pool["wait_seconds_max"]}),
+        make_metric("db_pool_size", "gauge", "Connections kept in the pools.", {(): pool["size"]}),
+        make_metric("db_pool_checked_out", "gauge", "Connections in use.", {(): pool["checked_out"]}),
+        make_metric("db_pool_overflow", "gauge", "Connections open beyond the pool size.",
+                         {(): pool["overflow"]}),
+    ]
+
+
+def collect_cache_stats() -> List[Metric]:
+    """
+    Report the hits, misses and evictions of the entity and token caches.
+    """
+    caches = {"entity": get_cache().stats, "token": get_token_cache().backend.stats}
+    return [
+        make_metric(f"cache_{event}_total", "counter", f"Cache {event}.",
+                         {(cache,): stats[event] for cache, stats in caches.items()}, ("cache",))
+        for event in ("hits", "misses", "evictions")
+    ]
+
+
+collectors: List[Callable[[], Iterable[Metric]]] = [collect_pool_metrics, collect_cache_stats]
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the request metrics of this module.
+
+    The route label is the path template of the matched route, e.g.
+    "/documents/{document_id}", read from the scope after routing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        method = scope["method"]
+        received = sent = 0
+        # A request that raises is answered with a 500 by the error middleware.
+        status = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        IN_PROGRESS.inc((method,))
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            IN_PROGRESS.dec((method,))
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            labels = (method, route)
+            REQUESTS.inc((method, route, str(status)))
+            LATENCY.observe(labels, time.perf_counter() - start)
+            REQUEST_BYTES.inc(labels, received)
+            RESPONSE_BYTES.inc(labels, sent)
+            if received:
+                UPLOAD_SIZE.observe(labels, received)
+            # Left by `QueryStatsMiddleware`, when it is installed.
+            query_stats = scope.get("query_stats")
+            if query_stats is not None:
+                DB_QUERIES.observe(labels, query_stats.count)
+                DB_TIME.observe(labels, query_stats.seconds)
+                if query_stats.slow_count:
+                    DB_SLOW_QUERIES.inc(labels, query_stats.slow_count)
+                if query_stats.repeated_shapes:
+                    DB_N_PLUS_ONE.inc(labels, len(query_stats.repeated_shapes))
+
+
+def snapshot() -> Dict[str, dict]:
+    """
+    Return the metrics of this worker, including those of the collectors.
+    """
+    metrics = list(METRICS)
+    for collect in collectors:
+        metrics.extend(collect())
+    return {metric.name: metric.snapshot() for metric in metrics}
+
+
+def write_snapshot(directory: str):
+    """
+    Write the metrics of this worker to `<pid>.json` in `directory`, atomically.
+    """
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(snapshot(), file)
+    os.replace(f"{path}.tmp", path)
+
+
+async def flush_snapshots(directory: str, interval: float):
+    """
+    Write the metrics of this worker to `directory` every `interval` seconds, until cancelled.
+    """
+    while True:
+        write_snapshot(directory)
+        await asyncio.sleep(interval)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def worker_snapshots() -> List[Tuple[Dict[str, dict], bool]]:
+    """
+    Return the metrics of every worker, each with whether the worker is alive.
+
+    Without `metrics_multiprocess_dir`, only this worker's metrics are returned.
+    """
+    directory = get_settings().metrics_multiprocess_dir
+    if not directory:
+        return [(snapshot(), True)]
+    write_snapshot(directory)
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as file:
+                snapshots.append((json.load(file), pid_alive(int(name[:-5]))))
+        except (OSError, ValueError):
+            # A worker replaced the file while it was read; its next snapshot will do.
+            continue
+    return snapshots
+
+
+def merge(snapshots: List[Tuple[Dict[str, dict], bool]]) -> Dict[str, dict]:
+    """
+    Combine worker snapshots into one, summing values with the same labels.
+    """
+    merged = {}
+    for metrics, alive in snapshots:
+        for name, metric in metrics.items():
+            if metric["kind"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**metric, "values": {}})
+            values = target["values"]
+            for labels, value in metric["samples"]:
+                labels = tuple(labels)
+                if labels not in values:
+                    values[labels] = value
+                elif metric["kind"] == "histogram":
+                    values[labels] = [a + b for a, b in zip(values[labels], value)]
+                elif name in MAX_GAUGES:
+                    values[labels] = max(values[labels], value)
+                else:
+                    values[labels] += value
+    return merged
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render() -> str:
+    """
+    Render the metrics of all workers in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition, version 0.0.4.
+    """
+    lines = []
+    for name, metric in sorted(merge(worker_snapshots()).items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labels"]
+        for labels, value in sorted(metric["values"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{format_labels(names, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], "+Inf"], value[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{format_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(names, labels)} {value[-1]}")
+            lines.append(f"{name}_count{format_labels(names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,129 @@
+"""
+This module provides helpers for keyset (cursor) pagination.
+
+Listings are ordered by `(created_at, id)` descending. A page ends with an
+opaque cursor encoding the sort key of its last row, and the next page
+resumes strictly after that key, so every page is an index range scan that
+costs the same no matter how deep it is.
+
+Search results are ordered by `(score, id)` descending instead, with
+`encode_rank_cursor` and `decode_rank_cursor`.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+from fastapi import HTTPException, status
+from config.settings import get_settings
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque cursor.
+
+    Args:
+        created_at (datetime): The creation time of the row.
+        id (int): The ID of the row.
+
+    Returns:
+        str: The URL-safe cursor.
+    """
+    payload = json.dumps([created_at.isoformat(), id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (Optional[str]): The cursor received from the client.
+
+    Returns:
+        Optional[Tuple[datetime, int]]: The sort key to resume after, or None for the first page.
+    """
+    if not cursor:
+        return None
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid cursor'
+        )
+
+
+def encode_rank_cursor(score: float, id: int) -> str:
+    """
+    Encode the rank of the last result of a search page as an opaque cursor.
+
+    Args:
+        score (float): The relevance score of the result.
+        id (int): The ID of the result.
+
+    Returns:
+        str: The URL-safe cursor.
+    """
+    payload = json.dumps([score, id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_rank_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    """
+    Decode a cursor produced by `encode_rank_cursor`.
+
+    Args:
+        cursor (Optional[str]): The cursor received from the client.
+
+    Returns:
+        Optional[Tuple[float, int]]: The rank to resume after, or None for the first page.
+    """
+    if not cursor:
+        return None
+    try:
+        score, id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return float(score), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid cursor'
+        )
+
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    Clamp a requested page size to the configured maximum.
+
+    Args:
+        limit (Optional[int]): The page size requested by the client.
+
+    Returns:
+        int: The page size to use.
+    """
+    settings = get_settings()
+    return min(limit or settings.default_page_size, settings.max_page_size)
+
+
+def split_page(
+    rows: list,
+    size: int,
+    cursor_for: Callable[..., str] = lambda row: encode_cursor(row.created_at, row.id)
+) -> Tuple[list, Optional[str]]:
+    """
+    Split the `size + 1` rows fetched for a page into the page and the next cursor.
+
+    Fetching one extra row tells whether another page exists without a COUNT query.
+
+    Args:
+        rows (list): Up to `size + 1` rows, by default with `created_at` and `id` attributes.
+        size (int): The page size.
+        cursor_for (Callable[..., str]): Builds the cursor from the last row of the page.
+
+    Returns:
+        Tuple[list, Optional[str]]: The rows of the page, and the cursor of the next page or None.
+    """
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, cursor_for(rows[-1])
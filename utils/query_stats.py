@@ -0,0 +1,195 @@
+"""
+This module measures the SQL statements each request sends to the database.
+
+`instrument_engine` adds cursor execution listeners to an engine. Every
+statement is timed; statements slower than `db_slow_query_ms` are logged with
+their bound parameters redacted to their types. When the statement runs on
+behalf of a request, it is also added to the `QueryStats` of that request,
+which `QueryStatsMiddleware` keeps in a context variable. The variable is
+copied into the threads of sync endpoints and the greenlets of async drivers,
+so each request only sees its own statements.
+
+At the end of a request, a statement shape (the SQL with the lengths of `IN`
+lists erased) that ran more than `db_n_plus_one_threshold` times is logged as
+a likely N+1 query, e.g. a lazy relationship loaded once per row. With
+`db_query_headers` the counts are also returned in `X-DB-*` response headers,
+and `MetricsMiddleware` records them per route.
+"""
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config.logger import Logger
+from config.settings import get_settings
+
+# Placeholders of every DBAPI paramstyle, with the `::TYPE` cast asyncpg adds.
+PARAMETER_PATTERN = re.compile(r"(?:\?|\$\d+|%\(\w+\)s|%s)(?:::\w+(?:\(\d+(?:,\s*\d+)?\))?(?:\[\])*)?")
+# `IN (?, ?, ?)` lists vary in length with the data; they are one shape. Matched
+# once placeholders are unified, so it covers every paramstyle.
+PARAMETER_LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+class QueryStats:
+    """
+    The statements executed on behalf of one request.
+
+    Args:
+        scope (dict): The ASGI scope of the request, for its route.
+    """
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope or {}
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.slow_count = 0
+        self.shapes = Counter()
+        # Shapes flagged as N+1 queries when the request ended.
+        self.repeated_shapes = {}
+        # Set once the response is sent; background tasks run after that and
+        # are not the request's statements.
+        self.finished = False
+
+    @property
+    def route(self) -> str:
+        return getattr(self.scope.get("route"), "path", "-")
+
+    def record(self, statement: str, seconds: float, slow: bool):
+        self.count += 1
+        self.seconds += seconds
+        self.slow_count += slow
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> dict:
+        """
+        Return the statement shapes that ran more than `threshold` times, with their counts.
+        """
+        if not threshold:
+            return {}
+        return {shape: count for shape, count in self.shapes.items() if count > threshold}
+
+    def headers(self) -> list:
+        """
+        Return the `X-DB-*` response headers, as ASGI header pairs.
+        """
+        return [
+            (b"x-db-query-count", str(self.count).encode()),
+            (b"x-db-query-time-ms", f"{self.seconds * 1000:.2f}".encode()),
+            (b"x-db-slowest-query-ms", f"{self.slowest_seconds * 1000:.2f}".encode()),
+            (b"x-db-max-repeats", str(max(self.shapes.values(), default=0)).encode()),
+        ]
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """
+    Reduce a statement to its shape: placeholders unified and `IN` lists of any length made equal.
+    """
+    return PARAMETER_LIST_PATTERN.sub("(?)", PARAMETER_PATTERN.sub("?", " ".join(statement.split())))
+
+
+def redact(parameters: Any) -> Any:
+    """
+    Replace every bound parameter value by its type name, keeping the structure.
+
+    Args:
+        parameters (Any): The parameters of a statement: a tuple or dict, or a
+            list of them for `executemany`.
+
+    Returns:
+        Any: The parameters with the values redacted.
+    """
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return type(parameters)(redact(value) for value in parameters)
+    if parameters is None:
+        return None
+    return f"<{type(parameters).__name__}>"
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._query_started
+    settings = get_settings()
+    slow = bool(settings.db_slow_query_ms) and seconds * 1000 >= settings.db_slow_query_ms
+    stats = current_query_stats.get()
+    if stats is not None and stats.finished:
+        stats = None
+    if stats is not None:
+        stats.record(statement, seconds, slow)
+    if slow:
+        Logger.warning(
+            "Slow query (%.1f ms, route %s): %s; parameters %s",
+            seconds * 1000, stats.route if stats is not None else "-",
+            " ".join(statement.split()), redact(parameters),
+        )
+
+
+def instrument_engine(engine: Engine) -> Engine:
+    """
+    Time the statements of an engine, as described in this module.
+
+    Args:
+        engine (Engine): A sync engine, or the `sync_engine` of an async one.
+
+    Returns:
+        Engine: The same engine.
+    """
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    return engine
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware collecting the `QueryStats` of each request.
+
+    The stats are left in `scope["query_stats"]` for the middleware around
+    this one, and returned in response headers if `db_query_headers` is set.
+    Statements run after the response is sent, by background tasks, are not
+    counted.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        settings = get_settings()
+        stats = scope["query_stats"] = QueryStats(scope)
+        token = current_query_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start" and settings.db_query_headers:
+                message = {**message, "headers": [*message.get("headers", []), *stats.headers()]}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                stats.finished = True
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_query_stats.reset(token)
+            stats.repeated_shapes = stats.repeated(settings.db_n_plus_one_threshold)
+            for shape, count in stats.repeated_shapes.items():
+                Logger.warning(
+                    "Possible N+1 query: %d executions in %s %s of %s", count, scope["method"], stats.route, shape
+                )
@@ -0,0 +1,120 @@
+"""
+This module defines the full-text index over document titles and descriptions.
+
+The index is kept by the database itself, so every write path, including bulk
+statements and cascading deletes, keeps it current in the same transaction:
+
+- SQLite: an external-content FTS5 table, `documents_fts`, whose rows are
+  written by triggers on `documents`. It stores only the inverted index; the
+  text stays in `documents`. Results are ranked with BM25.
+- Postgres: a stored generated `tsvector` column, `documents.search_vector`,
+  with a GIN index. Results are ranked with `ts_rank_cd`.
+
+In both cases the title weighs more than the description.
+
+Text extracted from uploaded files is indexed the same way, per chunk, in
+`text_chunks_fts` or `text_chunks.search_vector`, and weighs less than both.
+"""
+import re
+from typing import Optional
+
+# Text search configuration of the Postgres index. It is baked into the
+# generated column, so changing it needs a migration.
+SEARCH_CONFIG = "english"
+
+# BM25 column weights of the SQLite index, in column order.
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+CONTENT_WEIGHT = 0.5
+
+SEARCH_DDL = {
+    "sqlite": (
+        "CREATE VIRTUAL TABLE documents_fts USING fts5("
+        "title, description, content='documents', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER documents_fts_insert AFTER INSERT ON documents BEGIN "
+        "INSERT INTO documents_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+        "CREATE TRIGGER documents_fts_delete AFTER DELETE ON documents BEGIN "
+        "INSERT INTO documents_fts(documents_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "END",
+        "CREATE TRIGGER documents_fts_update AFTER UPDATE OF title, description ON documents BEGIN "
+        "INSERT INTO documents_fts(documents_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO documents_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+    ),
+    "postgresql": (
+        "ALTER TABLE documents ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+        ") STORED",
+        "CREATE INDEX ix_documents_search_vector ON documents USING gin (search_vector)",
+    ),
+}
+
+SEARCH_DROP_DDL = {
+    "sqlite": (
+        "DROP TRIGGER IF EXISTS documents_fts_update",
+        "DROP TRIGGER IF EXISTS documents_fts_delete",
+        "DROP TRIGGER IF EXISTS documents_fts_insert",
+        "DROP TABLE IF EXISTS documents_fts",
+    ),
+    "postgresql": (
+        "DROP INDEX IF EXISTS ix_documents_search_vector",
+        "ALTER TABLE documents DROP COLUMN IF EXISTS search_vector",
+    ),
+}
+
+CHUNK_SEARCH_DDL = {
+    "sqlite": (
+        "CREATE VIRTUAL TABLE text_chunks_fts USING fts5("
+        "text, content='text_chunks', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER text_chunks_fts_insert AFTER INSERT ON text_chunks BEGIN "
+        "INSERT INTO text_chunks_fts(rowid, text) VALUES (new.id, new.text); "
+        "END",
+        "CREATE TRIGGER text_chunks_fts_delete AFTER DELETE ON text_chunks BEGIN "
+        "INSERT INTO text_chunks_fts(text_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+        "END",
+    ),
+    "postgresql": (
+        # Weight C ranks content below titles (A) and descriptions (B).
+        "ALTER TABLE text_chunks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', text), 'C')"
+        ") STORED",
+        "CREATE INDEX ix_text_chunks_search_vector ON text_chunks USING gin (search_vector)",
+    ),
+}
+
+CHUNK_SEARCH_DROP_DDL = {
+    "sqlite": (
+        "DROP TRIGGER IF EXISTS text_chunks_fts_delete",
+        "DROP TRIGGER IF EXISTS text_chunks_fts_insert",
+        "DROP TABLE IF EXISTS text_chunks_fts",
+    ),
+    "postgresql": (
+        "DROP INDEX IF EXISTS ix_text_chunks_search_vector",
+        "ALTER TABLE text_chunks DROP COLUMN IF EXISTS search_vector",
+    ),
+}
+
+TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def fts5_query(q: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query matching documents that contain every word.
+
+    Each word is quoted, so FTS5 operators and punctuation in the input are
+    taken literally instead of raising syntax errors.
+
+    Args:
+        q (str): The text typed by the user.
+
+    Returns:
+        Optional[str]: The FTS5 query, or None if the text has no words.
+    """
+    terms = TERM_PATTERN.findall(q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms)
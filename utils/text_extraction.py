@@ -0,0 +1,104 @@
+"""
+This module extracts and chunks the text of stored files.
+
+The functions here are CPU bound and run in worker processes, so the module
+imports nothing from the application and loads pypdfium2 lazily.
+"""
+import re
+import time
+from typing import List, Tuple
+
+# Break chunks at paragraph ends, then line ends, then spaces, in that order of preference.
+BREAK_PATTERNS = (re.compile(r'\n\s*\n'), re.compile(r'\n'), re.compile(r'\s'))
+
+
+class TextExtractionError(Exception):
+    """
+    Raised when a file cannot be parsed; retrying it would fail again.
+    """
+
+
+def extract_text(path: str, file_type: str, chunk_size: int) -> Tuple[List[Tuple[int, str]], float]:
+    """
+    Extract the text of a file and split it into chunks.
+
+    Args:
+        path (str): The path of the file.
+        file_type (str): The file type of the file, a name from `FILE_TYPES` with `has_text`.
+        chunk_size (int): The maximum length of a chunk, in characters.
+
+    Returns:
+        Tuple[List[Tuple[int, str]], float]: The `(page, text)` chunks in
+        reading order, and the seconds spent extracting them.
+
+    Raises:
+        TextExtractionError: If the file is not a PDF, or the parser rejects it.
+    """
+    start = time.perf_counter()
+    if file_type != 'pdf':
+        raise TextExtractionError(f'Cannot extract text from {file_type} files')
+    chunks = []
+    try:
+        for page, text in enumerate(extract_pdf_pages(path), start=1):
+            chunks.extend((page, chunk) for chunk in split_text(text, chunk_size))
+    except (ImportError, MemoryError, OSError):
+        # The worker, not the file, is at fault; the file is retried.
+        raise
+    except Exception as exc:
+        # Parser errors are not always picklable, so only their message is sent back to the server.
+        raise TextExtractionError(f'{type(exc).__name__}: {exc}') from None
+    return chunks, time.perf_counter() - start
+
+
+def extract_pdf_pages(path: str):
+    """
+    Yield the text of each page of a PDF, one page in memory at a time.
+    """
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                yield textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+def split_text(text: str, chunk_size: int) -> List[str]:
+    """
+    Split text into chunks of at most `chunk_size` characters.
+
+    Chunks end at the last paragraph, line or word break that fits, and only
+    mid-word when a single word is longer than a chunk. Whitespace-only
+    chunks are dropped.
+
+    Args:
+        text (str): The text to split.
+        chunk_size (int): The maximum length of a chunk, in characters.
+
+    Returns:
+        List[str]: The chunks.
+    """
+    chunks = []
+    text = text.replace('\r\n', '\n').replace('\r', '\n').strip()
+    while text:
+        if len(text) <= chunk_size:
+            end = len(text)
+        else:
+            end = chunk_size
+            for pattern in BREAK_PATTERNS:
+                breaks = [match.start() for match in pattern.finditer(text, 0, chunk_size + 1)]
+                if breaks and breaks[-1] > 0:
+                    end = breaks[-1]
+                    break
+        chunk = text[:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        text = text[end:].lstrip()
+    return chunks
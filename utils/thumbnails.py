@@ -0,0 +1,61 @@
+"""
+This module renders document thumbnails.
+
+The functions here are CPU bound and run in worker processes, so the module
+imports nothing from the application and loads Pillow and pypdfium2 lazily.
+"""
+import io
+
+THUMBNAIL_CONTENT_TYPE = 'image/jpeg'
+
+
+def render_thumbnail(path: str, file_type: str, max_size: int) -> bytes:
+    """
+    Render a JPEG thumbnail of a file, bounded to `max_size` pixels on its longest side.
+
+    Images are downscaled; PDFs are rendered from their first page.
+
+    Args:
+        path (str): The path of the source file.
+        file_type (str): The file type of the source, a name from `FILE_TYPES`.
+        max_size (int): The maximum width and height of the thumbnail.
+
+    Returns:
+        bytes: The encoded thumbnail.
+    """
+    from PIL import Image
+
+    if file_type == 'pdf':
+        image = render_first_page(path, max_size)
+    else:
+        image = Image.open(path)
+        # Lets the JPEG decoder downscale while decoding instead of afterwards.
+        image.draft('RGB', (max_size, max_size))
+    image.thumbnail((max_size, max_size))
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=80, optimize=True)
+    return output.getvalue()
+
+
+def render_first_page(path: str, max_size: int):
+    """
+    Render the first page of a PDF at the scale that fits it in `max_size` pixels.
+    """
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        page = pdf[0]
+        width, height = page.get_size()
+        return page.render(scale=max_size / max(width, height, 1)).to_pil()
+    finally:
+        pdf.close()
@@ -0,0 +1,65 @@
+"""
+This module enforces `max_upload_size` on the request body of uploads.
+
+Starlette receives and spools the whole multipart body before the endpoint
+runs, so checking the size of the parsed file is too late to protect the
+server. `UploadSizeLimitMiddleware` rejects an upload whose Content-Length is
+too large before reading it, and counts the bytes of the body as they are
+received, so a chunked or mislabelled upload is cut off as soon as it
+exceeds the limit.
+"""
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from config.settings import get_settings
+
+UPLOAD_PATHS = ("/upload",)
+# Room for the multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def upload_too_large(max_upload_size: int) -> HTTPException:
+    """
+    Return the error of an upload larger than `max_upload_size` bytes.
+    """
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f'Supported file size is 0 - {max_upload_size // (1024 * 1024)} MB'
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware limiting the request body of `UPLOAD_PATHS` to
+    `max_upload_size`, plus `MULTIPART_OVERHEAD`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        max_upload_size = get_settings().max_upload_size
+        limit = max_upload_size + MULTIPART_OVERHEAD
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            error = upload_too_large(max_upload_size)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_with_limit():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised while the endpoint parses the form, which returns it as the response.
+                    raise upload_too_large(max_upload_size)
+            return message
+
+        await self.app(scope, receive_with_limit, send)